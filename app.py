@@ -15,26 +15,65 @@ db = SQLAlchemy(model_class=Base)
 # Initialize CSRF protection
 csrf = CSRFProtect()
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "quizcraft_dev_secret_key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///quizcraft.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# Initialize extensions with the app
-db.init_app(app)
-csrf.init_app(app)
-
 # Initialize login manager
 login_manager = LoginManager()
 
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
+
+    Creating the app has no side effects: it does not connect to the database,
+    start threads or import the heavy document, OCR and LLM libraries, which load
+    on first use. Create or upgrade the schema with database/db_init.py.
+
+    Args:
+        config (dict): Settings that override the environment-based configuration
+
+    Returns:
+        Flask: The application, without routes (see main.py)
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "quizcraft_dev_secret_key")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Configure the database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///quizcraft.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if config:
+        app.config.update(config)
+
+    # Initialize extensions with the app
+    db.init_app(app)
+    csrf.init_app(app)
+    init_login_manager(app)
+
+    from utils.session_store import init_session_store
+    from utils.metrics import init_metrics
+    from utils.job_queue import init_job_queue
+    from utils.quiz_search import init_search_index
+    from utils.question_bank import init_question_bank
+
+    # Keep session data, including guest quizzes, on the server instead of in the cookie
+    init_session_store(app)
+
+    # Record request latency and database queries per route for /metrics
+    init_metrics(app)
+
+    # Background worker pool for quiz generation
+    init_job_queue(app)
+
+    # Keep the full-text search index in step with quiz and question writes
+    init_search_index(app)
+
+    # Keep the near-duplicate index of the question bank in step with question writes
+    init_question_bank(app)
+
+    return app
+
 def init_login_manager(app):
     login_manager.init_app(app)
     login_manager.login_view = 'login'
@@ -46,8 +85,3 @@ def init_login_manager(app):
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
-
-# Create all database tables
-with app.app_context():
-    from models import User, Quiz
-    db.create_all()
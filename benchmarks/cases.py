@@ -0,0 +1,365 @@
+import io
+import os
+import json
+import itertools
+from benchmarks.harness import benchmark, benchmark_cases, SkipBenchmark
+from benchmarks import fixtures
+
+# Quiz sizes at which per-question work is measured: the minimum, a typical and the maximum count
+QUESTION_COUNTS = [5, 25, 75]
+
+# Quizzes in the seeded database used by the route benchmarks
+SEEDED_QUIZ_COUNT = int(os.environ.get("QUIZCRAFT_BENCH_QUIZZES", "10000"))
+
+# Text extraction
+
+@benchmark('extract.pdf_500_pages.full', repeat=3)
+def bench_extract_pdf_full():
+    from utils.text_extractor import extract_text_from_file
+
+    data = fixtures.read_bytes(fixtures.pdf_fixture(500))
+    return lambda: extract_text_from_file('document.pdf', data)
+
+@benchmark('extract.pdf_500_pages.budget')
+def bench_extract_pdf_budget():
+    from utils.text_extractor import extract_text_from_file
+    from utils.quiz_generator import MAX_CONTENT_LENGTH
+
+    data = fixtures.read_bytes(fixtures.pdf_fixture(500))
+    return lambda: extract_text_from_file('document.pdf', data, char_budget=MAX_CONTENT_LENGTH)
+
+@benchmark('extract.docx_5000_paragraphs', repeat=3)
+def bench_extract_docx():
+    from utils.text_extractor import extract_text_from_file
+
+    data = fixtures.read_bytes(fixtures.docx_fixture(5000))
+    return lambda: extract_text_from_file('document.docx', data)
+
+# OCR
+
+@benchmark('ocr.preprocess_image[3]', repeat=3)
+def bench_ocr_preprocess():
+    from PIL import Image
+    from utils.ocr_reader import preprocess_image
+
+    images = [fixtures.read_bytes(path) for path in fixtures.image_fixtures(3)]
+
+    def run():
+        for data in images:
+            with Image.open(io.BytesIO(data)) as img:
+                preprocess_image(img)
+    return run
+
+@benchmark('ocr.extract_text_from_images[3]', repeat=3)
+def bench_ocr_extract():
+    from utils.ocr_reader import probe_tesseract, extract_text_from_images
+
+    if probe_tesseract() is None:
+        raise SkipBenchmark("tesseract is not installed")
+
+    images = [fixtures.read_bytes(path) for path in fixtures.image_fixtures(3)]
+    return lambda: extract_text_from_images(images)
+
+# Generation response parsing
+
+@benchmark_cases('parse.quiz_response[{}]', QUESTION_COUNTS)
+def bench_parse_response(count):
+    from utils.quiz_generator import parse_quiz_response
+
+    response_text = fixtures.sample_response_text(count)
+    return lambda: parse_quiz_response(response_text)
+
+@benchmark_cases('parse.quiz_stream[{}]', QUESTION_COUNTS)
+def bench_parse_stream(count):
+    from utils.quiz_generator import QuizStreamParser
+
+    response_text = fixtures.sample_response_text(count)
+    # Gemini streams responses in pieces of roughly this size
+    pieces = [response_text[start:start + 120] for start in range(0, len(response_text), 120)]
+
+    def run():
+        parser = QuizStreamParser()
+        for piece in pieces:
+            parser.feed(piece)
+    return run
+
+# Quiz editing
+
+@benchmark_cases('edit.parse_quiz_form[{}]', QUESTION_COUNTS)
+def bench_parse_quiz_form(count):
+    from werkzeug.datastructures import MultiDict
+    from utils.quiz_editor import parse_quiz_form
+
+    # The fields the preview editor submits for the quiz
+    fields = [('quiz_title', f"Benchmark Quiz ({count} questions)")]
+    for index, question in enumerate(fixtures.sample_quiz(count)):
+        fields.append((f'question_type_{index}', question.get('question_type', '')))
+        fields.append((f'question_{index}', question['question']))
+        for position, option in enumerate(question.get('options', [])):
+            fields.append((f'option_{index}_{position}', option))
+        fields.append((f'answer_{index}', question['answer']))
+        fields.append((f'explanation_{index}', question.get('explanation', '')))
+    form = MultiDict(fields)
+    return lambda: parse_quiz_form(form)
+
+# Question bank
+
+@benchmark_cases('bank.fingerprint[{}]', QUESTION_COUNTS)
+def bench_fingerprint(count):
+    from utils.question_bank import question_fingerprint
+
+    quiz_data = fixtures.sample_quiz(count)
+
+    def run():
+        for question in quiz_data:
+            question_fingerprint(question['question'], question['answer'])
+    return run
+
+@benchmark_cases('bank.drop_near_duplicates[{}]', QUESTION_COUNTS)
+def bench_drop_near_duplicates(count):
+    from utils.question_bank import drop_near_duplicates
+
+    quiz_data = fixtures.sample_quiz(count)
+    return lambda: drop_near_duplicates(quiz_data)
+
+# Compressed storage
+
+@benchmark_cases('storage.compress_text[{}]', QUESTION_COUNTS)
+def bench_compress_text(count):
+    from utils.compressed_text import compress_text
+
+    quiz_json = json.dumps(fixtures.model_quiz(count))
+    return lambda: compress_text(quiz_json)
+
+@benchmark_cases('storage.decompress_text[{}]', QUESTION_COUNTS)
+def bench_decompress_text(count):
+    from utils.compressed_text import compress_text, decompress_text
+
+    stored = compress_text(json.dumps(fixtures.model_quiz(count)))
+    return lambda: decompress_text(stored)
+
+# Batch generation
+
+@benchmark_cases('variants.shuffle_quiz[{}]', QUESTION_COUNTS)
+def bench_shuffle_quiz(count):
+    from utils.quiz_variants import shuffle_quiz
+
+    quiz_data = fixtures.sample_quiz(count)
+    seeds = itertools.count()
+    return lambda: shuffle_quiz(quiz_data, next(seeds))
+
+@benchmark('variants.generate_quiz_variants[4x25]', repeat=5)
+def bench_generate_variants():
+    from utils.quiz_generator import generate_quiz_variants, QUIZ_TYPES
+
+    # The local provider answers instantly, so this times everything around the LLM calls
+    content = fixtures.sample_text(40)
+    return lambda: generate_quiz_variants(content, QUIZ_TYPES[:4], 25, use_cache=False)
+
+# PDF rendering
+
+@benchmark_cases('pdf.clean_text[{}]', QUESTION_COUNTS)
+def bench_clean_text(count):
+    from utils.pdf_exporter import clean_text
+
+    quiz_data = fixtures.sample_quiz(count)
+    texts = []
+    for question in quiz_data:
+        texts.append(question['question'])
+        texts.extend(question.get('options', []))
+        texts.append(question['answer'])
+        texts.append(question.get('explanation', ''))
+
+    def run():
+        for text in texts:
+            clean_text(text)
+    return run
+
+@benchmark_cases('pdf.create_quiz_pdf[{}]', QUESTION_COUNTS)
+def bench_create_pdf(count):
+    from utils.pdf_exporter import create_quiz_pdf
+
+    quiz_data = fixtures.sample_quiz(count)
+    return lambda: create_quiz_pdf(quiz_data, f"Benchmark Quiz ({count} questions)")
+
+@benchmark_cases('pdf.create_quiz_pdf.platypus[{}]', QUESTION_COUNTS)
+def bench_create_pdf_platypus(count):
+    from utils.pdf_exporter import create_quiz_pdf
+
+    # The layout used for quizzes holding markup, and with QUIZCRAFT_PDF_FAST_PATH=0
+    quiz_data = fixtures.sample_quiz(count)
+    return lambda: create_quiz_pdf(quiz_data, f"Benchmark Quiz ({count} questions)", fast=False)
+
+# Lightweight export formats
+
+@benchmark_cases('export.{}[{}]', [(export_format, 75) for export_format in ['json', 'csv', 'gift', 'qti']])
+def bench_export(export_format, count):
+    from utils.quiz_exporters import export_quiz
+
+    quiz_data = fixtures.sample_quiz(count)
+
+    def run():
+        for _ in export_quiz(export_format, quiz_data, f"Benchmark Quiz ({count} questions)", 'Mixed'):
+            pass
+    return run
+
+@benchmark('pdf.exam_set.serial[20x25]', repeat=3)
+def bench_exam_set_serial():
+    from utils.exam_sets import render_exam_version, exam_set_seed
+
+    # Rendering every version in the web process, one after another
+    quiz_data = fixtures.sample_quiz(25)
+    seed = exam_set_seed("Benchmark Exam", quiz_data)
+    return lambda: [render_exam_version(quiz_data, "Benchmark Exam", seed, version) for version in range(1, 21)]
+
+@benchmark('pdf.exam_set.zip[20x25]', repeat=3)
+def bench_exam_set_zip():
+    from utils.exam_sets import stream_exam_set_zip, render_exam_set
+
+    quiz_data = fixtures.sample_quiz(25)
+    # Start the worker processes outside the timed runs
+    list(render_exam_set(quiz_data, "Benchmark Exam", 1))
+
+    def run():
+        for _ in stream_exam_set_zip(quiz_data, "Benchmark Exam", 20):
+            pass
+    return run
+
+# Routes, through the Flask test client against a seeded database
+
+_client = None
+
+def get_client():
+    """
+    Return a test client logged in as the owner of the seeded quizzes.
+    """
+    global _client
+
+    if _client is None:
+        from main import app
+        from app import db
+        from models import Quiz
+        from database.db_init import init_database
+
+        app.config['WTF_CSRF_ENABLED'] = False
+        init_database(app)
+        with app.app_context():
+            fixtures.seed_database(SEEDED_QUIZ_COUNT)
+            if db.session.query(Quiz).count() < SEEDED_QUIZ_COUNT:
+                raise SkipBenchmark(f"The benchmark database holds fewer than {SEEDED_QUIZ_COUNT} quizzes")
+
+        _client = app.test_client()
+        response = _client.post('/login', data={'username_or_email': 'benchmark', 'password': 'benchmark'})
+        if response.status_code != 302:
+            raise RuntimeError("Could not log in to the benchmark database")
+
+    return _client
+
+def _get_ok(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    response.get_data()
+    response.close()
+
+@benchmark('routes.dashboard', repeat=20)
+def bench_dashboard():
+    client = get_client()
+    return lambda: _get_ok(client, '/dashboard')
+
+@benchmark('routes.preview', repeat=20)
+def bench_preview():
+    client = get_client()
+    return lambda: _get_ok(client, f'/preview/{SEEDED_QUIZ_COUNT // 2}')
+
+def _get_not_modified(client, url, etag):
+    response = client.get(url, headers={'If-None-Match': etag})
+    if response.status_code != 304:
+        raise RuntimeError(f"GET {url} with a current ETag returned {response.status_code}")
+    response.close()
+
+def _current_etag(client, url):
+    response = client.get(url)
+    response.get_data()
+    response.close()
+    return response.headers['ETag']
+
+@benchmark('routes.preview.not_modified', repeat=20)
+def bench_preview_not_modified():
+    client = get_client()
+    url = f'/preview/{SEEDED_QUIZ_COUNT // 2}'
+    etag = _current_etag(client, url)
+    return lambda: _get_not_modified(client, url, etag)
+
+@benchmark('routes.search.title', repeat=20)
+def bench_search_title():
+    client = get_client()
+    # Matches the title of a single quiz
+    return lambda: _get_ok(client, f'/search?q={SEEDED_QUIZ_COUNT // 2}')
+
+@benchmark('routes.search.common', repeat=20)
+def bench_search_common():
+    client = get_client()
+    # Matches a question of every seeded quiz, so all of them are ranked
+    return lambda: _get_ok(client, '/search?q=glucose+receptor')
+
+@benchmark('bank.build_quiz_from_bank[25]', repeat=10)
+def bench_build_from_bank():
+    from main import app
+    from models import User
+    from utils.question_bank import build_quiz_from_bank
+
+    get_client()
+    with app.app_context():
+        user_id = User.query.filter_by(username='benchmark').one().id
+
+    def run():
+        with app.app_context():
+            build_quiz_from_bank(user_id, 'Mixed', 25, topic='glucose receptor')
+    return run
+
+@benchmark('routes.download.cached', repeat=20)
+def bench_download_cached():
+    client = get_client()
+    return lambda: _get_ok(client, f'/download/{SEEDED_QUIZ_COUNT // 2}')
+
+@benchmark('routes.download.not_modified', repeat=20)
+def bench_download_not_modified():
+    client = get_client()
+    url = f'/download/{SEEDED_QUIZ_COUNT // 2}'
+    etag = _current_etag(client, url)
+    return lambda: _get_not_modified(client, url, etag)
+
+@benchmark('routes.download.uncached', repeat=10)
+def bench_download_uncached():
+    client = get_client()
+    # Every call renders a quiz that has not been downloaded before
+    quiz_ids = itertools.count(1)
+    return lambda: _get_ok(client, f'/download/{next(quiz_ids)}')
+
+def _post_export(client, quiz_ids):
+    response = client.post('/export', data={'quiz_ids': [str(quiz_id) for quiz_id in quiz_ids]})
+    if response.status_code != 200:
+        raise RuntimeError(f"POST /export returned {response.status_code}")
+    for _ in response.response:
+        pass
+    response.close()
+
+@benchmark('routes.export.uncached[20]', repeat=5)
+def bench_export_uncached():
+    client = get_client()
+    # Every call exports quizzes that have not been rendered before, counting down
+    # from the newest so they do not overlap the download benchmarks
+    batches = itertools.count(0)
+
+    def run():
+        start = SEEDED_QUIZ_COUNT - 20 * next(batches)
+        _post_export(client, range(start, start - 20, -1))
+    return run
+
+@benchmark('routes.export.cached[20]', repeat=10)
+def bench_export_cached():
+    client = get_client()
+    quiz_ids = range(SEEDED_QUIZ_COUNT // 2, SEEDED_QUIZ_COUNT // 2 + 20)
+    _post_export(client, quiz_ids)
+    return lambda: _post_export(client, quiz_ids)
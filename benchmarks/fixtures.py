@@ -0,0 +1,198 @@
+import os
+import json
+import random
+
+# Bump when a generated fixture changes, so cached copies are rebuilt
+FIXTURE_VERSION = '1'
+
+# Generated fixtures are cached here between runs
+FIXTURES_DIR = os.environ.get("QUIZCRAFT_BENCH_FIXTURES_DIR",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fixtures'))
+
+# Recorded fixtures kept in the repository
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Vocabulary of the generated prose
+WORDS = [
+    'photosynthesis', 'chlorophyll', 'glucose', 'energy', 'membrane', 'nucleus', 'protein',
+    'enzyme', 'molecule', 'carbon', 'oxygen', 'respiration', 'mitochondria', 'organism',
+    'species', 'evolution', 'population', 'ecosystem', 'habitat', 'nutrient', 'cellular',
+    'structure', 'function', 'reaction', 'temperature', 'pressure', 'equilibrium', 'solution',
+    'concentration', 'gradient', 'transport', 'signal', 'receptor', 'hormone', 'tissue',
+    'the', 'a', 'of', 'and', 'in', 'is', 'by', 'to', 'with', 'from', 'which', 'during',
+    'produces', 'requires', 'converts', 'regulates', 'controls', 'releases', 'absorbs',
+    'forms', 'depends', 'increases', 'reduces', 'stores', 'transfers', 'supports',
+]
+
+def fixture_path(name):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    return os.path.join(FIXTURES_DIR, f"v{FIXTURE_VERSION}-{name}")
+
+def sample_sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    return words[0].capitalize() + ' ' + ' '.join(words[1:]) + '.'
+
+def sample_text(paragraphs, seed=0):
+    """
+    Return deterministic prose of the given number of paragraphs.
+    """
+    rng = random.Random(seed)
+    return '\n\n'.join(' '.join(sample_sentence(rng) for _ in range(rng.randint(3, 7)))
+                       for _ in range(paragraphs))
+
+def sample_quiz(question_count, quiz_type='Mixed'):
+    """
+    Return a deterministic quiz, built by the local LLM provider from sample text.
+    """
+    from utils.llm_providers import build_local_quiz
+    from utils.quiz_generator import build_quiz_prompt
+
+    return build_local_quiz(build_quiz_prompt(sample_text(40), quiz_type, question_count))
+
+def model_quiz(question_count):
+    """
+    Return a quiz written the way models answer, repeating the recorded questions as needed.
+
+    The local provider fills templates, which compress far better than model output;
+    storage benchmarks use this instead.
+    """
+    with open(os.path.join(DATA_DIR, 'model_quiz.json'), encoding='utf-8') as f:
+        questions = json.load(f)
+    return [questions[index % len(questions)] for index in range(question_count)]
+
+def sample_response_text(question_count):
+    """
+    Return a model response as Gemini formats it: a JSON array in a code fence.
+    """
+    return "```json\n" + json.dumps(sample_quiz(question_count), indent=2) + "\n```"
+
+def pdf_fixture(pages=500):
+    """
+    Return the path of a text PDF with the given number of pages, generating it once.
+    """
+    path = fixture_path(f"document-{pages}p.pdf")
+    if os.path.exists(path):
+        return path
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(pages)
+    pdf = canvas.Canvas(path + '.tmp', pagesize=letter)
+    pdf.setFont('Helvetica', 10)
+    for _ in range(pages):
+        y = 740
+        while y > 50:
+            pdf.drawString(50, y, ' '.join(rng.choice(WORDS) for _ in range(14)))
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+    os.replace(path + '.tmp', path)
+    return path
+
+def docx_fixture(paragraphs=5000):
+    """
+    Return the path of a DOCX with the given number of paragraphs, generating it once.
+    """
+    path = fixture_path(f"document-{paragraphs}para.docx")
+    if os.path.exists(path):
+        return path
+
+    import docx
+
+    document = docx.Document()
+    for index, paragraph in enumerate(sample_text(paragraphs, seed=1).split('\n\n')):
+        if index % 50 == 0:
+            document.add_heading(f"Section {index // 50 + 1}", level=1)
+        document.add_paragraph(paragraph)
+    document.save(path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return path
+
+def image_fixtures(count=3):
+    """
+    Return the paths of photographed-page style JPEGs (A4 at 300 dpi), generating them once.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    paths = []
+    for index in range(count):
+        path = fixture_path(f"page-{index}.jpg")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+
+        rng = random.Random(index)
+        image = Image.new('RGB', (2480, 3508), (235, 232, 220))
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=40)
+        for line in range(60):
+            draw.text((150, 150 + line * 54), sample_sentence(rng)[:90], fill=(30, 30, 30), font=font)
+        image.save(path + '.tmp', format='JPEG', quality=85)
+        os.replace(path + '.tmp', path)
+
+    return paths
+
+def read_bytes(path):
+    with open(path, 'rb') as fixture:
+        return fixture.read()
+
+def database_fixture_path(quiz_count):
+    return fixture_path(f"quizcraft-{quiz_count}.db")
+
+def seed_database(quiz_count=10000, questions_per_quiz=10):
+    """
+    Fill the application database with one user owning quiz_count quizzes.
+
+    Must be called inside an application context. Does nothing when the
+    database has already been seeded.
+
+    Returns:
+        User: The benchmark user; its password is "benchmark"
+    """
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from models import User, Quiz, Question
+    from utils.quiz_search import rebuild_search_index
+    from utils.question_bank import rebuild_question_bands
+
+    user = User.query.filter_by(username='benchmark').first()
+    if user is not None:
+        return user
+
+    user = User(username='benchmark', email='benchmark@example.com',
+                password_hash=generate_password_hash('benchmark'))
+    db.session.add(user)
+    db.session.commit()
+
+    questions = [Question.from_dict(question, ordinal)
+                 for ordinal, question in enumerate(sample_quiz(questions_per_quiz))]
+    question_rows = [{'ordinal': q.ordinal, 'question_type': q.question_type, 'text': q.text,
+                      'options': q.options, 'answer': q.answer, 'explanation': q.explanation,
+                      'fingerprint': q.fingerprint}
+                     for q in questions]
+
+    started = datetime(2024, 1, 1)
+    batch_size = 1000
+    for batch_start in range(1, quiz_count + 1, batch_size):
+        quiz_ids = range(batch_start, min(batch_start + batch_size, quiz_count + 1))
+        db.session.execute(insert(Quiz), [{
+            'id': quiz_id,
+            'title': f"Benchmark quiz {quiz_id}",
+            'quiz_type': 'Mixed',
+            'question_count': questions_per_quiz,
+            'created_at': started + timedelta(minutes=quiz_id),
+            'user_id': user.id,
+        } for quiz_id in quiz_ids])
+        db.session.execute(insert(Question), [dict(row, quiz_id=quiz_id)
+                                              for quiz_id in quiz_ids for row in question_rows])
+        db.session.commit()
+
+    # Bulk inserts bypass the ORM events that maintain the search and near-duplicate indexes
+    rebuild_search_index(db.session.connection())
+    rebuild_question_bands(db.session.connection())
+    db.session.commit()
+
+    return user
@@ -0,0 +1,183 @@
+import gc
+import json
+import time
+import platform
+import functools
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+# Registered benchmarks, in registration order: name -> (setup, repeat)
+BENCHMARKS = {}
+
+# Timed runs per benchmark when it does not set its own
+DEFAULT_REPEAT = 5
+
+# A benchmark regresses when its median grows by more than this fraction...
+DEFAULT_THRESHOLD = 0.15
+
+# ...and by more than this many milliseconds, which filters out timer noise
+DEFAULT_MIN_DELTA_MS = 0.5
+
+class SkipBenchmark(Exception):
+    """
+    Raised by a benchmark setup when the benchmark cannot run here.
+    """
+
+def benchmark(name, repeat=None):
+    """
+    Register a benchmark.
+
+    The decorated function is the setup: it prepares fixtures and returns the
+    zero-argument callable that is timed. Setup time is not measured.
+
+    Args:
+        name (str): Unique name, dotted by area (e.g. "pdf.create_quiz_pdf[25]")
+        repeat (int): Timed runs, for benchmarks too slow for DEFAULT_REPEAT
+    """
+    def decorator(setup):
+        if name in BENCHMARKS:
+            raise ValueError(f"Benchmark {name} is already registered")
+        BENCHMARKS[name] = (setup, repeat)
+        return setup
+    return decorator
+
+def benchmark_cases(name, cases, repeat=None):
+    """
+    Register one benchmark per case of a parameterised setup.
+
+    The setup receives the case as its arguments.
+
+    Args:
+        name (str): Name template, formatted with the arguments of each case
+            (e.g. "pdf.create_quiz_pdf[{}]")
+        cases (list): One value per case, or a tuple for several arguments
+        repeat (int): Timed runs of each case
+    """
+    def decorator(setup):
+        for case in cases:
+            arguments = case if isinstance(case, tuple) else (case,)
+            benchmark(name.format(*arguments), repeat)(functools.partial(setup, *arguments))
+        return setup
+    return decorator
+
+def time_callable(func, repeat, warmup=1):
+    """
+    Time repeat calls of func after warmup untimed calls.
+
+    Returns:
+        dict: Summary statistics in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'mean_ms': statistics.fmean(timings),
+        'stdev_ms': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'runs': repeat,
+    }
+
+def run_benchmarks(names, repeat=None, log=print):
+    """
+    Run the named benchmarks.
+
+    Returns:
+        dict: name -> statistics, or {"skipped": reason}
+    """
+    results = {}
+    for name in names:
+        setup, default_repeat = BENCHMARKS[name]
+        runs = repeat or default_repeat or DEFAULT_REPEAT
+        try:
+            func = setup()
+        except SkipBenchmark as e:
+            results[name] = {'skipped': str(e)}
+            log(f"{name:<48} skipped: {e}")
+            continue
+
+        results[name] = time_callable(func, runs)
+        log(f"{name:<48} {results[name]['median_ms']:>10.2f} ms (min {results[name]['min_ms']:.2f}, n={runs})")
+
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def build_report(results):
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def save_report(report, path):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+        report_file.write('\n')
+
+def load_report(path):
+    with open(path) as report_file:
+        return json.load(report_file)
+
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compare the medians of two reports.
+
+    Returns:
+        list: (name, baseline_ms, current_ms, ratio, status) rows, where status is
+            "regression", "improvement", "ok", "new" or "skipped"
+    """
+    rows = []
+    baseline_results = baseline.get('results', {})
+    for name, result in current.get('results', {}).items():
+        previous = baseline_results.get(name)
+        if 'skipped' in result or (previous is not None and 'skipped' in previous):
+            rows.append((name, None, None, None, 'skipped'))
+            continue
+        if previous is None:
+            rows.append((name, None, result['median_ms'], None, 'new'))
+            continue
+
+        before, after = previous['median_ms'], result['median_ms']
+        ratio = after / before if before else float('inf')
+        if ratio > 1 + threshold and after - before > min_delta_ms:
+            status = 'regression'
+        elif ratio < 1 - threshold and before - after > min_delta_ms:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, before, after, ratio, status))
+
+    return rows
+
+def format_comparison(rows):
+    lines = [f"{'benchmark':<48} {'baseline':>12} {'current':>12} {'change':>8}  status"]
+    for name, before, after, ratio, status in rows:
+        before_text = f"{before:.2f} ms" if before is not None else '-'
+        after_text = f"{after:.2f} ms" if after is not None else '-'
+        change_text = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else '-'
+        lines.append(f"{name:<48} {before_text:>12} {after_text:>12} {change_text:>8}  {status}")
+    return '\n'.join(lines)
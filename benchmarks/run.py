@@ -0,0 +1,89 @@
+"""
+Run the QuizCraft benchmark suite.
+
+    python -m benchmarks.run                          # run everything
+    python -m benchmarks.run -k pdf -k parse          # only matching benchmarks
+    python -m benchmarks.run --output current.json    # write the results
+    python -m benchmarks.run --save-baseline          # store benchmarks/baseline.json
+    python -m benchmarks.run --compare                # flag regressions against it
+
+Comparison exits with status 1 when any benchmark regressed.
+"""
+import os
+import sys
+import atexit
+import shutil
+import logging
+import argparse
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+def configure_environment(quiz_count):
+    """
+    Point the application at benchmark fixtures. Must run before the app is imported.
+    """
+    from benchmarks.fixtures import database_fixture_path
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{database_fixture_path(quiz_count)}"
+    os.environ['QUIZCRAFT_LLM_PROVIDER'] = 'local'
+    os.environ['QUIZCRAFT_SESSION_BACKEND'] = 'memory'
+
+    # Rendered PDFs are kept for this run only, so uncached downloads stay uncached
+    pdf_cache_dir = tempfile.mkdtemp(prefix='quizcraft-bench-pdf-')
+    atexit.register(shutil.rmtree, pdf_cache_dir, ignore_errors=True)
+    os.environ['QUIZCRAFT_PDF_CACHE_DIR'] = pdf_cache_dir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the QuizCraft benchmark suite.")
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help="only run benchmarks whose name contains this text (repeatable)")
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    parser.add_argument('--repeat', type=int, help="timed runs per benchmark")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f"store the results as the baseline ({os.path.relpath(DEFAULT_BASELINE)})")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='BASELINE',
+                        help="compare against a stored baseline and exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, help="relative slowdown counted as a regression")
+    parser.add_argument('--quizzes', type=int, help="quizzes in the seeded route benchmark database")
+    args = parser.parse_args(argv)
+
+    if args.quizzes:
+        os.environ['QUIZCRAFT_BENCH_QUIZZES'] = str(args.quizzes)
+
+    from benchmarks import harness
+    from benchmarks import cases
+
+    configure_environment(cases.SEEDED_QUIZ_COUNT)
+    # The application logs at DEBUG level; keep the report readable
+    logging.basicConfig(level=logging.WARNING)
+
+    names = [name for name in harness.BENCHMARKS
+             if not args.patterns or any(pattern in name for pattern in args.patterns)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    report = harness.build_report(harness.run_benchmarks(names, repeat=args.repeat))
+
+    if args.output:
+        harness.save_report(report, args.output)
+    if args.save_baseline:
+        harness.save_report(report, DEFAULT_BASELINE)
+
+    if args.compare:
+        rows = harness.compare_reports(harness.load_report(args.compare), report,
+                                       threshold=args.threshold or harness.DEFAULT_THRESHOLD)
+        print()
+        print(harness.format_comparison(rows))
+        regressions = [row[0] for row in rows if row[4] == 'regression']
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Measure how quickly a fresh worker process can serve its first requests.
+
+    python -m benchmarks.startup                            # print the report
+    python -m benchmarks.startup --baseline a03160c^ --write  # compare with a commit, update the report
+
+The report lists the cold-start time (import main, then GET / and GET /login
+through the test client) and the slowest imports from python -X importtime.
+With --baseline, the same measurements of a git revision are listed first.
+"""
+import os
+import sys
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+REPORT_PATH = os.path.join(BENCHMARKS_DIR, 'startup_report.txt')
+
+# Runs in a fresh interpreter and prints the seconds taken
+COLD_START_SCRIPT = """
+import time
+started = time.perf_counter()
+import main
+client = main.app.test_client()
+assert client.get('/').status_code == 200
+assert client.get('/login').status_code == 200
+print(time.perf_counter() - started)
+"""
+
+def _environment(database_path, repo_dir=REPO_DIR):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{database_path}"
+    env['PYTHONPATH'] = repo_dir
+    return env
+
+def prepare_database(database_path, repo_dir=REPO_DIR):
+    subprocess.run([sys.executable, '-m', 'database.db_init'], cwd=repo_dir,
+                   env=_environment(database_path, repo_dir), check=True, capture_output=True)
+
+def measure_cold_start(database_path, runs=5, repo_dir=REPO_DIR):
+    """
+    Return the seconds each of runs fresh processes took to import main and
+    serve / and /login.
+    """
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=repo_dir,
+                                env=_environment(database_path, repo_dir), check=True,
+                                capture_output=True, text=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+def importtime_report(database_path, depth=2, limit=30, repo_dir=REPO_DIR):
+    """
+    Return the slowest imports under main, down to depth levels below it, as
+    (cumulative_us, self_us, indented_module) rows in import order.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=repo_dir,
+                            env=_environment(database_path, repo_dir), check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        level = (len(module) - len(module.lstrip()) - 1) // 2
+        rows.append((level, int(cumulative_us), int(self_us), module.strip()))
+
+    # importtime prints children before their parent; main's imports are the rows after
+    # the previous top-level module (interpreter startup, such as site)
+    end = max(index for index, row in enumerate(rows) if row[0] == 0 and row[3] == 'main')
+    start = max([index + 1 for index, row in enumerate(rows[:end]) if row[0] == 0], default=0)
+    subtree = [row for row in rows[start:end + 1] if row[0] <= depth]
+
+    slowest = set(sorted(range(len(subtree)), key=lambda index: -subtree[index][1])[:limit])
+    return [(cumulative_us, self_us, '  ' * level + module)
+            for index, (level, cumulative_us, self_us, module) in enumerate(subtree)
+            if index in slowest][::-1]
+
+def measure(runs=5, repo_dir=REPO_DIR):
+    """
+    Return the cold-start timings and the slowest imports of the tree in repo_dir.
+    """
+    with tempfile.TemporaryDirectory(prefix='quizcraft-startup-') as temp_dir:
+        database_path = os.path.join(temp_dir, 'startup.db')
+        prepare_database(database_path, repo_dir)
+        return measure_cold_start(database_path, runs, repo_dir), importtime_report(database_path, repo_dir=repo_dir)
+
+def measure_revision(revision, runs=5):
+    """
+    Measure the tree of a git revision, exported to a temporary directory.
+    """
+    with tempfile.TemporaryDirectory(prefix='quizcraft-baseline-') as repo_dir:
+        archive = subprocess.run(['git', 'archive', revision], cwd=REPO_DIR, check=True, capture_output=True).stdout
+        subprocess.run(['tar', '-x', '-C', repo_dir], input=archive, check=True)
+        return measure(runs, repo_dir)
+
+def _describe_revision(revision):
+    return subprocess.run(['git', 'log', '-1', '--format=%h %s', revision], cwd=REPO_DIR,
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+def _measurement_lines(timings, imports):
+    lines = [
+        f"  median {statistics.median(timings) * 1000:.0f} ms, "
+        f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms",
+        "",
+        "  Slowest imports of main (python -X importtime, two levels deep, parents first):",
+        f"  {'cumulative':>12} {'self':>10}  module",
+    ]
+    for cumulative_us, self_us, module in imports:
+        lines.append(f"  {cumulative_us / 1000:>9.1f} ms {self_us / 1000:>7.1f} ms  {module}")
+    return lines
+
+def build_report(runs=5, baseline=None):
+    lines = [
+        "QuizCraft cold-start report",
+        f"python {platform.python_version()} on {platform.platform()}",
+        f"import main + GET / + GET /login, {runs} fresh processes each",
+        "",
+    ]
+    if baseline:
+        lines.append(f"Before: {_describe_revision(baseline)}")
+        lines.extend(_measurement_lines(*measure_revision(baseline, runs)))
+        lines.append("")
+        lines.append(f"After: the working tree, on {_describe_revision('HEAD')}")
+    lines.extend(_measurement_lines(*measure(runs)))
+    return '\n'.join(lines) + '\n'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure QuizCraft worker cold-start time.")
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes to time")
+    parser.add_argument('--baseline', metavar='REVISION', help="also measure this git revision, for comparison")
+    parser.add_argument('--write', action='store_true', help=f"write {os.path.relpath(REPORT_PATH)}")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.runs, args.baseline)
+    print(report, end='')
+    if args.write:
+        with open(REPORT_PATH, 'w') as report_file:
+            report_file.write(report)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,46 @@
 import os
 import logging
-from app import db, app
+from app import db, create_app
+from database.migrations import (upgrade_schema, backfill_questions, backfill_content_hashes,
+                                 compress_stored_text)
+from utils.question_bank import backfill_fingerprints
+from utils.job_queue import recover_interrupted_jobs
 
-def init_database():
+def init_database(app=None):
     """
-    Initialize the database and create all tables.
+    Initialize the database, create all tables and migrate existing data.
+    
+    Run once per deployment, before the web workers start:
+    python -m database.db_init
+    
+    Args:
+        app (Flask): The application to initialize; a new one is created when omitted
     """
+    app = app or create_app()
     try:
         with app.app_context():
-            db.create_all()
+            upgrade_schema()
             logging.info("Database tables created successfully")
+            
+            converted = backfill_questions()
+            logging.info(f"Moved {converted} quizzes into the question table")
+            
+            hashed = backfill_content_hashes()
+            logging.info(f"Stored the content hash of {hashed} quizzes")
+            
+            compressed = compress_stored_text()
+            logging.info(f"Compressed {compressed} stored quiz documents")
+            
+            with db.engine.begin() as connection:
+                backfill_fingerprints(connection)
+            
+            # The web workers pick up queued jobs when they start
+            requeued = recover_interrupted_jobs()
+            logging.info(f"Re-queued {requeued} interrupted generation jobs")
     except Exception as e:
         logging.error(f"Error initializing database: {str(e)}")
         raise
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     init_database()
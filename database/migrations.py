@@ -0,0 +1,273 @@
+import logging
+from sqlalchemy import inspect, text, MetaData, literal, bindparam
+from sqlalchemy.schema import CreateIndex
+
+def _column_default_sql(column, dialect):
+    """
+    Render a scalar column default as a SQL literal, or None when there is none.
+    """
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    return str(literal(default.arg, column.type).compile(dialect=dialect,
+                                                          compile_kwargs={'literal_binds': True}))
+
+def _add_missing_columns(connection, metadata):
+    """
+    Add model columns that are missing from existing tables.
+    """
+    inspector = inspect(connection)
+    dialect = connection.dialect
+    existing_tables = set(inspector.get_table_names())
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            column_sql = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+            default_sql = _column_default_sql(column, dialect)
+            if default_sql is not None:
+                column_sql += f" DEFAULT {default_sql}"
+                if not column.nullable:
+                    column_sql += " NOT NULL"
+
+            logging.info(f"Adding column {table.name}.{column.name}")
+            connection.execute(text(f"ALTER TABLE {dialect.identifier_preparer.quote(table.name)} ADD COLUMN {column_sql}"))
+
+def _relax_not_null(connection, metadata, table_name, column_name):
+    """
+    Drop the NOT NULL constraint of a column that the models now allow to be empty.
+
+    SQLite cannot alter a column, so the table is rebuilt from the model and its
+    rows copied across.
+    """
+    inspector = inspect(connection)
+    if table_name not in inspector.get_table_names():
+        return
+
+    columns = {column['name']: column for column in inspector.get_columns(table_name)}
+    if column_name not in columns or columns[column_name]['nullable']:
+        return
+
+    logging.info(f"Allowing NULL in {table_name}.{column_name}")
+    if connection.dialect.name != 'sqlite':
+        connection.execute(text(f'ALTER TABLE "{table_name}" ALTER COLUMN "{column_name}" DROP NOT NULL'))
+        return
+
+    table = metadata.tables[table_name]
+    rebuild_metadata = MetaData()
+    # Referenced tables are copied only so foreign keys resolve; they are not created
+    for referenced in {fk.column.table for fk in table.foreign_keys}:
+        referenced.to_metadata(rebuild_metadata)
+    new_table = table.to_metadata(rebuild_metadata, name=f"{table_name}__new")
+    new_table.indexes.clear()
+
+    copied_columns = ', '.join(f'"{column.name}"' for column in table.columns if column.name in columns)
+    connection.execute(text("PRAGMA foreign_keys=OFF"))
+    new_table.create(connection)
+    connection.execute(text(f'INSERT INTO "{new_table.name}" ({copied_columns}) '
+                            f'SELECT {copied_columns} FROM "{table_name}"'))
+    connection.execute(text(f'DROP TABLE "{table_name}"'))
+    connection.execute(text(f'ALTER TABLE "{new_table.name}" RENAME TO "{table_name}"'))
+    connection.execute(text("PRAGMA foreign_keys=ON"))
+
+def _compressed_columns(metadata):
+    from utils.compressed_text import CompressedText
+
+    return [(table, column) for table in metadata.sorted_tables for column in table.columns
+            if isinstance(column.type, CompressedText)]
+
+def _convert_compressed_columns(connection, metadata):
+    """
+    Change text columns that the models now store compressed into binary columns.
+
+    SQLite stores any value in any column, so only other databases are altered;
+    existing text is kept as UTF-8 bytes until compress_stored_text compresses it.
+    """
+    from sqlalchemy.types import LargeBinary
+
+    dialect = connection.dialect
+    if dialect.name == 'sqlite':
+        return
+
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table, column in _compressed_columns(metadata):
+        if table.name not in existing_tables:
+            continue
+        columns = {existing['name']: existing for existing in inspector.get_columns(table.name)}
+        if column.name not in columns or isinstance(columns[column.name]['type'], LargeBinary):
+            continue
+
+        logging.info(f"Converting {table.name}.{column.name} to binary")
+        binary_type = column.type.impl.compile(dialect=dialect)
+        using = f" USING convert_to(\"{column.name}\", 'UTF8')" if dialect.name == 'postgresql' else ""
+        connection.execute(text(f'ALTER TABLE "{table.name}" ALTER COLUMN "{column.name}" TYPE {binary_type}{using}'))
+
+def _create_missing_indexes(connection, metadata):
+    """
+    Create model indexes that are missing from existing tables.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                logging.info(f"Creating index {index.name}")
+                connection.execute(CreateIndex(index))
+
+def upgrade_schema():
+    """
+    Bring the database schema up to date with the models.
+
+    Creates missing tables, columns and indexes and applies the column changes
+    listed below, then creates and fills the full-text search index. Every step
+    checks the live schema first, so this is safe to run on every start. Must be
+    called inside an application context.
+    """
+    from app import db
+    from utils.quiz_search import create_search_index, rebuild_search_index
+    import models  # noqa: F401 - registers every model on the metadata
+
+    db.create_all()
+
+    with db.engine.begin() as connection:
+        _add_missing_columns(connection, db.metadata)
+        _relax_not_null(connection, db.metadata, 'quiz', 'content')
+        _convert_compressed_columns(connection, db.metadata)
+        _create_missing_indexes(connection, db.metadata)
+        if create_search_index(connection):
+            rebuild_search_index(connection)
+
+def backfill_questions(batch_size=500):
+    """
+    Move legacy Quiz.content JSON blobs into Question rows.
+
+    Quizzes are converted in batches of batch_size, each in its own
+    transaction, so the migration can run while the application is serving
+    requests. Quizzes whose content cannot be parsed are logged and left as they
+    are. Must be called inside an application context.
+
+    Returns:
+        int: The number of quizzes converted
+    """
+    import json
+    from app import db
+    from models import Quiz
+
+    converted = 0
+    last_id = 0
+    while True:
+        quizzes = Quiz.query.filter(Quiz.content.isnot(None), Quiz.id > last_id) \
+            .order_by(Quiz.id).limit(batch_size).all()
+        if not quizzes:
+            break
+
+        for quiz in quizzes:
+            last_id = quiz.id
+            try:
+                quiz.set_quiz_data(json.loads(quiz.content))
+                converted += 1
+            except Exception as e:
+                logging.error(f"Could not backfill questions of quiz {quiz.id}: {str(e)}")
+
+        db.session.commit()
+        logging.info(f"Backfilled questions for {converted} quizzes")
+
+    return converted
+
+def backfill_content_hashes(batch_size=500):
+    """
+    Store the content hash of quizzes saved before Quiz.content_hash existed.
+
+    Until then their ETags are computed from the questions on every request.
+    Runs in batches like backfill_questions. Must be called inside an
+    application context.
+
+    Returns:
+        int: The number of quizzes hashed
+    """
+    from app import db
+    from models import Quiz
+
+    hashed = 0
+    last_id = 0
+    while True:
+        quizzes = Quiz.query.filter(Quiz.content_hash.is_(None), Quiz.id > last_id) \
+            .order_by(Quiz.id).limit(batch_size).all()
+        if not quizzes:
+            break
+
+        for quiz in quizzes:
+            last_id = quiz.id
+            try:
+                quiz.refresh_content_hash()
+                hashed += 1
+            except Exception as e:
+                logging.error(f"Could not hash the questions of quiz {quiz.id}: {str(e)}")
+
+        db.session.commit()
+        logging.info(f"Hashed the questions of {hashed} quizzes")
+
+    return hashed
+
+def compress_stored_text(batch_size=500):
+    """
+    Compress the values of CompressedText columns written before they were compressed.
+
+    Rows are converted in batches of batch_size, each in its own transaction,
+    so the migration can run while the application is serving requests;
+    readers handle compressed and uncompressed values alike. Must be called
+    inside an application context.
+
+    Returns:
+        int: The number of values compressed
+    """
+    from app import db
+    from utils.compressed_text import COMPRESSED_MAGIC, decompress_text
+    import models  # noqa: F401 - registers every model on the metadata
+
+    compressed = 0
+    for table, column in _compressed_columns(db.metadata):
+        key = table.primary_key.columns.values()[0].name
+        if db.engine.dialect.name == 'sqlite':
+            # Compressed values are stored as blobs, older ones as text
+            uncompressed = f'typeof("{column.name}") = \'text\''
+        else:
+            uncompressed = f'substr("{column.name}", 1, {len(COMPRESSED_MAGIC)}) <> :magic'
+
+        last_key = None
+        while True:
+            after = f'AND "{key}" > :last_key ' if last_key is not None else ''
+            with db.engine.begin() as connection:
+                rows = connection.execute(text(
+                    f'SELECT "{key}", "{column.name}" FROM "{table.name}" '
+                    f'WHERE "{column.name}" IS NOT NULL AND {uncompressed} {after}'
+                    f'ORDER BY "{key}" LIMIT :limit'
+                ), {'magic': COMPRESSED_MAGIC, 'last_key': last_key, 'limit': batch_size}).fetchall()
+                if not rows:
+                    break
+
+                # Written back through the column type, which compresses them. Rows the
+                # application rewrote meanwhile are already compressed and left alone.
+                update = text(
+                    f'UPDATE "{table.name}" SET "{column.name}" = :value '
+                    f'WHERE "{key}" = :row_key AND {uncompressed}'
+                ).bindparams(bindparam('value', type_=column.type))
+                connection.execute(update, [{'row_key': row_key, 'value': decompress_text(value), 'magic': COMPRESSED_MAGIC}
+                                            for row_key, value in rows])
+            last_key = rows[-1][0]
+            compressed += len(rows)
+            logging.info(f"Compressed {compressed} stored values")
+
+    return compressed
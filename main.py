@@ -1,25 +1,92 @@
 import os
 import logging
-from app import app, init_login_manager
-from flask import Flask, render_template, redirect, url_for, request, flash, session, send_file
+from app import create_app
+from flask import (Flask, render_template, redirect, url_for, request, flash, session, send_file, jsonify,
+                   abort, Response, stream_with_context, make_response)
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import tempfile
 import io
 import json
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import load_only
 
-from models import User, Quiz
+from models import User, Quiz, Question, GenerationJob
 from app import db
-from utils.quiz_generator import generate_quiz_with_gemini
-from utils.ocr_reader import extract_text_from_image
-from utils.pdf_exporter import create_quiz_pdf
+from utils.pdf_cache import get_quiz_pdf, invalidate_quiz_pdf, PDF_RENDER_VERSION
+from utils.http_cache import (quiz_etag, preview_etag, quiz_last_modified, set_cache_headers,
+                              not_modified_response)
+from utils.text_extractor import get_file_extension, SUPPORTED_FILE_EXTENSIONS
+from utils.job_queue import create_generation_job
+from utils.quiz_editor import parse_quiz_form, parse_question_changes
+from utils.quiz_search import search_quizzes
+from utils.question_bank import build_quiz_from_bank, repeated_question_sources
+from utils.quiz_generator import QUIZ_TYPES
+from utils.exam_sets import (EXAM_SET_MAX_VERSIONS, EXAM_SET_FORMATS, exam_set_filename,
+                             stream_exam_set_zip, build_exam_set_pdf)
+from utils.bulk_export import stream_quiz_export_zip, bulk_export_filename
+from utils.quiz_exporters import QUIZ_EXPORT_FORMATS, export_quiz, export_filename
+from utils.metrics import REGISTRY, METRICS_TOKEN
+from utils.compressed_text import decompress_text
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 
-# Initialize login manager
-init_login_manager(app)
+# How often the job event stream checks for new questions
+JOB_EVENTS_POLL_SECONDS = 0.5
+
+# Seconds one event stream connection holds a request worker; the browser then reconnects
+JOB_EVENTS_WINDOW_SECONDS = 15
+
+# Milliseconds the browser waits before reconnecting, sent as the SSE retry hint
+JOB_EVENTS_RETRY_MS = 500
+
+# Seconds after a job was created that its event stream gives up
+JOB_EVENTS_TIMEOUT_SECONDS = 600
+
+# Quizzes shown per dashboard page
+DASHBOARD_PAGE_SIZE = int(os.environ.get("QUIZCRAFT_DASHBOARD_PAGE_SIZE", "20"))
+
+# Shuffled copies a batch generation may add of each quiz
+BATCH_MAX_COPIES = int(os.environ.get("QUIZCRAFT_BATCH_MAX_COPIES", "5"))
+
+# Create the app; the schema is set up separately by database/db_init.py
+app = create_app()
+
+def wants_json():
+    """
+    Return True when the client prefers a JSON response over an HTML page.
+    """
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def job_status_payload(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'error': job.error,
+        'quiz_id': job.quiz_id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'result_url': url_for('job_result', job_id=job.id)
+    }
+
+def get_job_or_404(job_id):
+    """
+    Load a generation job that belongs to the current user or guest session.
+    """
+    job = db.session.get(GenerationJob, job_id)
+    if job is None:
+        abort(404)
+    
+    if job.user_id is not None:
+        if not current_user.is_authenticated or job.user_id != current_user.id:
+            abort(404)
+    elif job.id not in session.get('guest_jobs', []):
+        abort(404)
+    
+    return job
 
 # Home route
 @app.route('/')
@@ -93,8 +160,66 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    user_quizzes = Quiz.query.filter_by(user_id=current_user.id).order_by(Quiz.created_at.desc()).all()
-    return render_template('dashboard.html', quizzes=user_quizzes)
+    total_quizzes = db.session.query(func.count(Quiz.id)).filter(Quiz.user_id == current_user.id).scalar()
+    
+    # Only the columns shown in the table are loaded; questions stay in the database
+    query = Quiz.query.options(
+        load_only(Quiz.id, Quiz.title, Quiz.quiz_type, Quiz.question_count, Quiz.created_at)
+    ).filter(Quiz.user_id == current_user.id)
+    
+    # Keyset pagination: continue after the last quiz of the previous page
+    cursor = parse_dashboard_cursor(request.args.get('after'))
+    if cursor:
+        created_at, quiz_id = cursor
+        query = query.filter(or_(
+            Quiz.created_at < created_at,
+            and_(Quiz.created_at == created_at, Quiz.id < quiz_id)
+        ))
+    
+    user_quizzes = query.order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(DASHBOARD_PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(user_quizzes) > DASHBOARD_PAGE_SIZE:
+        user_quizzes = user_quizzes[:DASHBOARD_PAGE_SIZE]
+        last_quiz = user_quizzes[-1]
+        next_cursor = f"{last_quiz.created_at.isoformat()}_{last_quiz.id}"
+    
+    return render_template('dashboard.html', quizzes=user_quizzes, total_quizzes=total_quizzes,
+                           next_cursor=next_cursor, is_first_page=cursor is None,
+                           export_formats=QUIZ_EXPORT_FORMATS)
+
+def parse_dashboard_cursor(value):
+    """
+    Parse a dashboard page cursor of the form "<created_at ISO timestamp>_<quiz id>".
+    
+    Returns:
+        tuple: (created_at, quiz_id), or None for the first page or a malformed cursor
+    """
+    if not value:
+        return None
+    try:
+        created_at, quiz_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(quiz_id)
+    except ValueError:
+        return None
+
+# Search route
+@app.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    found = search_quizzes(current_user.id, query, page)
+    
+    if wants_json():
+        return jsonify({
+            'query': query,
+            'page': page,
+            'has_next': found['has_next'],
+            'results': found['results']
+        })
+    
+    return render_template('search.html', query=query, page=page,
+                           results=found['results'], has_next=found['has_next'])
 
 # Quiz generator route
 @app.route('/generate', methods=['GET', 'POST'])
@@ -109,103 +234,272 @@ def generate():
             flash('Please select a quiz type and enter a valid number of questions (5-75).', 'error')
             return redirect(url_for('generate'))
         
-        content = ''
-        
-        # Handle different input methods
         input_method = request.form.get('input_method')
+        text_content = None
+        uploads = []
         
+        if input_method == 'bank':
+            return generate_from_bank(quiz_title, quiz_type, question_count)
+        
+        # Further quiz types or shuffled copies make this a batch from the same content
+        extra_types = request.form.getlist('batch_types')
+        batch_copies = int(request.form.get('batch_copies') or 0)
+        batch_types = None
+        if extra_types or batch_copies:
+            if not current_user.is_authenticated:
+                flash('Log in to generate several quizzes at once.', 'error')
+                return redirect(url_for('login'))
+            if any(extra_type not in QUIZ_TYPES for extra_type in extra_types) or not 0 <= batch_copies <= BATCH_MAX_COPIES:
+                flash(f'Please choose quiz types from the list and at most {BATCH_MAX_COPIES} shuffled copies.', 'error')
+                return redirect(url_for('generate'))
+            batch_types = list(dict.fromkeys([quiz_type] + extra_types))
+        
+        # Only validate the input here; extraction and generation run on the job queue
         if input_method == 'text':
-            content = request.form.get('content', '')
+            text_content = request.form.get('content', '')
             
         elif input_method == 'file':
             file = request.files.get('file')
             if file and file.filename:
                 filename = secure_filename(file.filename)
-                file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-                
-                if file_ext == 'pdf':
-                    # Handle PDF
-                    try:
-                        from PyPDF2 import PdfReader
-                        reader = PdfReader(file)
-                        content = ""
-                        for page in reader.pages:
-                            content += page.extract_text() + "\n"
-                    except Exception as e:
-                        flash(f'Error processing PDF: {str(e)}', 'error')
-                        return redirect(url_for('generate'))
-                        
-                elif file_ext == 'docx':
-                    # Handle DOCX
-                    try:
-                        import docx
-                        doc = docx.Document(file)
-                        content = "\n".join([para.text for para in doc.paragraphs])
-                    except Exception as e:
-                        flash(f'Error processing DOCX: {str(e)}', 'error')
-                        return redirect(url_for('generate'))
-                        
-                elif file_ext in ['txt', 'csv']:
-                    # Handle text files
-                    content = file.read().decode('utf-8')
-                else:
+                if get_file_extension(filename) not in SUPPORTED_FILE_EXTENSIONS:
                     flash('Unsupported file format. Please upload PDF, DOCX, TXT, or CSV files.', 'error')
                     return redirect(url_for('generate'))
+                uploads.append((filename, file.read()))
         
         elif input_method == 'image':
-            file = request.files.get('image')
-            if file and file.filename:
-                try:
-                    # Extract text using OCR
-                    content = extract_text_from_image(file)
-                except Exception as e:
-                    flash(f'Error processing image: {str(e)}', 'error')
-                    return redirect(url_for('generate'))
+            # Several photographed pages may be uploaded at once
+            for file in request.files.getlist('image'):
+                if file and file.filename:
+                    uploads.append((secure_filename(file.filename), file.read()))
         
-        if not content:
+        if not text_content and not uploads:
             flash('Please provide some content for the quiz.', 'error')
             return redirect(url_for('generate'))
         
         try:
-            # Generate quiz using Gemini API
-            quiz_data = generate_quiz_with_gemini(content, quiz_type, question_count)
+            job = create_generation_job(
+                title=quiz_title,
+                quiz_type=quiz_type,
+                question_count=question_count,
+                input_method=input_method,
+                text_content=text_content,
+                uploads=uploads,
+                use_cache=not request.form.get('fresh_variant'),
+                # Batches share one prompt prefix, so they use the start of the document
+                chunked=bool(request.form.get('whole_document')) and not batch_types,
+                batch_types=batch_types,
+                batch_copies=batch_copies,
+                user_id=current_user.id if current_user.is_authenticated else None
+            )
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error queueing quiz generation: {str(e)}', 'error')
+            return redirect(url_for('generate'))
+        
+        if not current_user.is_authenticated:
+            # Remember which jobs belong to this guest
+            session['guest_jobs'] = session.get('guest_jobs', [])[-9:] + [job.id]
+        
+        if wants_json():
+            return jsonify(job_status_payload(job)), 202
+        return redirect(url_for('job_progress', job_id=job.id))
+    
+    return render_template('generate_quiz.html', quiz_types=QUIZ_TYPES, batch_max_copies=BATCH_MAX_COPIES)
+
+def generate_from_bank(quiz_title, quiz_type, question_count):
+    """
+    Build a quiz from the user's earlier questions, without calling the LLM.
+    """
+    if not current_user.is_authenticated:
+        flash('Log in to build quizzes from your question bank.', 'error')
+        return redirect(url_for('login'))
+    
+    topic = request.form.get('bank_topic', '').strip()
+    try:
+        quiz_data, source_ids = build_quiz_from_bank(current_user.id, quiz_type, question_count, topic)
+        if not quiz_data:
+            flash('Your question bank has no matching questions yet. Generate a quiz first.', 'error')
+            return redirect(url_for('generate'))
+        
+        quiz = Quiz(
+            title=quiz_title,
+            quiz_type=quiz_type,
+            question_count=len(quiz_data),
+            user_id=current_user.id
+        )
+        quiz.set_quiz_data(quiz_data)
+        # Every question comes from an earlier quiz
+        for question, source_id in zip(quiz.questions, source_ids):
+            question.repeat_of_id = source_id
+        db.session.add(quiz)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error building quiz from your question bank: {str(e)}', 'error')
+        return redirect(url_for('generate'))
+    
+    if len(quiz_data) < question_count:
+        flash(f'Your question bank only had {len(quiz_data)} distinct matching questions.', 'info')
+    
+    if wants_json():
+        return jsonify({'quiz_id': quiz.id, 'question_count': len(quiz_data),
+                        'result_url': url_for('preview_quiz', quiz_id=quiz.id)}), 201
+    return redirect(url_for('preview_quiz', quiz_id=quiz.id))
+
+# Generation job status (JSON)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job_or_404(job_id)
+    return jsonify(job_status_payload(job))
+
+# Generation job progress page, renders questions as they stream in
+@app.route('/jobs/<job_id>/wait', methods=['GET'])
+def job_progress(job_id):
+    job = get_job_or_404(job_id)
+    return render_template('preview_quiz.html',
+                           quiz_data=[],
+                           quiz_title=job.title,
+                           quiz_type=job.quiz_type,
+                           quiz_id=None,
+                           question_count=job.question_count,
+                           stream_url=url_for('job_events', job_id=job.id))
+
+def sse_event(event, data, event_id=None):
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+# Generation job event stream (Server-Sent Events)
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = get_job_or_404(job_id)
+    job_id = job.id
+    result_url = url_for('job_result', job_id=job_id)
+    gives_up_at = job.created_at + timedelta(seconds=JOB_EVENTS_TIMEOUT_SECONDS)
+    
+    # Resume after the last question the browser received when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    first_index = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    
+    def generate_events():
+        sent = first_index
+        # Each connection ends after a short window so it does not hold a sync worker;
+        # EventSource reconnects by itself and resumes from the last event id
+        window_ends = time.monotonic() + JOB_EVENTS_WINDOW_SECONDS
+        yield f"retry: {JOB_EVENTS_RETRY_MS}\n\n"
+        
+        while time.monotonic() < window_ends:
+            if datetime.utcnow() >= gives_up_at:
+                yield sse_event('timeout', {'status_url': url_for('job_status', job_id=job_id)})
+                return
             
-            # Save quiz to database if user is logged in
-            if current_user.is_authenticated:
-                quiz = Quiz(
-                    title=quiz_title,
-                    quiz_type=quiz_type,
-                    question_count=question_count,
-                    content=json.dumps(quiz_data),
-                    user_id=current_user.id
-                )
-                db.session.add(quiz)
-                db.session.commit()
-                quiz_id = quiz.id
+            status, partial_result, result, error, quiz_id = db.session.query(
+                GenerationJob.status, GenerationJob.partial_result, GenerationJob.result,
+                GenerationJob.error, GenerationJob.quiz_id
+            ).filter_by(id=job_id).one()
+            
+            if status == 'done' and quiz_id is not None:
+                # Only load the saved questions the browser has not received yet
+                new_questions = [question.to_dict() for question in Question.query.filter(
+                    Question.quiz_id == quiz_id, Question.ordinal >= sent
+                ).order_by(Question.ordinal)]
+            elif status == 'done':
+                new_questions = json.loads(decompress_text(result))[sent:]
             else:
-                # Store in session for guest users
-                session['quiz_data'] = quiz_data
-                session['quiz_title'] = quiz_title
-                session['quiz_type'] = quiz_type
-                quiz_id = None
+                new_questions = json.loads(decompress_text(partial_result))[sent:] if partial_result else []
             
-            return redirect(url_for('preview_quiz', quiz_id=quiz_id))
+            # End the read transaction so the next poll sees the worker's commits
+            db.session.rollback()
             
-        except Exception as e:
-            flash(f'Error generating quiz: {str(e)}', 'error')
-            return redirect(url_for('generate'))
+            for question in new_questions:
+                yield sse_event('question', {'index': sent, 'question': question}, event_id=sent)
+                sent += 1
+            
+            if status == 'done':
+                yield sse_event('done', {'result_url': result_url})
+                return
+            if status == 'failed':
+                yield sse_event('failed', {'error': error})
+                return
+            
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
     
-    return render_template('generate_quiz.html')
+    return Response(stream_with_context(generate_events()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Generation job result
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = get_job_or_404(job_id)
+    
+    if job.status == 'failed':
+        if wants_json():
+            return jsonify(job_status_payload(job)), 500
+        flash(f'Error generating quiz: {job.error}', 'error')
+        return redirect(url_for('generate'))
+    
+    if job.status != 'done':
+        if wants_json():
+            return jsonify(job_status_payload(job)), 202
+        return redirect(url_for('job_progress', job_id=job.id))
+    
+    if job.batch_report is not None:
+        report = json.loads(job.batch_report)
+        if wants_json():
+            return jsonify(dict(job_status_payload(job), batch=report))
+        quizzes = Quiz.query.filter(Quiz.id.in_(report['quiz_ids']), Quiz.user_id == job.user_id) \
+            .order_by(Quiz.id).all()
+        return render_template('batch_result.html', job=job, quizzes=quizzes, report=report)
+    
+    if job.user_id is not None:
+        if wants_json():
+            quiz = Quiz.query.get_or_404(job.quiz_id)
+            return jsonify(dict(job_status_payload(job), quiz_data=quiz.to_quiz_data()))
+        return redirect(url_for('preview_quiz', quiz_id=job.quiz_id))
+    
+    quiz_data = json.loads(job.result)
+    if wants_json():
+        return jsonify(dict(job_status_payload(job), quiz_data=quiz_data))
+    
+    # Store in session for guest users
+    session['quiz_data'] = quiz_data
+    session['quiz_title'] = job.title
+    session['quiz_type'] = job.quiz_type
+    return redirect(url_for('preview_quiz'))
 
 # Quiz preview route
+@app.route('/preview', methods=['GET'])
 @app.route('/preview/<int:quiz_id>', methods=['GET'])
 def preview_quiz(quiz_id=None):
+    repeats = {}
+    quiz_user_id = None
+    # Pages showing a message are neither cached nor answered from the cache
+    cacheable = quiz_id is not None and not session.get('_flashes')
     if quiz_id:
         # Get quiz from database
         quiz = Quiz.query.get_or_404(quiz_id)
-        quiz_data = json.loads(quiz.content)
+        
+        # Show the owner which questions they have been asked before
+        if current_user.is_authenticated and quiz.user_id == current_user.id:
+            repeats = repeated_question_sources(quiz.id)
+        
+        if cacheable:
+            viewer_id = current_user.id if current_user.is_authenticated else None
+            etag = preview_etag(quiz, viewer_id, session.get('csrf_token'),
+                                app.config.get('WTF_CSRF_TIME_LIMIT', 3600), repeats)
+            # The page depends on more than the quiz, so only the ETag can tell it is current;
+            # when it is, the questions are not even loaded
+            not_modified = not_modified_response(request.environ, etag)
+            if not_modified is not None:
+                return not_modified
+        
+        quiz_data = quiz.to_quiz_data()
         quiz_title = quiz.title
         quiz_type = quiz.quiz_type
+        quiz_user_id = quiz.user_id
     else:
         # Get quiz from session (guest mode)
         quiz_data = session.get('quiz_data')
@@ -216,19 +510,40 @@ def preview_quiz(quiz_id=None):
             flash('No quiz data found. Please generate a new quiz.', 'error')
             return redirect(url_for('generate'))
     
-    return render_template('preview_quiz.html', 
+    page = render_template('preview_quiz.html', 
                            quiz_data=quiz_data, 
                            quiz_title=quiz_title, 
                            quiz_type=quiz_type,
-                           quiz_id=quiz_id)
+                           quiz_id=quiz_id,
+                           quiz_user_id=quiz_user_id,
+                           repeats=repeats,
+                           exam_set_max_versions=EXAM_SET_MAX_VERSIONS,
+                           export_formats=QUIZ_EXPORT_FORMATS)
+    if not cacheable:
+        return page
+    
+    # Rendering the page may have created the session's CSRF token, which the ETag depends on
+    etag = preview_etag(quiz, viewer_id, session.get('csrf_token'),
+                        app.config.get('WTF_CSRF_TIME_LIMIT', 3600), repeats)
+    return set_cache_headers(make_response(page), etag, None)
 
 # Download quiz as PDF
+@app.route('/download', methods=['GET'])
 @app.route('/download/<int:quiz_id>', methods=['GET'])
 def download_quiz(quiz_id=None):
+    etag = last_modified = None
     if quiz_id:
         # Get quiz from database
         quiz = Quiz.query.get_or_404(quiz_id)
-        quiz_data = json.loads(quiz.content)
+        
+        etag = quiz_etag(quiz, PDF_RENDER_VERSION)
+        last_modified = quiz_last_modified(quiz)
+        # The browser's copy is current, so nothing is loaded or rendered
+        not_modified = not_modified_response(request.environ, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        quiz_data = quiz.to_quiz_data()
         quiz_title = quiz.title
     else:
         # Get quiz from session (guest mode)
@@ -240,20 +555,116 @@ def download_quiz(quiz_id=None):
             return redirect(url_for('generate'))
     
     try:
-        # Create PDF
-        pdf_buffer = create_quiz_pdf(quiz_data, quiz_title)
+        # Render the PDF, or reuse the cached render of this exact quiz version
+        pdf_path, pdf_key = get_quiz_pdf(quiz_title, quiz_data)
         
-        # Return PDF as download
-        return send_file(
-            io.BytesIO(pdf_buffer.getvalue()),
+        # Return PDF as download; the file is sent without copying it into memory
+        response = send_file(
+            pdf_path,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f"{quiz_title.replace(' ', '_')}.pdf"
+            download_name=f"{quiz_title.replace(' ', '_')}.pdf",
+            etag=etag or pdf_key,
+            last_modified=last_modified,
+            conditional=True
         )
+        if quiz_id:
+            set_cache_headers(response, etag, last_modified)
+        return response
     except Exception as e:
         flash(f'Error generating PDF: {str(e)}', 'error')
         return redirect(url_for('preview_quiz', quiz_id=quiz_id))
 
+# Exam set route: shuffled versions of a quiz with matching answer keys
+@app.route('/quiz/<int:quiz_id>/exam-set', methods=['GET'])
+@login_required
+def download_exam_set(quiz_id):
+    quiz = Quiz.query.get_or_404(quiz_id)
+    if quiz.user_id != current_user.id:
+        flash('You do not have permission to export this quiz.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    versions = request.args.get('versions', 1, type=int)
+    export_format = request.args.get('format', 'zip')
+    if not 1 <= versions <= EXAM_SET_MAX_VERSIONS or export_format not in EXAM_SET_FORMATS:
+        flash(f'Please ask for between 1 and {EXAM_SET_MAX_VERSIONS} versions as a ZIP or PDF.', 'error')
+        return redirect(url_for('preview_quiz', quiz_id=quiz_id))
+    
+    quiz_data = quiz.to_quiz_data()
+    quiz_title = quiz.title
+    
+    if export_format == 'pdf':
+        try:
+            combined = build_exam_set_pdf(quiz_data, quiz_title, versions)
+        except Exception as e:
+            flash(f'Error generating exam set: {str(e)}', 'error')
+            return redirect(url_for('preview_quiz', quiz_id=quiz_id))
+        return send_file(combined, mimetype='application/pdf', as_attachment=True,
+                         download_name=exam_set_filename(quiz_title, 'pdf'))
+    
+    # The archive is written while the versions are rendered, so it is never held in memory
+    return Response(stream_exam_set_zip(quiz_data, quiz_title, versions),
+                    mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{secure_filename(exam_set_filename(quiz_title, "zip"))}"'})
+
+# Export route: a quiz as JSON, CSV, Moodle GIFT or IMS QTI, for learning management systems
+@app.route('/export/<export_format>', methods=['GET'])
+@app.route('/export/<export_format>/<int:quiz_id>', methods=['GET'])
+def export_quiz_as(export_format, quiz_id=None):
+    if export_format not in QUIZ_EXPORT_FORMATS:
+        abort(404)
+    
+    if quiz_id:
+        # Get quiz from database
+        quiz = Quiz.query.get_or_404(quiz_id)
+        
+        # Check if the quiz belongs to the current user
+        if not current_user.is_authenticated or quiz.user_id != current_user.id:
+            flash('You do not have permission to export this quiz.', 'error')
+            return redirect(url_for('dashboard'))
+        
+        quiz_data = quiz.to_quiz_data()
+        quiz_title = quiz.title
+        quiz_type = quiz.quiz_type
+    else:
+        # Get quiz from session (guest mode)
+        quiz_data = session.get('quiz_data')
+        quiz_title = session.get('quiz_title', 'Untitled Quiz')
+        quiz_type = session.get('quiz_type')
+        
+        if not quiz_data:
+            flash('No quiz data found. Please generate a new quiz.', 'error')
+            return redirect(url_for('generate'))
+    
+    return Response(export_quiz(export_format, quiz_data, quiz_title, quiz_type),
+                    mimetype=QUIZ_EXPORT_FORMATS[export_format].mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{secure_filename(export_filename(quiz_title, export_format))}"'})
+
+# Bulk export route: several quizzes, or all of them, as one ZIP of PDFs or of another export format
+@app.route('/export', methods=['POST'])
+@login_required
+def export_quizzes():
+    export_format = request.form.get('format', 'pdf')
+    if export_format != 'pdf' and export_format not in QUIZ_EXPORT_FORMATS:
+        flash('Please choose an export format.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    query = db.session.query(Quiz.id).filter(Quiz.user_id == current_user.id)
+    if not request.form.get('all'):
+        selected_ids = [int(quiz_id) for quiz_id in request.form.getlist('quiz_ids') if quiz_id.isdigit()]
+        # Only the user's own quizzes are exported, whatever ids were posted
+        query = query.filter(Quiz.id.in_(selected_ids))
+    quiz_ids = [quiz_id for quiz_id, in query.order_by(Quiz.created_at.desc(), Quiz.id.desc())]
+    
+    if not quiz_ids:
+        flash('Please select at least one quiz to export.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    # The archive is written while the quizzes are exported; the request context keeps the database session open
+    return Response(stream_with_context(stream_quiz_export_zip(quiz_ids, export_format)),
+                    mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{bulk_export_filename()}"'})
+
 # Save quiz edits route
 @app.route('/save-edits', methods=['POST'])
 def save_quiz_edits():
@@ -261,57 +672,9 @@ def save_quiz_edits():
     quiz_title = request.form.get('quiz_title', 'Untitled Quiz')
     
     try:
-        # Collect all form data to reconstruct the quiz
-        new_quiz_data = []
-        
-        # Determine how many questions we're dealing with
-        question_count = 0
-        for key in request.form.keys():
-            if key.startswith('question_'):
-                question_index = int(key.split('_')[1])
-                question_count = max(question_count, question_index + 1)
-        
-        # Process each question
-        for i in range(question_count):
-            question_text = request.form.get(f'question_{i}', '')
-            answer_text = request.form.get(f'answer_{i}', '')
-            explanation_text = request.form.get(f'explanation_{i}', '')
-            question_type = request.form.get(f'question_type_{i}', '')
-            
-            # Skip empty questions
-            if not question_text:
-                continue
-                
-            question_data = {
-                'question': question_text,
-                'answer': answer_text
-            }
-            
-            # Add question type if available
-            if question_type:
-                question_data['question_type'] = question_type
-                
-            # Add explanation if available
-            if explanation_text:
-                question_data['explanation'] = explanation_text
-                
-            # Check for options (multiple choice questions)
-            options = []
-            
-            # Collect all option keys for this question
-            option_keys = [key for key in request.form.keys() if key.startswith(f'option_{i}_')]
-            
-            # Extract the option values
-            for key in sorted(option_keys, key=lambda k: int(k.split('_')[-1]) if k.split('_')[-1].isdigit() else 0):
-                option_text = request.form.get(key, '')
-                if option_text:
-                    options.append(option_text)
-                    
-            if options:
-                question_data['options'] = options
-                
-            new_quiz_data.append(question_data)
-            
+        # Decode the form into questions in a single pass over its fields
+        new_quiz_data = parse_quiz_form(request.form)
+        
         # Update quiz in database or session
         if quiz_id is not None and str(quiz_id).isdigit():
             quiz_id_int = int(quiz_id)
@@ -324,9 +687,14 @@ def save_quiz_edits():
                     flash('You do not have permission to edit this quiz.', 'error')
                     return redirect(url_for('dashboard'))
                 
+                # The rendered PDF of the previous version is no longer needed
+                invalidate_quiz_pdf(quiz.title, quiz.to_quiz_data())
+                
+                # Only the questions that changed are written
                 quiz.title = quiz_title
-                quiz.content = json.dumps(new_quiz_data)
+                quiz.update_quiz_data(new_quiz_data)
                 quiz.question_count = len(new_quiz_data)
+                quiz.updated_at = datetime.utcnow()
                 db.session.commit()
                 flash('Quiz updated successfully!', 'success')
             else:
@@ -336,6 +704,8 @@ def save_quiz_edits():
             return redirect(url_for('preview_quiz', quiz_id=quiz_id_int))
         else:
             # Update quiz in session for guest users
+            if session.get('quiz_data'):
+                invalidate_quiz_pdf(session.get('quiz_title', 'Untitled Quiz'), session['quiz_data'])
             session['quiz_data'] = new_quiz_data
             session['quiz_title'] = quiz_title
             flash('Quiz updated successfully!', 'success')
@@ -346,6 +716,59 @@ def save_quiz_edits():
         flash(f'Error saving quiz: {str(e)}', 'error')
         return redirect(url_for('preview_quiz', quiz_id=quiz_id if quiz_id and quiz_id.isdigit() else None))
 
+# Partial quiz update route, used by the preview editor to autosave single questions
+@app.route('/quiz/questions', methods=['PATCH'])
+@app.route('/quiz/<int:quiz_id>/questions', methods=['PATCH'])
+def patch_quiz_questions(quiz_id=None):
+    payload = request.get_json(silent=True)
+    
+    if quiz_id is not None:
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'You need to be logged in to edit saved quizzes.'}), 401
+        
+        quiz = Quiz.query.get_or_404(quiz_id)
+        
+        # Check if the quiz belongs to the current user
+        if quiz.user_id != current_user.id:
+            return jsonify({'error': 'You do not have permission to edit this quiz.'}), 403
+        
+        try:
+            title, changes = parse_question_changes(payload, quiz.question_count)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Only the rows of the changed questions are loaded and written
+        retitled = title is not None and title != quiz.title
+        if retitled:
+            quiz.title = title
+        updated = quiz.update_questions(changes)
+        if updated or retitled:
+            quiz.updated_at = datetime.utcnow()
+        db.session.commit()
+        question_count = quiz.question_count
+    else:
+        quiz_data = session.get('quiz_data')
+        if not quiz_data:
+            return jsonify({'error': 'No quiz data found. Please generate a new quiz.'}), 404
+        
+        try:
+            title, changes = parse_question_changes(payload, len(quiz_data))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if title is not None:
+            session['quiz_title'] = title
+        updated = sorted(index for index, question in changes.items() if quiz_data[index] != question)
+        if updated:
+            quiz_data = list(quiz_data)
+            for index in updated:
+                quiz_data[index] = changes[index]
+            session['quiz_data'] = quiz_data
+        question_count = len(quiz_data)
+    
+    # Stale PDF renders are not removed here; autosaves are frequent and the cache prunes itself
+    return jsonify({'updated': updated, 'question_count': question_count})
+
 # Delete quiz
 @app.route('/delete/<int:quiz_id>', methods=['POST'])
 @login_required
@@ -358,8 +781,10 @@ def delete_quiz(quiz_id):
         return redirect(url_for('dashboard'))
     
     try:
+        quiz_title, quiz_data = quiz.title, quiz.to_quiz_data()
         db.session.delete(quiz)
         db.session.commit()
+        invalidate_quiz_pdf(quiz_title, quiz_data)
         flash('Quiz deleted successfully.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -367,5 +792,15 @@ def delete_quiz(quiz_id):
     
     return redirect(url_for('dashboard'))
 
+# Metrics route
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        abort(401)
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
+    # The development server sets up the database itself; deployments run database/db_init.py
+    from database.db_init import init_database
+    init_database(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
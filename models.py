@@ -1,6 +1,8 @@
+import json
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
+from utils.compressed_text import CompressedText, compressed_text_property
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,9 +20,237 @@ class Quiz(db.Model):
     title = db.Column(db.String(100), nullable=False)
     quiz_type = db.Column(db.String(50), nullable=False)
     question_count = db.Column(db.Integer, nullable=False)
-    content = db.Column(db.Text, nullable=False)  # JSON string of quiz data
+    _content = db.Column('content', CompressedText, nullable=True)  # Legacy JSON string of quiz data, moved into Question rows
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)  # Last edit; NULL for quizzes saved before it existed
+    content_hash = db.Column(db.String(64), nullable=True)  # Hash of the questions, from which the HTTP ETags are built
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    questions = db.relationship('Question', backref='quiz', lazy=True,
+                                cascade='all, delete-orphan', order_by='Question.ordinal')
+    content = compressed_text_property('_content')
+    
+    __table_args__ = (
+        db.Index('ix_quiz_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    def to_quiz_data(self):
+        """
+        Return the questions as the list of dicts used by templates and exporters.
+        """
+        # Quizzes not yet backfilled by the migration still keep their questions in content
+        if self.content is not None:
+            return json.loads(self.content)
+        return [question.to_dict() for question in self.questions]
+    
+    def set_quiz_data(self, quiz_data):
+        """
+        Replace all questions of the quiz.
+        """
+        from utils.http_cache import quiz_content_hash
+        
+        questions = [Question.from_dict(question_data, ordinal)
+                     for ordinal, question_data in enumerate(quiz_data)]
+        self.questions = questions
+        self.content = None
+        self.content_hash = quiz_content_hash(quiz_data)
+    
+    def update_quiz_data(self, quiz_data):
+        """
+        Apply an edited question list, updating only the questions that changed.
+        """
+        from utils.http_cache import quiz_content_hash
+        
+        if self.content is not None:
+            self.set_quiz_data(quiz_data)
+            return
+        
+        questions = list(self.questions)
+        for ordinal, question_data in enumerate(quiz_data):
+            if ordinal < len(questions):
+                questions[ordinal].update_from_dict(question_data)
+            else:
+                self.questions.append(Question.from_dict(question_data, ordinal))
+        
+        # Questions beyond the new end are deleted as orphans
+        for question in questions[len(quiz_data):]:
+            self.questions.remove(question)
+        
+        self.content_hash = quiz_content_hash(quiz_data)
+    
+    def update_questions(self, changes):
+        """
+        Replace single questions without loading the rest of the quiz.
+        
+        Args:
+            changes (dict): Maps question positions to their new question dicts
+        
+        Returns:
+            list: The positions whose question changed
+        """
+        if self.content is not None:
+            quiz_data = json.loads(self.content)
+            updated = sorted(index for index, question in changes.items() if quiz_data[index] != question)
+            for index in updated:
+                quiz_data[index] = changes[index]
+            if updated:
+                self.set_quiz_data(quiz_data)
+            return updated
+        
+        if not changes:
+            return []
+        
+        questions = Question.query.filter(
+            Question.quiz_id == self.id,
+            Question.ordinal.in_(list(changes))
+        ).all()
+        updated = sorted(question.ordinal for question in questions
+                         if question.update_from_dict(changes[question.ordinal]))
+        if updated:
+            # Recomputed from all questions when an ETag next needs it (see utils.http_cache)
+            self.content_hash = None
+        return updated
+    
+    def refresh_content_hash(self):
+        """
+        Recompute the content hash from the stored questions.
+        """
+        from utils.http_cache import quiz_content_hash
+        
+        self.content_hash = quiz_content_hash(self.to_quiz_data())
     
     def __repr__(self):
         return f'<Quiz {self.title}>'
+
+class Question(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    ordinal = db.Column(db.Integer, nullable=False)  # Position of the question within the quiz
+    question_type = db.Column(db.String(50), nullable=True)  # Only set for Mixed quizzes
+    text = db.Column(db.Text, nullable=False)
+    options = db.Column(db.Text, nullable=True)  # JSON list of option strings
+    answer = db.Column(db.Text, nullable=False)
+    explanation = db.Column(db.Text, nullable=True)
+    fingerprint = db.Column(db.LargeBinary, nullable=True)  # MinHash signature of the question and answer
+    repeat_of_id = db.Column(db.Integer, nullable=True)  # Near-duplicate question in an earlier quiz of the user
+    
+    __table_args__ = (
+        db.Index('ix_question_quiz_id_ordinal', 'quiz_id', 'ordinal'),
+    )
+    
+    @staticmethod
+    def _fields_from_dict(question_data):
+        from utils.question_bank import question_fingerprint
+        
+        options = question_data.get('options')
+        text = str(question_data.get('question', ''))
+        answer = str(question_data.get('answer', ''))
+        return {
+            'question_type': question_data.get('question_type'),
+            'text': text,
+            'options': json.dumps([str(option) for option in options]) if options is not None else None,
+            'answer': answer,
+            'explanation': question_data.get('explanation'),
+            'fingerprint': question_fingerprint(text, answer)
+        }
+    
+    @classmethod
+    def from_dict(cls, question_data, ordinal):
+        return cls(ordinal=ordinal, **cls._fields_from_dict(question_data))
+    
+    def update_from_dict(self, question_data):
+        """
+        Apply an edited question, touching only the columns that changed.
+        
+        Returns:
+            bool: True when any column changed
+        """
+        changed = False
+        for field, value in self._fields_from_dict(question_data).items():
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed = True
+        return changed
+    
+    def to_dict(self):
+        question_data = {}
+        if self.question_type is not None:
+            question_data['question_type'] = self.question_type
+        question_data['question'] = self.text
+        if self.options is not None:
+            question_data['options'] = json.loads(self.options)
+        question_data['answer'] = self.answer
+        if self.explanation is not None:
+            question_data['explanation'] = self.explanation
+        return question_data
+    
+    def __repr__(self):
+        return f'<Question {self.quiz_id}#{self.ordinal}>'
+
+class QuestionBand(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)  # Owner of the quiz, so lookups stay within one user's bank
+    band_key = db.Column(db.BigInteger, nullable=False)  # Hash of one LSH band of the question fingerprint
+    
+    __table_args__ = (
+        db.Index('ix_question_band_user_id_band_key', 'user_id', 'band_key'),
+    )
+    
+    def __repr__(self):
+        return f'<QuestionBand {self.question_id}>'
+
+class GenerationJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    title = db.Column(db.String(100), nullable=False)
+    quiz_type = db.Column(db.String(50), nullable=False)
+    question_count = db.Column(db.Integer, nullable=False)
+    input_method = db.Column(db.String(20), nullable=False)
+    text_content = db.Column(db.Text, nullable=True)  # Pasted text for the 'text' input method
+    use_cache = db.Column(db.Boolean, nullable=False, default=True)  # False asks for a fresh variant
+    chunked = db.Column(db.Boolean, nullable=False, default=False)  # Cover the whole document, not just its start
+    batch_types = db.Column(db.Text, nullable=True)  # JSON list of quiz types for batch jobs
+    batch_copies = db.Column(db.Integer, nullable=False, default=0)  # Shuffled copies of each quiz in a batch
+    batch_report = db.Column(db.Text, nullable=True)  # JSON: quizzes created by a batch job and its token use
+    # Deferred, so loading a job to claim or update it does not read them
+    _result = db.deferred(db.Column('result', CompressedText, nullable=True))  # JSON string of quiz data for guest jobs
+    _partial_result = db.deferred(db.Column('partial_result', CompressedText, nullable=True))  # JSON string of questions streamed so far
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='SET NULL'), nullable=True)
+    uploads = db.relationship('GenerationJobUpload', backref='job', lazy=True,
+                              cascade='all, delete-orphan', order_by='GenerationJobUpload.id')
+    result = compressed_text_property('_result')
+    partial_result = compressed_text_property('_partial_result')
+    
+    def __repr__(self):
+        return f'<GenerationJob {self.id} {self.status}>'
+
+class GenerationJobUpload(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('generation_job.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return f'<GenerationJobUpload {self.filename}>'
+
+class QuizCacheEntry(db.Model):
+    key = db.Column(db.String(64), primary_key=True)  # SHA-256 of the generation request
+    _content = db.Column('content', CompressedText, nullable=False)  # JSON string of quiz data
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    content = compressed_text_property('_content')
+    
+    def __repr__(self):
+        return f'<QuizCacheEntry {self.key[:12]}>'
+
+class ServerSession(db.Model):
+    session_id = db.Column(db.String(64), primary_key=True)  # Opaque id stored in the session cookie
+    data = db.Column(db.Text, nullable=False)  # Serialized session contents
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<ServerSession {self.session_id[:8]}>'
@@ -15,8 +15,14 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Set current year in footer
     setCurrentYear();
+    
+    // Autosave edits in the quiz preview editor
+    setupQuizAutosave();
 });
 
+// Delay after the last keystroke before edits are autosaved
+const AUTOSAVE_DELAY_MS = 1000;
+
 /**
  * Toggle password visibility in login/register forms
  */
@@ -105,6 +111,125 @@ function setCurrentYear() {
     });
 }
 
+/**
+ * Read a question of the preview editor from its form fields
+ * @param {HTMLElement} questionDiv - The .question-container element
+ * @returns {Object} - The question, in the shape stored for quizzes
+ */
+function collectQuestionData(questionDiv) {
+    const question = {
+        question: questionDiv.querySelector('.question-text').value,
+        answer: questionDiv.querySelector('.answer-text').value
+    };
+    
+    const optionsContainer = questionDiv.querySelector('.options-container');
+    if (optionsContainer) {
+        question.options = Array.from(optionsContainer.querySelectorAll('.option-text'), input => input.value);
+    }
+    
+    const explanationText = questionDiv.querySelector('.explanation-text');
+    if (explanationText) {
+        question.explanation = explanationText.value;
+    }
+    
+    const questionTypeSelect = questionDiv.querySelector('.question-type');
+    if (questionTypeSelect) {
+        question.question_type = questionTypeSelect.value;
+    }
+    
+    return question;
+}
+
+/**
+ * Autosave the preview editor: only the questions that changed are sent,
+ * as a PATCH to the URL in the form's data-autosave-url attribute
+ */
+function setupQuizAutosave() {
+    const form = document.getElementById('edit-quiz-form');
+    if (!form || !form.dataset.autosaveUrl) return;
+    
+    const titleInput = document.getElementById('quiz_title');
+    const statusElement = document.getElementById('autosave-status');
+    const csrfToken = form.querySelector('input[name="csrf_token"]').value;
+    const dirtyQuestions = new Set();
+    let titleDirty = false;
+    let saveTimer = null;
+    let saving = false;
+    
+    function setStatus(text) {
+        if (statusElement) statusElement.textContent = text;
+    }
+    
+    function scheduleSave() {
+        clearTimeout(saveTimer);
+        saveTimer = setTimeout(save, AUTOSAVE_DELAY_MS);
+        setStatus('Unsaved changes');
+    }
+    
+    async function save() {
+        // Wait for the request in flight, so edits are applied in order
+        if (saving) {
+            scheduleSave();
+            return;
+        }
+        if (dirtyQuestions.size === 0 && !titleDirty) return;
+        
+        const indices = Array.from(dirtyQuestions);
+        const sendTitle = titleDirty && titleInput.value.trim() !== '';
+        const body = {
+            questions: indices.map(index => Object.assign(
+                { index: Number(index) },
+                collectQuestionData(form.querySelector(`.question-container[data-index="${index}"]`))
+            ))
+        };
+        if (sendTitle) body.title = titleInput.value;
+        
+        dirtyQuestions.clear();
+        titleDirty = false;
+        saving = true;
+        setStatus('Saving...');
+        
+        try {
+            const response = await fetch(form.dataset.autosaveUrl, {
+                method: 'PATCH',
+                headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
+                body: JSON.stringify(body)
+            });
+            const data = await response.json();
+            if (!response.ok) throw new Error(data.error || `HTTP ${response.status}`);
+            setStatus('All changes saved');
+        } catch (error) {
+            // Keep the edits pending; they are sent again with the next change
+            indices.forEach(index => dirtyQuestions.add(index));
+            titleDirty = titleDirty || sendTitle;
+            setStatus(`Autosave failed: ${error.message}`);
+        } finally {
+            saving = false;
+        }
+    }
+    
+    form.addEventListener('input', function(e) {
+        const questionDiv = e.target.closest('.question-container');
+        if (!questionDiv) return;
+        dirtyQuestions.add(questionDiv.dataset.index);
+        scheduleSave();
+    });
+    
+    titleInput.addEventListener('input', function() {
+        titleDirty = true;
+        scheduleSave();
+    });
+    
+    // Resetting the editor rewrites every field without input events
+    form.addEventListener('quiz:reset', function() {
+        form.querySelectorAll('.question-container').forEach(questionDiv => {
+            dirtyQuestions.add(questionDiv.dataset.index);
+        });
+        titleDirty = true;
+        scheduleSave();
+    });
+}
+
 /**
  * Format file size to a human-readable format
  * @param {number} bytes - File size in bytes
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+import pytest
+
+# The app under test gets a database of its own; main.py reads this when it is imported
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix='quizcraft-tests-'), 'test.db'))
+
+@pytest.fixture(scope='session')
+def app():
+    from main import app
+    from database.db_init import init_database
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    init_database(app)
+    return app
+
+@pytest.fixture
+def make_user(app):
+    """
+    Return a function creating a user and a test client logged in as them.
+    """
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from models import User
+
+    def make(username):
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com',
+                        password_hash=generate_password_hash('password'))
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+        client = app.test_client()
+        client.post('/login', data={'username_or_email': username, 'password': 'password'})
+        return user_id, client
+    return make
@@ -0,0 +1,40 @@
+import json
+import zlib
+
+import pytest
+
+from utils.compressed_text import COMPRESSED_MAGIC, QUIZ_DICTIONARY, compress_text, decompress_text, is_compressed
+
+QUIZ_JSON = json.dumps([
+    {'question_type': 'Multiple Choice', 'question': 'Which organelle makes ATP?',
+     'options': ['Nucleus', 'Mitochondria', 'Ribosome', 'Golgi apparatus'], 'answer': 'B',
+     'explanation': 'Mitochondria carry out cellular respiration.'},
+    {'question_type': 'True/False', 'question': 'Ribosomes build proteins.', 'answer': 'True',
+     'explanation': 'Ribosomes translate mRNA into proteins.'},
+])
+
+def test_round_trip():
+    stored = compress_text(QUIZ_JSON)
+    assert is_compressed(stored)
+    assert len(stored) < len(QUIZ_JSON)
+    assert decompress_text(stored) == QUIZ_JSON
+
+def test_short_text_is_stored_as_it_is():
+    stored = compress_text('x')
+    assert stored == COMPRESSED_MAGIC + bytes([0]) + b'x'
+    assert decompress_text(stored) == 'x'
+
+def test_format_1_is_deflate_with_the_quiz_dictionary():
+    # Stored values must stay readable, so the format may not drift
+    stored = compress_text(QUIZ_JSON)
+    assert stored[len(COMPRESSED_MAGIC)] == 1
+    decompressor = zlib.decompressobj(zdict=QUIZ_DICTIONARY)
+    assert decompressor.decompress(stored[len(COMPRESSED_MAGIC) + 1:]).decode('utf-8') == QUIZ_JSON
+
+@pytest.mark.parametrize('value', [QUIZ_JSON, QUIZ_JSON.encode('utf-8'), None])
+def test_reads_uncompressed_values(value):
+    assert decompress_text(value) == (QUIZ_JSON if value is not None else None)
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        decompress_text(COMPRESSED_MAGIC + bytes([99]) + b'data')
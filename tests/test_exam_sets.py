@@ -0,0 +1,31 @@
+from utils.exam_sets import exam_version
+from utils.quiz_variants import answer_option_index
+
+QUIZ_DATA = [
+    {'question': 'Where are proteins made?', 'options': ['Nucleus', 'Ribosome', 'Golgi', 'Vacuole'], 'answer': 'B'},
+    {'question': 'Which organelle makes ATP?', 'options': ['Mitochondria', 'Lysosome', 'Nucleus', 'Golgi'],
+     'answer': 'A) Mitochondria'},
+    {'question': 'What stores water?', 'options': ['Vacuole', 'Ribosome', 'Nucleus', 'Golgi'], 'answer': 'Option A'},
+    {'question': 'What packages proteins?', 'options': ['Nucleus', 'Ribosome', 'Vacuole', 'Golgi'], 'answer': 'D. Golgi'},
+    {'question': 'What holds the DNA?', 'options': ['Ribosome', 'Nucleus', 'Golgi', 'Vacuole'], 'answer': 'Nucleus'},
+    {'question': 'The nucleus holds DNA.', 'answer': 'True'},
+]
+
+def _key_text(question):
+    return question['options'][answer_option_index(question['answer'], question['options'])]
+
+def test_every_version_key_points_at_the_source_option():
+    source = {question['question']: question for question in QUIZ_DATA}
+    for version in range(1, 21):
+        version_data = exam_version(QUIZ_DATA, 'quiz-1', version)
+        assert sorted(question['question'] for question in version_data) == sorted(source)
+        for question in version_data:
+            original = source[question['question']]
+            if 'options' in original:
+                assert _key_text(question) == _key_text(original)
+            else:
+                assert question['answer'] == original['answer']
+
+def test_versions_differ_and_repeat():
+    assert exam_version(QUIZ_DATA, 'quiz-1', 1) == exam_version(QUIZ_DATA, 'quiz-1', 1)
+    assert exam_version(QUIZ_DATA, 'quiz-1', 1) != exam_version(QUIZ_DATA, 'quiz-1', 2)
@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime, timedelta
+
+from utils.job_queue import JOB_STALE_SECONDS, JobQueue, recover_interrupted_jobs
+
+def _running_job(updated_at):
+    from app import db
+    from models import GenerationJob
+
+    job = GenerationJob(id=uuid.uuid4().hex, status='running', title='Cells', quiz_type='True/False',
+                        question_count=5, input_method='text', text_content='Cells', updated_at=updated_at)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def test_only_jobs_without_a_heartbeat_are_requeued(app):
+    from app import db
+    from models import GenerationJob
+
+    queue = JobQueue()
+    long_ago = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS + 60)
+    with app.app_context():
+        alive_id = _running_job(long_ago)
+        dead_id = _running_job(long_ago)
+        # alive_id is still being generated by this process
+        queue._running.add(alive_id)
+        assert queue.heartbeat() == 1
+
+        recover_interrupted_jobs()
+        db.session.expire_all()
+        assert db.session.get(GenerationJob, alive_id).status == 'running'
+        assert db.session.get(GenerationJob, dead_id).status == 'queued'
+        db.session.remove()
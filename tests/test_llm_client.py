@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from utils.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, LLMQueueTimeout
+from utils.llm_providers import LLMProvider
+
+class FlakyProvider(LLMProvider):
+    name = 'flaky'
+    model_name = 'flaky-1'
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def generate(self, prompt, timeout):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise TimeoutError("upstream timed out")
+        return 'ok'
+
+def open_breaker(reset_seconds=0.05):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_the_threshold():
+    breaker = open_breaker(reset_seconds=60)
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+def test_successful_trial_closes_the_breaker():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() is False
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+def test_cancelled_trial_lets_another_call_be_the_trial():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.cancel_trial()
+    assert breaker.allow() is True
+
+def test_trial_that_times_out_in_the_queue_is_cancelled():
+    client = LLMClient(FlakyProvider(0), requests_per_minute=1, queue_timeout=0.01, breaker=open_breaker())
+    client.request_bucket.acquire(1)
+    time.sleep(0.06)
+    with pytest.raises(LLMQueueTimeout):
+        client.generate('prompt')
+    assert client.breaker.allow() is True
+
+def test_cancelled_stream_gives_back_its_trial():
+    client = LLMClient(FlakyProvider(0), breaker=open_breaker())
+    time.sleep(0.06)
+    stream = client.stream('prompt')
+    assert next(stream) == 'ok'
+    stream.close()
+    assert client.breaker.allow() is True
+    assert client.stats()['in_flight'] == 0
+
+def test_client_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(LLMClient, '_backoff', lambda self, attempt: None)
+    provider = FlakyProvider(1)
+    client = LLMClient(provider, breaker=CircuitBreaker(failure_threshold=5))
+    assert client.generate('prompt') == 'ok'
+    assert provider.calls == 2
+    assert client.breaker.state == 'closed'
+
+class BrokenStreamProvider(FlakyProvider):
+    def __init__(self, error):
+        super().__init__(0)
+        self.error = error
+
+    def stream(self, prompt, timeout):
+        self.calls += 1
+        yield 'partial'
+        raise self.error
+
+@pytest.mark.parametrize('error, state', [(TimeoutError("upstream timed out"), 'open'),
+                                          (ValueError("response blocked"), 'closed')])
+def test_stream_failing_midway_only_trips_the_breaker_on_transient_errors(error, state):
+    provider = BrokenStreamProvider(error)
+    client = LLMClient(provider, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(type(error)):
+        list(client.stream('prompt'))
+    assert provider.calls == 1
+    assert client.breaker.state == state
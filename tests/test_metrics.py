@@ -0,0 +1,32 @@
+import json
+import os
+
+from utils import metrics
+from utils.metrics import Counter, Histogram, CallbackMetric
+
+def test_counters_and_histograms_are_summed_across_processes():
+    counter = Counter('test_merge_requests', 'Requests.', ['route'])
+    histogram = Histogram('test_merge_seconds', 'Latency.', ['route'], buckets=(0.1, 1.0))
+    counter.inc(2, route='a')
+    histogram.observe(0.05, route='a')
+
+    merged = counter.merge([(1, counter.values()), (2, {('a',): 3, ('b',): 1})])
+    assert merged == {('a',): 5, ('b',): 1}
+
+    other = {('a',): [[0, 1, 0], 0.5]}
+    assert histogram.merge([(1, histogram.values()), (2, other)]) == {('a',): [[1, 1, 0], 0.55]}
+
+def test_gauges_are_reported_per_live_process():
+    gauge = CallbackMetric('test_merge_in_flight', 'In flight.', lambda: [({'provider': 'local'}, 2)])
+    dead_pid = 2 ** 22 + 1
+    merged = gauge.merge([(os.getpid(), gauge.values()), (dead_pid, gauge.values())])
+    assert merged == {(('provider', 'local'), ('pid', str(os.getpid()))): 2}
+
+def test_render_reads_every_worker_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    counter = Counter('test_render_requests', 'Requests.', ['route'])
+    counter.inc(route='a')
+    with open(tmp_path / 'metrics-1.json', 'w') as f:
+        json.dump({'test_render_requests': [[['a'], 4]]}, f)
+
+    assert 'test_render_requests_total{route="a"} 5' in metrics.REGISTRY.render()
@@ -0,0 +1,43 @@
+import pytest
+
+from utils import quiz_generator
+from utils.quiz_generator import MAX_CONTENT_LENGTH, generate_quiz_chunked
+
+# Long enough for more than ten sections
+CONTENT = ' '.join(f'Sentence {index} about cells.' for index in range(12 * MAX_CONTENT_LENGTH // 25))
+
+def fake_generator(monkeypatch, questions_for):
+    calls = []
+
+    def generate(content, quiz_type, question_count, use_cache=True):
+        calls.append(question_count)
+        return questions_for(len(calls), question_count)
+
+    monkeypatch.setattr(quiz_generator, '_generate_quiz_for_content', generate)
+    return calls
+
+def numbered(call, question_count):
+    return [{'question': f'Question {call}.{index}', 'answer': 'A'} for index in range(question_count)]
+
+def test_sections_are_capped(monkeypatch):
+    monkeypatch.setattr(quiz_generator, 'CHUNKED_MAX_SECTIONS', 4)
+    calls = fake_generator(monkeypatch, numbered)
+    assert len(generate_quiz_chunked(CONTENT, 'Short Answer', 75)) == 75
+    assert len(calls) == 4
+    assert sum(calls) == 75
+
+def test_questions_lost_to_duplicates_are_topped_up(monkeypatch):
+    monkeypatch.setattr(quiz_generator, 'CHUNKED_MAX_SECTIONS', 4)
+    # Every section but the top-up asks the same questions
+    calls = fake_generator(monkeypatch, lambda call, count: numbered(call if call > 4 else 0, count))
+    quiz_data = generate_quiz_chunked(CONTENT, 'Short Answer', 20)
+    assert len(quiz_data) == 20
+    assert len(calls) == 5
+
+def test_short_quiz_fails_after_one_top_up(monkeypatch):
+    monkeypatch.setattr(quiz_generator, 'CHUNKED_MAX_SECTIONS', 4)
+    # The document only has five questions in it
+    calls = fake_generator(monkeypatch, lambda call, count: numbered(0, 5))
+    with pytest.raises(ValueError, match='of the 20 questions'):
+        generate_quiz_chunked(CONTENT, 'Short Answer', 20)
+    assert len(calls) == 5
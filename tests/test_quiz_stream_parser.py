@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from utils.quiz_generator import QuizStreamParser
+
+QUESTIONS = [
+    {'question_type': 'Short Answer', 'question': 'What does "ATP" stand for?',
+     'answer': 'Adenosine {tri}phosphate', 'explanation': 'A backslash \\ and a brace } inside strings.'},
+    {'question_type': 'Multiple Choice', 'question': 'Which is an organelle?',
+     'options': ['Nucleus', 'Atom', 'Tissue', 'Organ'], 'answer': 'A', 'details': {'nested': [1, {'deep': True}]}},
+]
+
+RESPONSE = "```json\n" + json.dumps(QUESTIONS, indent=2) + "\n```"
+
+@pytest.mark.parametrize('piece_size', [1, 7, 120, len(RESPONSE)])
+def test_questions_are_parsed_whatever_the_piece_size(piece_size):
+    parser = QuizStreamParser()
+    completed = []
+    for start in range(0, len(RESPONSE), piece_size):
+        completed.extend(parser.feed(RESPONSE[start:start + piece_size]))
+    assert completed == QUESTIONS
+    assert parser.questions == QUESTIONS
+
+def test_each_question_is_returned_when_its_brace_closes():
+    parser = QuizStreamParser()
+    first_end = RESPONSE.index('"answer": "A"')
+    assert parser.feed(RESPONSE[:first_end]) == QUESTIONS[:1]
+    assert parser.feed(RESPONSE[first_end:]) == QUESTIONS[1:]
+
+def test_text_before_the_array_is_ignored():
+    parser = QuizStreamParser()
+    assert parser.feed('Here is your quiz: {"not": "a question"} ') == []
+    assert parser.feed('[{"question": "Q?", "answer": "A"}]') == [{'question': 'Q?', 'answer': 'A'}]
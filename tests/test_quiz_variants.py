@@ -0,0 +1,51 @@
+import pytest
+
+from utils.quiz_variants import _remap_answer, answer_option_index, shuffle_quiz
+
+OPTIONS = ['Nucleus', 'Mitochondria', 'Ribosome', 'Golgi apparatus']
+
+# Original positions of the options in their new order: Ribosome, Nucleus, Golgi apparatus, Mitochondria
+ORDER = [2, 0, 3, 1]
+
+@pytest.mark.parametrize('answer, remapped', [
+    ('B', 'D'),
+    ('(B)', '(D)'),
+    ('b.', 'd.'),
+    ('Option B', 'Option D'),
+    ('B) Mitochondria', 'D) Mitochondria'),
+    ('B. Mitochondria', 'D. Mitochondria'),
+    ('B: mitochondria', 'D: mitochondria'),
+    ('Mitochondria', 'Mitochondria'),
+])
+def test_remap_answer_formats(answer, remapped):
+    assert _remap_answer(answer, OPTIONS, ORDER) == remapped
+
+@pytest.mark.parametrize('answer', [
+    'A) Mitochondria',  # The letter and the text name different options
+    'E',
+    'The powerhouse of the cell',
+    '',
+])
+def test_remap_answer_naming_no_option(answer):
+    assert _remap_answer(answer, OPTIONS, ORDER) is None
+
+def test_answer_option_index_prefers_the_option_text():
+    assert answer_option_index('A. Smith', ['Jones', 'A. Smith']) == 1
+
+@pytest.mark.parametrize('answer', ['C', 'C) Ribosome', 'Option C', 'Ribosome'])
+def test_shuffle_quiz_keeps_the_answer_on_its_option(answer):
+    quiz_data = [{'question': 'Where are proteins made?', 'options': OPTIONS, 'answer': answer}]
+    for seed in range(20):
+        question = shuffle_quiz(quiz_data, seed)[0]
+        assert question['options'][answer_option_index(question['answer'], question['options'])] == 'Ribosome'
+
+def test_shuffle_quiz_keeps_options_of_unmapped_answers_in_order():
+    quiz_data = [{'question': 'Which organelle?', 'options': OPTIONS, 'answer': 'The powerhouse of the cell'}]
+    for seed in range(5):
+        question = shuffle_quiz(quiz_data, seed)[0]
+        assert question['options'] == OPTIONS
+        assert question['answer'] == 'The powerhouse of the cell'
+
+def test_shuffle_quiz_is_deterministic():
+    quiz_data = [{'question': f'Q{index}', 'options': OPTIONS, 'answer': 'A'} for index in range(10)]
+    assert shuffle_quiz(quiz_data, 'quiz:1') == shuffle_quiz(quiz_data, 'quiz:1')
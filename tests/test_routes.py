@@ -0,0 +1,96 @@
+import re
+from datetime import datetime
+from urllib.parse import unquote
+
+import main
+from app import db
+from models import Quiz
+from main import parse_dashboard_cursor
+
+QUIZ_DATA = [
+    {'question': 'Which organelle makes ATP?', 'options': ['Nucleus', 'Mitochondria', 'Ribosome', 'Golgi'],
+     'answer': 'B', 'explanation': 'Mitochondria carry out respiration.'},
+    {'question': 'Where are proteins made?', 'options': ['Ribosome', 'Nucleus', 'Vacuole', 'Golgi'],
+     'answer': 'A', 'explanation': 'Ribosomes translate mRNA.'},
+]
+
+def save_quiz(app, user_id, title='Cells', created_at=None):
+    with app.app_context():
+        quiz = Quiz(title=title, quiz_type='Multiple Choice', question_count=len(QUIZ_DATA), user_id=user_id)
+        if created_at is not None:
+            quiz.created_at = created_at
+        quiz.set_quiz_data(QUIZ_DATA)
+        db.session.add(quiz)
+        db.session.commit()
+        return quiz.id
+
+def test_dashboard_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert parse_dashboard_cursor(f"{created_at.isoformat()}_42") == (created_at, 42)
+    assert parse_dashboard_cursor(None) is None
+    assert parse_dashboard_cursor('not-a-date_1') is None
+    assert parse_dashboard_cursor('2024-05-01T12:30:15_x') is None
+
+def test_dashboard_pages_list_every_quiz_once(app, make_user, monkeypatch):
+    user_id, client = make_user('pager')
+    # Quizzes created in the same instant are told apart by their id
+    created_at = datetime(2024, 5, 1, 12, 0, 0)
+    quiz_ids = [save_quiz(app, user_id, f'Quiz {index}', created_at) for index in range(5)]
+    monkeypatch.setattr(main, 'DASHBOARD_PAGE_SIZE', 2)
+
+    seen = []
+    url = '/dashboard'
+    while url:
+        page = client.get(url).get_data(as_text=True)
+        seen.extend(int(quiz_id) for quiz_id in re.findall(r'name="quiz_ids" value="(\d+)"', page))
+        next_link = re.search(r'href="(/dashboard\?after=[^"]+)"', page)
+        url = unquote(next_link.group(1)) if next_link else None
+
+    assert seen == sorted(quiz_ids, reverse=True)
+
+def test_preview_answers_304_until_the_quiz_changes(app, make_user):
+    user_id, client = make_user('previewer')
+    quiz_id = save_quiz(app, user_id)
+    client.get('/dashboard')  # Shows the login message, so the preview is cacheable
+
+    response = client.get(f'/preview/{quiz_id}')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert 'no-cache' in response.headers['Cache-Control']
+    # The page differs per visitor, so only the ETag validates it
+    assert 'Last-Modified' not in response.headers
+    assert client.get(f'/preview/{quiz_id}', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}).status_code == 200
+
+    assert client.get(f'/preview/{quiz_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    edited = client.patch(f'/quiz/{quiz_id}/questions', json={'questions': [{'index': 0, 'question': 'What makes ATP?'}]})
+    assert edited.status_code == 200
+    # The autosave only clears the hash; the next preview stores it again
+    with app.app_context():
+        assert db.session.get(Quiz, quiz_id).content_hash is None
+    response = client.get(f'/preview/{quiz_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    with app.app_context():
+        assert db.session.get(Quiz, quiz_id).content_hash is not None
+    assert client.get(f'/preview/{quiz_id}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_preview_etag_differs_per_visitor(app, make_user):
+    user_id, owner = make_user('owner')
+    _, other = make_user('visitor')
+    quiz_id = save_quiz(app, user_id)
+    for client in (owner, other):
+        client.get('/dashboard')
+
+    etag = owner.get(f'/preview/{quiz_id}').headers['ETag']
+    assert other.get(f'/preview/{quiz_id}', headers={'If-None-Match': etag}).status_code == 200
+
+def test_download_answers_304_for_a_current_copy(app, make_user):
+    user_id, client = make_user('downloader')
+    quiz_id = save_quiz(app, user_id)
+
+    response = client.get(f'/download/{quiz_id}')
+    assert response.status_code == 200
+    assert client.get(f'/download/{quiz_id}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(f'/download/{quiz_id}',
+                      headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
@@ -0,0 +1,131 @@
+import logging
+from datetime import datetime
+from concurrent.futures import wait, FIRST_COMPLETED
+
+def render_quiz_pdf(quiz_title, quiz_data):
+    """
+    Render a quiz to PDF bytes. Runs in a worker process.
+    """
+    from utils.pdf_exporter import create_quiz_pdf
+
+    return create_quiz_pdf(quiz_data, quiz_title).getvalue()
+
+def bulk_export_filename():
+    return f"quizcraft_quizzes_{datetime.utcnow().strftime('%Y-%m-%d')}.zip"
+
+def quiz_export_filename(quiz, extension):
+    """
+    Return the name of a quiz's file inside the archive; the id keeps
+    quizzes sharing a title apart.
+    """
+    from werkzeug.utils import secure_filename
+
+    return f"{quiz.id}-{secure_filename(quiz.title) or 'quiz'}.{extension}"
+
+def _read_cached_pdf(path):
+    try:
+        with open(path, 'rb') as pdf_file:
+            return pdf_file.read()
+    except FileNotFoundError:
+        # Pruned since it was looked up
+        return None
+
+def _finished_pdfs(pending):
+    """
+    Wait for at least one render to finish, cache what finished and yield it.
+    """
+    from utils.pdf_cache import store_pdf
+
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        filename, key = pending.pop(future)
+        pdf_data = future.result()
+        store_pdf(key, pdf_data)
+        yield filename, pdf_data
+
+def iter_quiz_pdfs(quiz_ids):
+    """
+    Yield the PDFs of several quizzes.
+
+    Quizzes are loaded one at a time. Already rendered PDFs are read from the
+    PDF cache; the others are rendered across the process pool, with only a
+    few in flight, and cached as they finish. Memory use therefore does not
+    grow with the number of quizzes.
+
+    Args:
+        quiz_ids (list): Ids of the quizzes to export
+
+    Yields:
+        tuple: (filename, PDF bytes), in the order the PDFs become ready
+    """
+    from app import db
+    from models import Quiz
+    from utils.pdf_cache import find_cached_pdf
+    from utils.render_pool import get_render_executor, render_window
+
+    executor = get_render_executor()
+    pending = {}
+    try:
+        for quiz_id in quiz_ids:
+            quiz = db.session.get(Quiz, quiz_id)
+            if quiz is None:
+                # Deleted while the archive was being written
+                continue
+
+            quiz_data = quiz.to_quiz_data()
+            filename = quiz_export_filename(quiz, 'pdf')
+            path, key = find_cached_pdf(quiz.title, quiz_data)
+            pdf_data = _read_cached_pdf(path) if path else None
+            if pdf_data is not None:
+                yield filename, pdf_data
+                continue
+
+            pending[executor.submit(render_quiz_pdf, quiz.title, quiz_data)] = (filename, key)
+            while len(pending) >= render_window():
+                yield from _finished_pdfs(pending)
+
+        while pending:
+            yield from _finished_pdfs(pending)
+    finally:
+        # The download failed or was abandoned; skip the renders nobody will read
+        for future in pending:
+            future.cancel()
+
+def iter_quiz_exports(quiz_ids, export_format):
+    """
+    Yield several quizzes in one of the lightweight export formats.
+
+    These are written in this process; they take far less time than a PDF
+    and do not need the render pool.
+
+    Args:
+        quiz_ids (list): Ids of the quizzes to export
+        export_format (str): A key of QUIZ_EXPORT_FORMATS
+
+    Yields:
+        tuple: (filename, file bytes), in the order of quiz_ids
+    """
+    from app import db
+    from models import Quiz
+    from utils.quiz_exporters import export_quiz, get_export_format
+
+    extension = get_export_format(export_format).extension
+    for quiz_id in quiz_ids:
+        quiz = db.session.get(Quiz, quiz_id)
+        if quiz is None:
+            continue
+        data = b''.join(export_quiz(export_format, quiz.to_quiz_data(), quiz.title, quiz.quiz_type))
+        yield quiz_export_filename(quiz, extension), data
+
+def stream_quiz_export_zip(quiz_ids, export_format='pdf'):
+    """
+    Yield a ZIP archive holding each quiz as a PDF or in a lightweight export format.
+    """
+    import zipfile
+    from utils.zip_stream import stream_zip
+
+    logging.info(f"Exporting {len(quiz_ids)} quizzes as {export_format} in a ZIP")
+    if export_format == 'pdf':
+        return stream_zip(iter_quiz_pdfs(quiz_ids))
+    # Text formats shrink well, unlike PDFs
+    return stream_zip(iter_quiz_exports(quiz_ids, export_format), compression=zipfile.ZIP_DEFLATED)
@@ -0,0 +1,137 @@
+import zlib
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+# Marks a compressed value; the byte after it is the format version
+COMPRESSED_MAGIC = b'QCZ'
+
+# Preset dictionary of the quiz JSON written by json.dumps: its keys, question
+# types and punctuation, and no question wording. Deflate finds matches more
+# cheaply near the end of the dictionary, so the most common fragments come
+# last. A format's dictionary must never change once values were written with
+# it; add a new format version instead.
+QUIZ_DICTIONARY = (
+    '"question_type": "Short Answer", '
+    '"question_type": "Fill in the Blanks", '
+    '"question_type": "True/False", '
+    '"question": "_____'
+    '", "answer": "False'
+    '", "answer": "True'
+    '"], "answer": "A'
+    '"], "answer": "B'
+    '"], "answer": "C'
+    '"], "answer": "D'
+    '", "explanation": "'
+    '"question_type": "Multiple Choice", "question": "'
+    '"], "answer": "'
+    '", "options": ["'
+    '"}, {"question_type": "'
+    '"}, {"question": "'
+    '", "question": "'
+    '", "answer": "'
+    '", "explanation": "'
+    '", "'
+).encode('utf-8')
+
+# Format version -> preset dictionary; format 0 holds the UTF-8 text as it is,
+# for values that deflate would not make smaller
+COMPRESSION_FORMATS = {
+    0: None,
+    1: QUIZ_DICTIONARY,
+}
+
+# The format new values are written in
+COMPRESSION_FORMAT = 1
+
+COMPRESSION_LEVEL = 6
+
+def is_compressed(value):
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:len(COMPRESSED_MAGIC)]) == COMPRESSED_MAGIC
+
+def compress_text(text):
+    """
+    Compress text into a value headed by the magic bytes and format version.
+    """
+    data = text.encode('utf-8')
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=COMPRESSION_FORMATS[COMPRESSION_FORMAT])
+    payload = compressor.compress(data) + compressor.flush()
+    if len(payload) >= len(data):
+        return COMPRESSED_MAGIC + bytes([0]) + data
+    return COMPRESSED_MAGIC + bytes([COMPRESSION_FORMAT]) + payload
+
+def decompress_text(value):
+    """
+    Return the text of a stored value.
+
+    Values written before compression are returned as they are: text as
+    read from SQLite, or UTF-8 bytes from columns converted to binary.
+
+    Raises:
+        ValueError: When the value was written in an unknown format version
+    """
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not is_compressed(value):
+        return value.decode('utf-8')
+
+    version = value[len(COMPRESSED_MAGIC)]
+    if version not in COMPRESSION_FORMATS:
+        raise ValueError(f"Unknown compression format {version}. Choose one of: {', '.join(map(str, COMPRESSION_FORMATS))}")
+    payload = value[len(COMPRESSED_MAGIC) + 1:]
+    if COMPRESSION_FORMATS[version] is None:
+        return payload.decode('utf-8')
+    decompressor = zlib.decompressobj(zdict=COMPRESSION_FORMATS[version])
+    return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+
+class CompressedText(TypeDecorator):
+    """
+    A text column stored compressed as binary.
+
+    Text is compressed when written. Reads return the stored value untouched;
+    map the column through compressed_text_property so it is only
+    decompressed when the attribute is used. Uncompressed values left by
+    older versions are read as they are until compress_stored_text converts
+    them.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or is_compressed(value):
+            return value
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return value
+
+def compressed_text_property(column_attribute):
+    """
+    Return a model attribute holding the text of a CompressedText column.
+
+    The stored value is decompressed on first access, and again only after it
+    changed. In queries the attribute stands for the column itself; column
+    queries return stored values, which decompress_text turns into text.
+
+    Args:
+        column_attribute (str): The model attribute mapped to the column
+    """
+    cache_attribute = f"{column_attribute}_text"
+
+    def get_text(self):
+        stored = getattr(self, column_attribute)
+        if stored is None:
+            return None
+        cached = self.__dict__.get(cache_attribute)
+        if cached is not None and cached[0] is stored:
+            return cached[1]
+        text = decompress_text(stored)
+        self.__dict__[cache_attribute] = (stored, text)
+        return text
+
+    def set_text(self, text):
+        # Compressed by the column type when the row is written
+        setattr(self, column_attribute, text)
+
+    return hybrid_property(get_text, set_text, expr=lambda cls: getattr(cls, column_attribute))
@@ -0,0 +1,130 @@
+import os
+import io
+import json
+import hashlib
+import logging
+from collections import deque
+
+# Largest exam set that can be requested at once
+EXAM_SET_MAX_VERSIONS = int(os.environ.get("QUIZCRAFT_EXAM_SET_MAX_VERSIONS", "200"))
+
+EXAM_SET_FORMATS = ['zip', 'pdf']
+
+def exam_set_seed(quiz_title, quiz_data):
+    """
+    Return the seed from which the versions of a quiz are shuffled.
+
+    It depends only on the quiz, so downloading the same exam set twice gives
+    the same versions, and editing the quiz gives new ones.
+    """
+    key_material = json.dumps([quiz_title, quiz_data])
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+def exam_version(quiz_data, seed, version):
+    """
+    Return version number version (from 1) of an exam set: the quiz with its
+    questions and options shuffled and its answers remapped to match.
+    """
+    from utils.quiz_variants import shuffle_quiz
+
+    return shuffle_quiz(quiz_data, f"{seed}:{version}")
+
+def render_exam_version(quiz_data, quiz_title, seed, version):
+    """
+    Render one version of an exam set. Runs in a worker process.
+
+    Returns:
+        tuple: (PDF of the copy handed to students, PDF of its answer key)
+    """
+    from utils.pdf_exporter import create_quiz_pdf
+
+    version_data = exam_version(quiz_data, seed, version)
+    version_title = f"{quiz_title} - Version {version}"
+    exam_pdf = create_quiz_pdf(version_data, version_title, include_answers=False)
+    answer_key_pdf = create_quiz_pdf(version_data, f"{version_title} Answer Key", include_questions=False)
+    return exam_pdf.getvalue(), answer_key_pdf.getvalue()
+
+def render_exam_set(quiz_data, quiz_title, versions):
+    """
+    Render the versions of an exam set across the process pool.
+
+    Only a few versions per worker are rendered ahead of the consumer, so
+    memory use does not grow with the number of versions.
+
+    Yields:
+        tuple: (version number, exam PDF bytes, answer key PDF bytes), in version order
+    """
+    from utils.render_pool import get_render_executor, render_window
+
+    seed = exam_set_seed(quiz_title, quiz_data)
+    executor = get_render_executor()
+    pending = deque()
+    next_version = 1
+    try:
+        while pending or next_version <= versions:
+            while next_version <= versions and len(pending) < render_window():
+                pending.append((next_version, executor.submit(render_exam_version, quiz_data, quiz_title,
+                                                              seed, next_version)))
+                next_version += 1
+
+            version, future = pending.popleft()
+            exam_pdf, answer_key_pdf = future.result()
+            yield version, exam_pdf, answer_key_pdf
+    finally:
+        # The download failed or was abandoned; skip the versions nobody will read
+        for _, future in pending:
+            future.cancel()
+
+def exam_set_filename(quiz_title, extension):
+    return f"{quiz_title.replace(' ', '_')}_exam_set.{extension}"
+
+def stream_exam_set_zip(quiz_data, quiz_title, versions):
+    """
+    Yield a ZIP archive holding a student copy and an answer key per version.
+    """
+    from utils.zip_stream import stream_zip
+
+    width = len(str(versions))
+
+    def entries():
+        for version, exam_pdf, answer_key_pdf in render_exam_set(quiz_data, quiz_title, versions):
+            yield f"version-{version:0{width}d}.pdf", exam_pdf
+            yield f"version-{version:0{width}d}-answer-key.pdf", answer_key_pdf
+
+    return stream_zip(entries())
+
+def build_exam_set_pdf(quiz_data, quiz_title, versions):
+    """
+    Combine an exam set into one printable PDF: every student copy in version
+    order, followed by every answer key.
+
+    Unlike the ZIP, the combined PDF is assembled in a temporary file before
+    it is sent, and the merger holds the pages it has read in memory.
+
+    Returns:
+        file: The combined PDF, positioned at its start
+    """
+    import tempfile
+    from PyPDF2 import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    answer_keys = tempfile.TemporaryFile()
+    answer_key_offsets = []
+    for _, exam_pdf, answer_key_pdf in render_exam_set(quiz_data, quiz_title, versions):
+        for page in PdfReader(io.BytesIO(exam_pdf)).pages:
+            writer.add_page(page)
+        # Answer keys go after all the copies, so park them on disk until then
+        answer_key_offsets.append((answer_keys.tell(), len(answer_key_pdf)))
+        answer_keys.write(answer_key_pdf)
+
+    for offset, length in answer_key_offsets:
+        answer_keys.seek(offset)
+        for page in PdfReader(io.BytesIO(answer_keys.read(length))).pages:
+            writer.add_page(page)
+    answer_keys.close()
+
+    combined = tempfile.TemporaryFile()
+    writer.write(combined)
+    combined.seek(0)
+    logging.info(f"Built a combined exam set of {versions} versions for {quiz_title}")
+    return combined
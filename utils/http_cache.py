@@ -0,0 +1,104 @@
+import json
+import time
+import hashlib
+import logging
+from werkzeug.http import is_resource_modified
+
+# Bump when preview_quiz.html changes, so browsers do not keep showing the old page
+PREVIEW_PAGE_VERSION = '1'
+
+def quiz_content_hash(quiz_data):
+    """
+    Return the hash of a question list stored in Quiz.content_hash.
+    """
+    return hashlib.sha256(json.dumps(quiz_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+def stored_content_hash(quiz):
+    """
+    Return the content hash of a saved quiz, computing and storing it when it is missing.
+
+    Edits of single questions clear the hash rather than load the whole quiz,
+    and quizzes saved before it existed have none. The computed hash is only
+    stored if the quiz was not edited again while its questions were read.
+    """
+    from app import db
+    from models import Quiz
+
+    if quiz.content_hash is not None:
+        return quiz.content_hash
+
+    quiz_id, seen_updated_at = quiz.id, quiz.updated_at
+    content_hash = quiz_content_hash(quiz.to_quiz_data())
+    unchanged = Quiz.updated_at.is_(None) if seen_updated_at is None else Quiz.updated_at == seen_updated_at
+    try:
+        Quiz.query.filter(Quiz.id == quiz_id, Quiz.content_hash.is_(None), unchanged) \
+            .update({'content_hash': content_hash}, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        # The hash is computed again next time
+        db.session.rollback()
+        logging.warning(f"Error storing the content hash of quiz {quiz_id}: {str(e)}")
+    return content_hash
+
+def quiz_etag(quiz, *parts):
+    """
+    Build the ETag of a page or file made from a saved quiz.
+
+    Uses the stored content hash, so the questions are only loaded after an
+    edit cleared it.
+
+    Args:
+        quiz (Quiz): The quiz
+        *parts: Anything else the response depends on
+
+    Returns:
+        str: The ETag
+    """
+    content_hash = stored_content_hash(quiz)
+    key = json.dumps([content_hash, quiz.title, quiz.quiz_type, *parts], default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+def preview_etag(quiz, viewer_id, csrf_token, csrf_time_limit, repeats):
+    """
+    Build the ETag of a quiz's preview page as seen by one visitor.
+
+    The page embeds a CSRF token that expires, so the ETag also changes every
+    half of its lifetime; a page revalidated from the browser cache never
+    carries a token that has expired. The "asked before" links shown to the
+    owner change when an earlier quiz is deleted, without the quiz changing.
+
+    Args:
+        repeats (dict): {question position: earlier quiz id} shown on the page
+    """
+    token_period = int(time.time() // (csrf_time_limit / 2)) if csrf_time_limit else None
+    return quiz_etag(quiz, PREVIEW_PAGE_VERSION, viewer_id, csrf_token, token_period, sorted(repeats.items()))
+
+def quiz_last_modified(quiz):
+    # Quizzes saved before updated_at existed have never been edited since
+    return quiz.updated_at or quiz.created_at
+
+def set_cache_headers(response, etag, last_modified):
+    """
+    Add the validators of a quiz response, and ask browsers to revalidate it on every use.
+
+    Pass no last_modified for pages that depend on more than the quiz.
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified_response(environ, etag, last_modified=None):
+    """
+    Return a 304 response when the browser's copy is current, otherwise None.
+
+    If-None-Match takes precedence over If-Modified-Since, as HTTP requires.
+    Without last_modified, If-Modified-Since is ignored and only the ETag decides.
+    """
+    from flask import Response
+
+    if is_resource_modified(environ, etag=etag, last_modified=last_modified):
+        return None
+    return set_cache_headers(Response(status=304), etag, last_modified)
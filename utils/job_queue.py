@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of quiz generations that may run at once in each web process
+JOB_WORKERS = int(os.environ.get("QUIZCRAFT_JOB_WORKERS", "2"))
+
+# Jobs left 'running' without a heartbeat for longer than this are assumed to belong to a dead worker
+JOB_STALE_SECONDS = int(os.environ.get("QUIZCRAFT_JOB_STALE_SECONDS", "600"))
+
+# How often each process touches the jobs it is running; must stay well below JOB_STALE_SECONDS
+JOB_HEARTBEAT_SECONDS = int(os.environ.get("QUIZCRAFT_JOB_HEARTBEAT_SECONDS", "60"))
+
+# Finished and failed jobs, with their guest results, are deleted this long after they ended
+JOB_TTL_SECONDS = int(os.environ.get("QUIZCRAFT_JOB_TTL_SECONDS", str(24 * 3600)))
+
+# How often expired jobs are deleted
+JOB_SWEEP_SECONDS = int(os.environ.get("QUIZCRAFT_JOB_SWEEP_SECONDS", "600"))
+
+# Streamed questions are published to partial_result at most this often, since
+# each write stores the whole list
+JOB_PARTIAL_RESULT_INTERVAL_SECONDS = 1.0
+
+class JobQueue:
+    """
+    A bounded worker pool that runs quiz generation jobs outside the request cycle.
+
+    Jobs are persisted in the GenerationJob table, so the pool only holds job ids.
+    A job is claimed with a conditional UPDATE before it runs, which keeps several
+    web processes from running the same job after a restart.
+
+    A maintenance thread checks that tesseract is installed and hands the jobs
+    left queued by a previous process to the pool. Every heartbeat_interval
+    seconds it touches updated_at on the jobs this process is running, so only
+    jobs whose process died go stale; every sweep_interval seconds it deletes
+    expired jobs and re-queues the stale ones.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, sweep_interval=JOB_SWEEP_SECONDS,
+                 heartbeat_interval=JOB_HEARTBEAT_SECONDS):
+        self.app = None
+        self.max_workers = max_workers
+        self.sweep_interval = sweep_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._executor = None
+        self._thread = None
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        # Only starts the thread; the database work happens there, outside the request
+        app.before_request(self.start)
+
+    def start(self):
+        """
+        Start the maintenance thread, once per process.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._maintain, name='job-maintenance', daemon=True)
+                self._thread.start()
+
+    def _maintain(self):
+        from app import db
+        from utils.ocr_reader import probe_tesseract
+
+        # Image jobs need tesseract; report a missing install when the process starts
+        probe_tesseract()
+        self.dispatch_queued()
+        next_sweep = time.monotonic() + self.sweep_interval
+        while True:
+            time.sleep(min(self.heartbeat_interval, self.sweep_interval))
+            try:
+                with self.app.app_context():
+                    self.heartbeat()
+                    requeued = 0
+                    if time.monotonic() >= next_sweep:
+                        next_sweep = time.monotonic() + self.sweep_interval
+                        sweep_expired_jobs()
+                        # Only the process whose update re-queued them submits them
+                        requeued = recover_interrupted_jobs()
+                    db.session.remove()
+                if requeued:
+                    self.dispatch_queued()
+            except Exception as e:
+                logging.error(f"Error sweeping generation jobs: {str(e)}")
+
+    def heartbeat(self):
+        """
+        Mark the jobs this process is running as alive. Must be called inside an
+        application context.
+
+        Returns:
+            int: The number of jobs touched
+        """
+        from app import db
+        from models import GenerationJob
+
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return 0
+        try:
+            touched = GenerationJob.query.filter(
+                GenerationJob.id.in_(job_ids),
+                GenerationJob.status == 'running'
+            ).update({'updated_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return touched
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='quizcraft-job')
+            return self._executor
+
+    def submit(self, job_id):
+        """
+        Schedule a persisted job to run on the worker pool.
+        """
+        logging.debug(f"Queueing generation job {job_id}")
+        # The maintenance thread keeps the job's heartbeat while it runs
+        self.start()
+        self.executor.submit(self._run, job_id)
+
+    def dispatch_queued(self):
+        """
+        Submit the jobs that were waiting when the previous process exited.
+
+        Every process does this once; the claim lets only one of them run each job.
+        """
+        from app import db
+        from models import GenerationJob
+
+        with self.app.app_context():
+            try:
+                job_ids = [job_id for (job_id,) in
+                           db.session.query(GenerationJob.id).filter_by(status='queued').all()]
+            except Exception as e:
+                logging.error(f"Error loading queued generation jobs: {str(e)}")
+                return
+            finally:
+                db.session.remove()
+
+        if job_ids:
+            logging.info(f"Dispatching {len(job_ids)} queued generation jobs")
+        for job_id in job_ids:
+            self.submit(job_id)
+
+    def _claim(self, job_id):
+        from app import db
+        from models import GenerationJob
+
+        claimed = GenerationJob.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'updated_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        from app import db
+        from models import GenerationJob
+
+        with self.app.app_context():
+            try:
+                if not self._claim(job_id):
+                    logging.debug(f"Generation job {job_id} already claimed")
+                    return
+                with self._lock:
+                    self._running.add(job_id)
+
+                job = db.session.get(GenerationJob, job_id)
+                try:
+                    process_generation_job(job)
+                except Exception as e:
+                    logging.error(f"Generation job {job_id} failed: {str(e)}")
+                    db.session.rollback()
+                    job = db.session.get(GenerationJob, job_id)
+                    # The uploads cannot be retried, so they are not kept
+                    job.uploads.clear()
+                    job.status = 'failed'
+                    job.error = str(e)
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error running generation job {job_id}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+                db.session.remove()
+
+job_queue = JobQueue()
+
+def recover_interrupted_jobs():
+    """
+    Re-queue jobs left running by processes that exited while generating them.
+
+    A running job's process touches its updated_at every JOB_HEARTBEAT_SECONDS
+    (see JobQueue.heartbeat), so a job without one for JOB_STALE_SECONDS has no
+    live owner. Runs from database/db_init.py before the web workers start, and
+    from each process's maintenance thread. Must be called inside an
+    application context.
+
+    Returns:
+        int: The number of jobs re-queued
+    """
+    from app import db
+    from models import GenerationJob
+
+    stale_before = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    requeued = GenerationJob.query.filter(
+        GenerationJob.status == 'running',
+        GenerationJob.updated_at < stale_before
+    ).update({'status': 'queued'}, synchronize_session=False)
+    db.session.commit()
+    return requeued
+
+def sweep_expired_jobs(ttl_seconds=JOB_TTL_SECONDS):
+    """
+    Delete finished and failed jobs, with their uploads and guest results, once
+    they are older than ttl_seconds. Must be called inside an application context.
+
+    Returns:
+        int: The number of jobs deleted
+    """
+    from app import db
+    from models import GenerationJob, GenerationJobUpload
+
+    expired = db.session.query(GenerationJob.id).filter(
+        GenerationJob.status.in_(['done', 'failed']),
+        GenerationJob.updated_at < datetime.utcnow() - timedelta(seconds=ttl_seconds)
+    )
+    try:
+        GenerationJobUpload.query.filter(GenerationJobUpload.job_id.in_(expired.scalar_subquery())) \
+            .delete(synchronize_session=False)
+        deleted = GenerationJob.query.filter(GenerationJob.id.in_(expired.scalar_subquery())) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if deleted:
+        logging.info(f"Swept {deleted} expired generation jobs")
+    return deleted
+
+def init_job_queue(app):
+    job_queue.init_app(app)
+
+def create_generation_job(title, quiz_type, question_count, input_method,
+                          text_content=None, uploads=None, user_id=None, use_cache=True,
+                          chunked=False, batch_types=None, batch_copies=0):
+    """
+    Persist a new generation job and hand it to the worker pool.
+
+    Args:
+        title (str): The title of the quiz
+        quiz_type (str): The type of quiz to generate
+        question_count (int): The number of questions to generate
+        input_method (str): One of 'text', 'file' or 'image'
+        text_content (str): Pasted content for the 'text' input method
+        uploads (list): (filename, bytes) pairs for the 'file' and 'image' input methods
+        user_id (int): The owner of the job, or None for guests
+        use_cache (bool): False to skip cached quizzes and ask for a fresh variant
+        chunked (bool): True to generate from the whole document in sections
+        batch_types (list): Quiz types to generate together from the same content,
+            making this a batch job; quiz_type is ignored
+        batch_copies (int): Shuffled copies to add of each quiz of a batch job
+
+    Returns:
+        GenerationJob: The queued job
+    """
+    from app import db
+    from models import GenerationJob, GenerationJobUpload
+
+    job = GenerationJob(
+        id=uuid.uuid4().hex,
+        status='queued',
+        title=title,
+        quiz_type=quiz_type,
+        question_count=question_count,
+        input_method=input_method,
+        text_content=text_content,
+        use_cache=use_cache,
+        chunked=chunked,
+        batch_types=json.dumps(batch_types) if batch_types else None,
+        batch_copies=batch_copies,
+        user_id=user_id
+    )
+    for filename, data in uploads or []:
+        job.uploads.append(GenerationJobUpload(filename=filename, data=data))
+
+    db.session.add(job)
+    db.session.commit()
+
+    job_queue.submit(job.id)
+    return job
+
+def extract_job_content(job):
+    """
+    Turn the stored input of a job into plain text for the quiz generator.
+    """
+    from utils.text_extractor import extract_text_from_file
+    from utils.ocr_reader import extract_text_from_images
+    from utils.quiz_generator import MAX_CONTENT_LENGTH
+
+    if job.input_method == 'text':
+        return job.text_content or ''
+
+    if not job.uploads:
+        return ''
+
+    if job.input_method == 'image':
+        try:
+            # Photographed pages are recognised together, in upload order
+            return extract_text_from_images([upload.data for upload in job.uploads])
+        except Exception as e:
+            raise ValueError(f"Error processing image: {str(e)}")
+
+    upload = job.uploads[0]
+    if job.input_method == 'file':
+        # Single-call generation only reads the start of the document
+        char_budget = None if job.chunked else MAX_CONTENT_LENGTH
+        return extract_text_from_file(upload.filename, upload.data, char_budget=char_budget)
+
+    raise ValueError(f"Unknown input method: {job.input_method}")
+
+def process_generation_job(job):
+    """
+    Extract the content of a claimed job, generate its quiz and store the result.
+
+    Logged-in users get a Quiz row and its Question rows;
+    guest results are kept on the job until the guest collects them. Single-call
+    jobs stream from Gemini and keep the questions received so far in
+    partial_result. Near-duplicate questions are dropped, and questions that
+    repeat one of the user's earlier quizzes are marked. Batch jobs are handed
+    to process_batch_job.
+    """
+    from app import db
+    from models import Quiz
+    from utils.quiz_generator import generate_quiz_chunked, stream_quiz_with_gemini
+    from utils.question_bank import drop_near_duplicates, mark_repeated_questions
+    from utils.metrics import STAGE_SECONDS
+
+    content = extract_job_content(job)
+    if not content:
+        raise ValueError("Please provide some content for the quiz.")
+
+    if job.batch_types:
+        process_batch_job(job, content)
+        return
+
+    if job.chunked:
+        quiz_data = generate_quiz_chunked(content, job.quiz_type, job.question_count,
+                                          use_cache=job.use_cache)
+    else:
+        quiz_data = []
+        next_publish = 0.0
+        for question in stream_quiz_with_gemini(content, job.quiz_type, job.question_count,
+                                                use_cache=job.use_cache):
+            quiz_data.append(question)
+            # Publish the questions received so far for the job's event stream
+            if time.monotonic() >= next_publish:
+                job.partial_result = json.dumps(quiz_data)
+                db.session.commit()
+                next_publish = time.monotonic() + JOB_PARTIAL_RESULT_INTERVAL_SECONDS
+
+    # The model sometimes asks the same thing twice in different words
+    quiz_data, dropped = drop_near_duplicates(quiz_data)
+    if dropped:
+        logging.info(f"Dropped {dropped} near-duplicate questions from generation job {job.id}")
+
+    with STAGE_SECONDS.time(stage='persist', kind='quiz' if job.user_id is not None else 'guest'):
+        if job.user_id is not None:
+            quiz = Quiz(
+                title=job.title,
+                quiz_type=job.quiz_type,
+                question_count=len(quiz_data),
+                user_id=job.user_id
+            )
+            quiz.set_quiz_data(quiz_data)
+            mark_repeated_questions(job.user_id, quiz.questions)
+            db.session.add(quiz)
+            db.session.flush()
+            job.quiz_id = quiz.id
+        else:
+            job.result = json.dumps(quiz_data)
+
+        # The uploaded files and streamed questions are no longer needed once the quiz exists
+        job.uploads.clear()
+        job.partial_result = None
+        job.status = 'done'
+        db.session.commit()
+    logging.info(f"Generation job {job.id} finished")
+
+def _batch_quiz_title(title, quiz_type, version, batch_types, batch_copies):
+    parts = [quiz_type] if len(batch_types) > 1 else []
+    if batch_copies:
+        parts.append(f"Version {version}")
+    suffix = f" ({', '.join(parts)})" if parts else ''
+    # Quiz titles hold at most 100 characters
+    return title[:100 - len(suffix)] + suffix
+
+def process_batch_job(job, content):
+    """
+    Generate every quiz of a batch job from its extracted content and store
+    them, with their shuffled copies, in one transaction.
+
+    The copies cost no LLM call. job.batch_report records the quizzes created
+    and the tokens used and saved; job.quiz_id is the first quiz.
+    """
+    from app import db
+    from models import Quiz
+    from utils.quiz_generator import generate_quiz_variants
+    from utils.quiz_variants import shuffle_quiz
+    from utils.question_bank import drop_near_duplicates, mark_repeated_questions
+    from utils.metrics import STAGE_SECONDS
+
+    if job.user_id is None:
+        raise ValueError("Log in to generate several quizzes at once.")
+
+    batch_types = json.loads(job.batch_types)
+    quizzes, report = generate_quiz_variants(content, batch_types, job.question_count,
+                                             use_cache=job.use_cache)
+
+    with STAGE_SECONDS.time(stage='persist', kind='batch'):
+        created = []
+        for quiz_type, quiz_data in quizzes.items():
+            quiz_data, dropped = drop_near_duplicates(quiz_data)
+            if dropped:
+                logging.info(f"Dropped {dropped} near-duplicate questions from generation job {job.id}")
+
+            for version in range(1, job.batch_copies + 2):
+                version_data = quiz_data if version == 1 else shuffle_quiz(quiz_data, f"{job.id}:{quiz_type}:{version}")
+                quiz = Quiz(
+                    title=_batch_quiz_title(job.title, quiz_type, version, batch_types, job.batch_copies),
+                    quiz_type=quiz_type,
+                    question_count=len(version_data),
+                    user_id=job.user_id
+                )
+                quiz.set_quiz_data(version_data)
+                created.append(quiz)
+
+        # Mark repeats of earlier quizzes before any quiz of the batch is flushed,
+        # so the quizzes of one batch are not flagged as repeats of each other
+        for quiz in created:
+            mark_repeated_questions(job.user_id, quiz.questions)
+        db.session.add_all(created)
+        db.session.flush()
+
+        # Every copy would otherwise have taken a call as large as its original
+        report['copy_saved_tokens'] = job.batch_copies * sum(report['call_tokens'].values())
+        report['quiz_ids'] = [quiz.id for quiz in created]
+        job.batch_report = json.dumps(report)
+        job.quiz_id = created[0].id
+        job.uploads.clear()
+        job.status = 'done'
+        db.session.commit()
+    logging.info(f"Batch generation job {job.id} created {len(created)} quizzes")
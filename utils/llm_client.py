@@ -0,0 +1,394 @@
+import os
+import time
+import random
+import logging
+import threading
+from utils.metrics import LLM_REQUEST_SECONDS, LLM_QUEUE_WAIT_SECONDS, LLM_TOKENS
+
+# Upstream quota shared by every request of this process
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("QUIZCRAFT_LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("QUIZCRAFT_LLM_TOKENS_PER_MINUTE", "1000000"))
+
+# Maximum number of LLM calls in flight at once
+LLM_MAX_CONCURRENCY = int(os.environ.get("QUIZCRAFT_LLM_MAX_CONCURRENCY", "8"))
+
+# Seconds a single upstream call may take
+LLM_TIMEOUT_SECONDS = float(os.environ.get("QUIZCRAFT_LLM_TIMEOUT_SECONDS", "120"))
+
+# Seconds a call may wait for rate limit capacity and a free slot before giving up
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("QUIZCRAFT_LLM_QUEUE_TIMEOUT_SECONDS", "60"))
+
+# Retries of transient errors, with exponential backoff between BASE and MAX seconds
+LLM_MAX_RETRIES = int(os.environ.get("QUIZCRAFT_LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 30.0
+
+# Consecutive failures that open the circuit breaker, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.environ.get("QUIZCRAFT_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("QUIZCRAFT_LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Rough size of a token, and the output tokens reserved per call, for the tokens/min budget
+CHARS_PER_TOKEN = 4
+LLM_OUTPUT_TOKEN_ESTIMATE = 2000
+
+# Upstream exceptions (by class name) worth retrying; google.api_core is not imported here
+TRANSIENT_ERROR_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'BadGateway', 'Aborted',
+}
+
+class LLMError(Exception):
+    """
+    Base class of errors raised by the LLM client.
+    """
+
+class TransientLLMError(LLMError):
+    """
+    An upstream failure that may succeed when retried.
+    """
+
+class LLMQueueTimeout(LLMError):
+    """
+    Raised when a call waited too long for rate limit capacity or a free slot.
+    """
+
+class CircuitOpenError(LLMError):
+    """
+    Raised without calling upstream while the circuit breaker is open.
+    """
+
+def estimate_tokens(prompt):
+    return len(prompt) // CHARS_PER_TOKEN + LLM_OUTPUT_TOKEN_ESTIMATE
+
+def is_transient_error(error):
+    """
+    Return True for errors that may succeed when the call is retried.
+    """
+    if isinstance(error, (TransientLLMError, TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled continuously at rate_per_minute.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """
+        Take amount tokens, waiting for the bucket to refill when needed.
+
+        Returns:
+            bool: False when the tokens could not be taken within timeout
+        """
+        amount = min(amount, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return True
+                wait = (amount - self._tokens) / self.rate
+
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+    def release(self, amount=1):
+        """
+        Return tokens taken for a call that was never made.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+class CircuitBreaker:
+    """
+    Fails calls fast after repeated upstream failures.
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for reset_seconds. It then lets one trial call through; the circuit
+    closes again when that call succeeds.
+    """
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_seconds=LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """
+        Raise CircuitOpenError when calls are currently being rejected.
+
+        Returns:
+            bool: True when the call is the trial of a half-open breaker; it
+                must end in record_success, record_failure or cancel_trial
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+        raise CircuitOpenError("The quiz generation service is temporarily unavailable. Please try again shortly.")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def cancel_trial(self):
+        """
+        Let another call be the trial, after the trial call ended without an upstream answer.
+        """
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning(f"Opening LLM circuit breaker after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+class LLMClient:
+    """
+    Process-wide gateway to the LLM provider.
+
+    Every call passes the circuit breaker, waits for requests/min and tokens/min
+    capacity and for one of max_concurrency slots, and is retried with
+    exponential backoff and jitter on transient errors.
+    """
+
+    def __init__(self, provider,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_concurrency=LLM_MAX_CONCURRENCY,
+                 timeout=LLM_TIMEOUT_SECONDS,
+                 queue_timeout=LLM_QUEUE_TIMEOUT_SECONDS,
+                 max_retries=LLM_MAX_RETRIES,
+                 breaker=None):
+        self.provider = provider
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'calls': 0, 'failures': 0, 'retries': 0, 'queue_timeouts': 0, 'circuit_rejections': 0,
+            'in_flight': 0, 'queue_wait_seconds': 0.0, 'upstream_seconds': 0.0,
+        }
+
+    @property
+    def model_name(self):
+        return self.provider.model_name
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        """
+        Return a snapshot of the call counters for this process.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['circuit_state'] = self.breaker.state
+        return stats
+
+    def _admit(self, prompt):
+        """
+        Wait for rate limit capacity and a concurrency slot.
+
+        Returns:
+            bool: True when the call is the trial of a half-open circuit breaker
+        """
+        try:
+            is_trial = self.breaker.allow()
+        except CircuitOpenError:
+            self._count('circuit_rejections')
+            raise
+
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        tokens = estimate_tokens(prompt)
+        has_request = self.request_bucket.acquire(1, timeout=self.queue_timeout)
+        has_tokens = has_request and self.token_bucket.acquire(tokens, timeout=max(0.0, deadline - time.monotonic()))
+        admitted = has_tokens and self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        waited = time.monotonic() - started
+        self._count('queue_wait_seconds', waited)
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, provider=self.provider.name)
+        if not admitted:
+            # The call is never made, so it gives back its quota and its trial
+            if has_request:
+                self.request_bucket.release(1)
+            if has_tokens:
+                self.token_bucket.release(tokens)
+            if is_trial:
+                self.breaker.cancel_trial()
+            self._count('queue_timeouts')
+            raise LLMQueueTimeout("The quiz generation service is busy. Please try again in a minute.")
+
+        self._count('in_flight')
+        return is_trial
+
+    def _release(self, started, mode, outcome):
+        self._slots.release()
+        self._count('in_flight', -1)
+        elapsed = time.monotonic() - started
+        self._count('upstream_seconds', elapsed)
+        LLM_REQUEST_SECONDS.observe(elapsed, provider=self.provider.name, mode=mode, outcome=outcome)
+
+    def _count_tokens(self, prompt, response_length):
+        LLM_TOKENS.inc(len(prompt) // CHARS_PER_TOKEN, provider=self.provider.name, direction='prompt')
+        LLM_TOKENS.inc(response_length // CHARS_PER_TOKEN, provider=self.provider.name, direction='completion')
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retries of a burst of requests from arriving together
+        delay = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        time.sleep(random.uniform(0, delay))
+
+    def _handle_failure(self, error, attempt):
+        """
+        Record a failed attempt and decide whether to retry it.
+        """
+        if not is_transient_error(error):
+            # The upstream answered, so a rejected request says nothing about its health
+            self.breaker.record_success()
+            self._count('failures')
+            return False
+
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self._count('failures')
+            return False
+
+        self._count('retries')
+        logging.warning(f"Retrying LLM call after transient error: {str(error)}")
+        self._backoff(attempt)
+        return True
+
+    def generate(self, prompt):
+        """
+        Send a prompt and return the complete response text.
+        """
+        self.provider.check_configured()
+        attempt = 0
+        while True:
+            self._admit(prompt)
+            self._count('calls')
+            started = time.monotonic()
+            try:
+                text = self.provider.generate(prompt, self.timeout)
+            except Exception as e:
+                self._release(started, 'generate', 'error')
+                if not self._handle_failure(e, attempt):
+                    raise
+                attempt += 1
+                continue
+
+            self._release(started, 'generate', 'success')
+            self._count_tokens(prompt, len(text))
+            self.breaker.record_success()
+            return text
+
+    def stream(self, prompt):
+        """
+        Send a prompt and yield the response text as it arrives.
+
+        A call is only retried when it fails before any text was received.
+        """
+        self.provider.check_configured()
+        attempt = 0
+        while True:
+            is_trial = self._admit(prompt)
+            self._count('calls')
+            started = time.monotonic()
+            received = 0
+            try:
+                for text in self.provider.stream(prompt, self.timeout):
+                    received += len(text)
+                    yield text
+            except Exception as e:
+                self._release(started, 'stream', 'error')
+                # Text already yielded cannot be taken back, so a call that failed
+                # midway is recorded like a final attempt and not retried
+                if not self._handle_failure(e, self.max_retries if received else attempt):
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                # The consumer stopped reading (e.g. GeneratorExit); free the slot, and the
+                # trial, which says nothing about the upstream's health
+                self._release(started, 'stream', 'cancelled')
+                self._count_tokens(prompt, received)
+                if is_trial:
+                    self.breaker.cancel_trial()
+                raise
+
+            self._release(started, 'stream', 'success')
+            self._count_tokens(prompt, received)
+            self.breaker.record_success()
+            return
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client():
+    """
+    Return the process-wide LLM client, creating it on first use.
+    """
+    global _llm_client
+
+    with _llm_client_lock:
+        if _llm_client is None:
+            from utils.llm_providers import create_provider
+            _llm_client = LLMClient(create_provider())
+        return _llm_client
+
+def peek_llm_client():
+    """
+    Return the process-wide LLM client if it has been created, without creating it.
+    """
+    return _llm_client
+
+def set_llm_client(client):
+    """
+    Replace the process-wide LLM client, e.g. with one using LocalProvider.
+    """
+    global _llm_client
+
+    with _llm_client_lock:
+        _llm_client = client
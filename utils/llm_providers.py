@@ -0,0 +1,279 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+
+# Which provider generates quizzes: "gemini" or "local" (the offline stand-in)
+LLM_PROVIDER = os.environ.get("QUIZCRAFT_LLM_PROVIDER", "gemini")
+
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+GEMINI_MODEL_NAME = 'gemini-1.5-pro'
+
+# Behaviour of the local provider: total seconds per response, fraction of calls
+# that fail with a transient error, and the seed of the failure sequence
+LOCAL_LLM_LATENCY_SECONDS = float(os.environ.get("QUIZCRAFT_LOCAL_LLM_LATENCY_SECONDS", "0"))
+LOCAL_LLM_FAILURE_RATE = float(os.environ.get("QUIZCRAFT_LOCAL_LLM_FAILURE_RATE", "0"))
+LOCAL_LLM_SEED = int(os.environ.get("QUIZCRAFT_LOCAL_LLM_SEED", "0"))
+
+class LLMProvider:
+    """
+    Interface of the services that turn a quiz prompt into response text.
+
+    Subclasses implement generate(); stream() defaults to yielding the whole
+    response at once.
+    """
+
+    name = None
+    model_name = None
+
+    def check_configured(self):
+        """
+        Raise ValueError when the provider cannot be used, e.g. without credentials.
+        """
+
+    def generate(self, prompt, timeout):
+        """
+        Return the complete response text for a prompt.
+
+        Args:
+            prompt (str): The prompt built by build_quiz_prompt
+            timeout (float): Seconds the call may take
+
+        Returns:
+            str: The response text
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout):
+        """
+        Yield the response text for a prompt in pieces, as they are produced.
+        """
+        yield self.generate(prompt, timeout)
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini, reusing one GenerativeModel for every call.
+    """
+
+    name = 'gemini'
+
+    def __init__(self, model_name=GEMINI_MODEL_NAME, api_key=GEMINI_API_KEY):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def check_configured(self):
+        if not self.api_key:
+            raise ValueError("Gemini API key is required. Please set the GEMINI_API_KEY environment variable.")
+
+    def _get_model(self):
+        import google.generativeai as genai
+
+        with self._lock:
+            if self._model is None:
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    def generate(self, prompt, timeout):
+        response = self._get_model().generate_content(prompt, request_options={'timeout': timeout})
+        return response.text
+
+    def stream(self, prompt, timeout):
+        response = self._get_model().generate_content(prompt, stream=True,
+                                                      request_options={'timeout': timeout})
+        for chunk in response:
+            yield chunk.text
+
+# Quiz type names as they appear in the prompts of build_quiz_prompt
+PROMPT_QUIZ_TYPES = {
+    'multiple-choice': 'Multiple Choice',
+    'true/false': 'True/False',
+    'fill-in-the-blanks': 'Fill in the Blanks',
+    'short answer': 'Short Answer',
+    'mixed-type': 'Mixed',
+}
+
+MIXED_QUESTION_TYPES = ['Multiple Choice', 'True/False', 'Fill in the Blanks', 'Short Answer']
+
+STOP_WORDS = {
+    'about', 'after', 'also', 'because', 'been', 'before', 'being', 'between', 'both', 'could',
+    'does', 'each', 'from', 'have', 'into', 'more', 'most', 'much', 'only', 'other', 'over',
+    'same', 'should', 'some', 'such', 'than', 'that', 'their', 'them', 'then', 'there', 'these',
+    'they', 'this', 'those', 'through', 'under', 'very', 'were', 'what', 'when', 'where',
+    'which', 'while', 'will', 'with', 'would', 'your',
+}
+
+# Used as distractors when the content has too few distinct terms
+FILLER_TERMS = ['process', 'structure', 'function', 'element', 'method', 'system']
+
+class LocalProvider(LLMProvider):
+    """
+    An offline, deterministic stand-in for the LLM.
+
+    Reads the quiz type, question count and content from the prompt and builds
+    schema-valid questions from the content's own sentences, so the whole
+    generation pipeline can be load-tested and benchmarked without network
+    access. The same prompt always produces the same quiz.
+
+    Args:
+        latency (float): Seconds each response takes, spread over the stream
+        failure_rate (float): Fraction of calls that raise a transient error
+        seed (int): Seed of the failure sequence
+    """
+
+    name = 'local'
+    model_name = 'local-stand-in-1'
+
+    def __init__(self, latency=LOCAL_LLM_LATENCY_SECONDS, failure_rate=LOCAL_LLM_FAILURE_RATE,
+                 seed=LOCAL_LLM_SEED):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._failures = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self, timeout):
+        from utils.llm_client import TransientLLMError
+
+        with self._lock:
+            fail = self._failures.random() < self.failure_rate
+        if fail:
+            raise TransientLLMError("Injected failure from the local LLM provider")
+        if self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Local LLM provider timed out after {timeout} seconds")
+
+    def generate(self, prompt, timeout):
+        self._maybe_fail(timeout)
+        time.sleep(self.latency)
+        return json.dumps(build_local_quiz(prompt), indent=2)
+
+    def stream(self, prompt, timeout):
+        self._maybe_fail(timeout)
+        questions = build_local_quiz(prompt)
+        delay = self.latency / (len(questions) + 1)
+
+        time.sleep(delay)
+        yield '```json\n['
+        for index, question in enumerate(questions):
+            time.sleep(delay)
+            yield (',' if index else '') + '\n' + json.dumps(question, indent=2)
+        yield '\n]\n```'
+
+def parse_quiz_prompt(prompt):
+    """
+    Recover the request behind a prompt built by build_quiz_prompt.
+
+    Returns:
+        tuple: (quiz_type, question_count, content)
+    """
+    # The instructions follow the content, which may itself contain similar wording
+    matches = list(re.finditer(r'Create an? ([\w/ -]+?) quiz with (\d+) questions', prompt))
+    if not prompt.startswith('Content:') or not matches or matches[-1].group(1) not in PROMPT_QUIZ_TYPES:
+        raise ValueError("The local LLM provider only understands QuizCraft quiz prompts")
+
+    match = matches[-1]
+    content = prompt[len('Content:'):match.start()].strip()
+    return PROMPT_QUIZ_TYPES[match.group(1)], int(match.group(2)), content
+
+def _key_terms(sentence):
+    """
+    Return the distinct content words of a sentence, longest first.
+    """
+    terms = []
+    for word in re.findall(r"[A-Za-z][A-Za-z'-]{3,}", sentence):
+        if word.lower() not in STOP_WORDS and word not in terms:
+            terms.append(word)
+    return sorted(terms, key=len, reverse=True)
+
+def _content_sentences(content):
+    # Sentences end at terminal punctuation or a blank line (headings, list items)
+    sentences = [' '.join(sentence.split()) for sentence in re.split(r'(?<=[.!?])\s+|\n\s*\n', content)
+                 if len(_key_terms(sentence)) >= 2]
+    if sentences:
+        return sentences
+
+    # Fall back to fixed windows of words for text without sentence punctuation
+    words = content.split()
+    return [' '.join(words[start:start + 12]) for start in range(0, len(words), 12)] or [content]
+
+def _build_question(question_type, sentence, term, distractors, rng):
+    blanked = re.sub(rf'\b{re.escape(term)}\b', '_____', sentence, count=1)
+
+    if question_type == 'Multiple Choice':
+        options = [term] + distractors[:3]
+        rng.shuffle(options)
+        return {
+            "question": f"Which term completes the statement: \"{blanked}\"?",
+            "options": options,
+            "answer": 'ABCD'[options.index(term)],
+            "explanation": f"The content states: \"{sentence}\"",
+        }
+
+    if question_type == 'True/False':
+        is_true = rng.random() < 0.5
+        statement = sentence if is_true else blanked.replace('_____', distractors[0])
+        return {
+            "question": statement,
+            "answer": "True" if is_true else "False",
+            "explanation": f"The content states: \"{sentence}\"",
+        }
+
+    if question_type == 'Fill in the Blanks':
+        return {
+            "question": blanked,
+            "answer": term,
+            "explanation": f"The content states: \"{sentence}\"",
+        }
+
+    return {
+        "question": f"According to the content, what term belongs in this statement: \"{blanked}\"?",
+        "answer": term,
+        "explanation": f"The content states: \"{sentence}\"",
+    }
+
+def build_local_quiz(prompt):
+    """
+    Build the quiz the local provider returns for a prompt.
+
+    Returns:
+        list: Question dicts in the format requested by the prompt
+    """
+    quiz_type, question_count, content = parse_quiz_prompt(prompt)
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+
+    sentences = _content_sentences(content)
+    vocabulary = _key_terms(content) + FILLER_TERMS
+
+    questions = []
+    for index in range(question_count):
+        sentence = sentences[index % len(sentences)]
+        terms = _key_terms(sentence) or [sentence.split()[0]]
+        # Later passes over the same sentence ask about a different term
+        term = terms[(index // len(sentences)) % len(terms)]
+        distractors = rng.sample([word for word in vocabulary if word.lower() != term.lower()][:40], 3)
+
+        question_type = MIXED_QUESTION_TYPES[index % 4] if quiz_type == 'Mixed' else quiz_type
+        question = _build_question(question_type, sentence, term, distractors, rng)
+        if quiz_type == 'Mixed':
+            question = dict(question_type=question_type, **question)
+        questions.append(question)
+
+    return questions
+
+LLM_PROVIDERS = {
+    'gemini': GeminiProvider,
+    'local': LocalProvider,
+}
+
+def create_provider(name=LLM_PROVIDER):
+    """
+    Instantiate the provider registered under name.
+    """
+    if name not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}'. Choose one of: {', '.join(LLM_PROVIDERS)}")
+    return LLM_PROVIDERS[name]()
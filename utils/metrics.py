@@ -0,0 +1,410 @@
+import os
+import json
+import time
+import bisect
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+# When set, /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get("QUIZCRAFT_METRICS_TOKEN", "")
+
+# Directory shared by the worker processes of one server. Metrics are kept per
+# process, so with several workers /metrics only reports the one that answered;
+# when this is set, every worker writes its metrics here and /metrics reports
+# their totals. Empty it before the server starts.
+METRICS_DIR = os.environ.get("QUIZCRAFT_METRICS_DIR", "")
+
+# How often each worker writes its metrics to METRICS_DIR
+METRICS_FLUSH_SECONDS = float(os.environ.get("QUIZCRAFT_METRICS_FLUSH_SECONDS", "5"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Upper bounds of the per-request query count histogram
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _as_key(value):
+    # Label keys come back from JSON as lists
+    return tuple(_as_key(item) for item in value) if isinstance(value, list) else value
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Metric:
+    """
+    Base class of the metrics kept in REGISTRY.
+    """
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def values(self):
+        """
+        Return a copy of this process's values, keyed by label values.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, processes):
+        """
+        Combine the values of several processes into one set of values.
+
+        Args:
+            processes (list): (pid, values) pairs, values as returned by values()
+        """
+        merged = {}
+        for pid, values in processes:
+            for key, value in values.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def _samples(self, values):
+        raise NotImplementedError
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self._samples(self.values() if values is None else values):
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as a number of requests.
+    """
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, values):
+        return [('_total', list(zip(self.labelnames, key)), value) for key, value in sorted(values.items())]
+
+class Histogram(Metric):
+    """
+    Observations counted into cumulative buckets, with their sum and count.
+    """
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (the last is +Inf), sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the with block, in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def values(self):
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._values.items()}
+
+    def merge(self, processes):
+        merged = {}
+        for pid, values in processes:
+            for key, (counts, total) in values.items():
+                series = merged.setdefault(key, [[0] * len(counts), 0.0])
+                series[0] = [merged_count + count for merged_count, count in zip(series[0], counts)]
+                series[1] += total
+        return merged
+
+    def _samples(self, values):
+        samples = []
+        for key, (counts, total) in sorted(values.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('_bucket', labels + [('le', _format_value(float(bound)))], cumulative))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, cumulative))
+        return samples
+
+class CallbackMetric(Metric):
+    """
+    A gauge or counter whose values are read at scrape time from a collect function,
+    for state that is already tracked elsewhere (such as cache statistics).
+
+    collect returns a list of (labels dict, value) pairs. Across processes,
+    counters are summed, and gauges are reported per live process with a pid label.
+    """
+
+    def __init__(self, name, documentation, collect, type_name='gauge'):
+        super().__init__(name, documentation)
+        self.collect = collect
+        self.type_name = type_name
+
+    def values(self):
+        return {tuple(sorted(labels.items())): value for labels, value in self.collect()}
+
+    def merge(self, processes):
+        if self.type_name == 'counter':
+            return super().merge(processes)
+        return {key + (('pid', str(pid)),): value
+                for pid, values in processes if _process_alive(pid)
+                for key, value in values.items()}
+
+    def _samples(self, values):
+        suffix = '_total' if self.type_name == 'counter' else ''
+        return [(suffix, list(key), value) for key, value in sorted(values.items())]
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+
+        With METRICS_DIR set, the totals of every worker process are reported.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        processes = self._read_processes() if METRICS_DIR else None
+        lines = []
+        for metric in metrics:
+            if processes is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(metric.merge([(pid, values.get(metric.name, {}))
+                                                         for pid, values in processes])))
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """
+        Write this process's metrics to its file in METRICS_DIR.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        snapshot = {metric.name: [[key, value] for key, value in metric.values().items()] for metric in metrics}
+        path = os.path.join(METRICS_DIR, f"metrics-{os.getpid()}.json")
+        # Written aside and renamed, so a scrape never reads half a file
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+
+    def _read_processes(self):
+        # This process's file is rewritten first, so its own values are current
+        self.flush()
+        processes = []
+        for filename in sorted(os.listdir(METRICS_DIR)):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Skipping metrics file {filename}: {str(e)}")
+                continue
+            pid = int(filename[len('metrics-'):-len('.json')])
+            processes.append((pid, {name: {_as_key(key): value for key, value in values}
+                                    for name, values in snapshot.items()}))
+        return processes
+
+REGISTRY = Registry()
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def _flush_metrics():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            REGISTRY.flush()
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {METRICS_DIR}: {str(e)}")
+
+def start_metrics_flusher():
+    """
+    Start writing this process's metrics to METRICS_DIR, once per process.
+    """
+    global _flusher
+
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_metrics, name='metrics-flush', daemon=True)
+            _flusher.start()
+            # Keep what a worker counted after its last flush when it exits
+            atexit.register(REGISTRY.flush)
+
+# Hot-path stages of quiz generation and export
+STAGE_SECONDS = Histogram(
+    'quizcraft_stage_duration_seconds',
+    'Time spent in each stage of quiz generation and export.',
+    ['stage', 'kind'])
+
+LLM_REQUEST_SECONDS = Histogram(
+    'quizcraft_llm_request_duration_seconds',
+    'Latency of upstream LLM calls, from request to the last byte of the response.',
+    ['provider', 'mode', 'outcome'])
+
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    'quizcraft_llm_queue_wait_seconds',
+    'Time LLM calls waited for rate limit capacity and a concurrency slot.',
+    ['provider'])
+
+LLM_TOKENS = Counter(
+    'quizcraft_llm_tokens',
+    'Estimated tokens sent to and received from the LLM (4 characters per token).',
+    ['provider', 'direction'])
+
+REQUEST_SECONDS = Histogram(
+    'quizcraft_http_request_duration_seconds',
+    'Time to produce the response of each route; streamed bodies are not included.',
+    ['endpoint', 'method', 'status'])
+
+REQUEST_DB_QUERIES = Histogram(
+    'quizcraft_http_request_db_queries',
+    'Database queries executed while handling a request.',
+    ['endpoint'], buckets=QUERY_COUNT_BUCKETS)
+
+def _cache_request_samples():
+    from utils.quiz_cache import quiz_cache
+    from utils.pdf_cache import pdf_cache_stats
+
+    quiz_stats = quiz_cache.stats()
+    pdf_stats = pdf_cache_stats()
+    return [
+        ({'cache': 'quiz', 'result': 'memory_hit'}, quiz_stats['memory_hits']),
+        ({'cache': 'quiz', 'result': 'db_hit'}, quiz_stats['db_hits']),
+        ({'cache': 'quiz', 'result': 'miss'}, quiz_stats['misses']),
+        ({'cache': 'pdf', 'result': 'hit'}, pdf_stats['hits']),
+        ({'cache': 'pdf', 'result': 'miss'}, pdf_stats['misses']),
+    ]
+
+def _cache_hit_ratio_samples():
+    from utils.quiz_cache import quiz_cache
+    from utils.pdf_cache import pdf_cache_stats
+
+    return [
+        ({'cache': 'quiz'}, quiz_cache.stats()['hit_ratio']),
+        ({'cache': 'pdf'}, pdf_cache_stats()['hit_ratio']),
+    ]
+
+def _llm_client_samples(name):
+    def collect():
+        from utils.llm_client import peek_llm_client
+
+        client = peek_llm_client()
+        if client is None:
+            return []
+        return [({'provider': client.provider.name}, client.stats()[name])]
+    return collect
+
+def _llm_circuit_samples():
+    from utils.llm_client import peek_llm_client
+
+    client = peek_llm_client()
+    if client is None:
+        return []
+    return [({'provider': client.provider.name}, 1 if client.breaker.state == 'open' else 0)]
+
+CallbackMetric('quizcraft_cache_requests', 'Cache lookups by result since the process started.',
+               _cache_request_samples, type_name='counter')
+CallbackMetric('quizcraft_cache_hit_ratio', 'Fraction of cache lookups served from the cache.',
+               _cache_hit_ratio_samples)
+CallbackMetric('quizcraft_llm_calls', 'Upstream LLM calls, including retries.',
+               _llm_client_samples('calls'), type_name='counter')
+CallbackMetric('quizcraft_llm_retries', 'LLM calls retried after a transient error.',
+               _llm_client_samples('retries'), type_name='counter')
+CallbackMetric('quizcraft_llm_failures', 'LLM calls that failed after all retries.',
+               _llm_client_samples('failures'), type_name='counter')
+CallbackMetric('quizcraft_llm_in_flight', 'LLM calls currently in progress.',
+               _llm_client_samples('in_flight'))
+CallbackMetric('quizcraft_llm_circuit_open', '1 while the LLM circuit breaker rejects calls.',
+               _llm_circuit_samples)
+
+def init_metrics(app):
+    """
+    Record the latency and database query count of every request.
+    """
+    from flask import g, request, has_request_context
+    from sqlalchemy import event
+    from app import db
+
+    with app.app_context():
+        engine = db.engine
+
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        # Only starts the thread, in the worker process rather than a preloading parent
+        app.before_request(start_metrics_flusher)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.metrics_db_queries = g.get('metrics_db_queries', 0) + 1
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                    method=request.method, status=response.status_code)
+            REQUEST_DB_QUERIES.observe(g.pop('metrics_db_queries', 0), endpoint=endpoint)
+        return response
@@ -1,61 +1,179 @@
 import os
 import io
 import logging
-import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pytesseract
 from PIL import Image
+from utils.metrics import STAGE_SECONDS
 
-def extract_text_from_image(image_file):
+# Scans are downscaled so their longest side is at most this many pixels;
+# text stays legible to tesseract well below typical phone-camera resolutions
+OCR_MAX_DIMENSION = 2500
+
+# Size of the OCR process pool
+OCR_WORKERS = int(os.environ.get("QUIZCRAFT_OCR_WORKERS", str(os.cpu_count() or 1)))
+
+_tesseract_version = None
+_tesseract_error = None
+_probe_lock = threading.Lock()
+
+_ocr_executor = None
+_executor_lock = threading.Lock()
+
+def probe_tesseract():
     """
-    Extract text from an uploaded image using pytesseract OCR.
-    
+    Check once per process that tesseract is installed and remember the result.
+
+    Returns:
+        str: The tesseract version, or None when it is unavailable
+    """
+    global _tesseract_version, _tesseract_error
+
+    with _probe_lock:
+        if _tesseract_version is None and _tesseract_error is None:
+            try:
+                _tesseract_version = str(pytesseract.get_tesseract_version())
+                logging.info(f"Using tesseract {_tesseract_version}")
+            except Exception as e:
+                _tesseract_error = str(e)
+                logging.warning(f"Tesseract not properly installed: {_tesseract_error}")
+
+    return _tesseract_version
+
+def get_ocr_executor():
+    """
+    Return the OCR process pool, starting it on first use.
+
+    Workers are spawned rather than forked: the pool starts while job threads
+    hold database connections and locks, which a forked child would inherit.
+    """
+    global _ocr_executor
+
+    with _executor_lock:
+        if _ocr_executor is None:
+            _ocr_executor = ProcessPoolExecutor(max_workers=OCR_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _ocr_executor
+
+def _otsu_threshold(histogram):
+    """
+    Pick the grey level that best separates ink from paper (Otsu's method).
+    """
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+
+    background_count = 0
+    background_sum = 0
+    best_threshold = 127
+    best_variance = 0.0
+    for level, count in enumerate(histogram):
+        background_count += count
+        if background_count == 0:
+            continue
+        foreground_count = total - background_count
+        if foreground_count == 0:
+            break
+
+        background_sum += level * count
+        background_mean = background_sum / background_count
+        foreground_mean = (weighted_total - background_sum) / foreground_count
+        variance = background_count * foreground_count * (background_mean - foreground_mean) ** 2
+        if variance > best_variance:
+            best_variance = variance
+            best_threshold = level
+
+    return best_threshold
+
+def preprocess_image(img):
+    """
+    Prepare an image for OCR: grayscale, downscale large scans and binarize.
+
     Args:
-        image_file: The uploaded image file object
-        
+        img (PIL.Image.Image): The decoded image
+
     Returns:
-        str: The extracted text from the image
+        PIL.Image.Image: A black and white image
     """
-    logging.debug("Starting OCR processing")
-    
-    # Check if tesseract is installed
-    try:
-        pytesseract.get_tesseract_version()
-    except Exception as e:
-        logging.error(f"Tesseract not properly installed: {str(e)}")
+    # Let the JPEG decoder produce a smaller grayscale image directly when it can
+    img.draft('L', (OCR_MAX_DIMENSION, OCR_MAX_DIMENSION))
+
+    # Convert to grayscale
+    if img.mode != 'L':
+        img = img.convert('L')
+
+    if max(img.size) > OCR_MAX_DIMENSION:
+        img.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+
+    threshold = _otsu_threshold(img.histogram())
+    return img.point([0 if level <= threshold else 255 for level in range(256)])
+
+def ocr_image_bytes(data):
+    """
+    Run OCR on an encoded image. Executed in the OCR process pool.
+
+    Args:
+        data (bytes): The raw contents of the uploaded image
+
+    Returns:
+        str: The extracted text
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        return pytesseract.image_to_string(preprocess_image(img))
+
+def _read_image_bytes(image_file):
+    if isinstance(image_file, bytes):
+        return image_file
+    return image_file.read()
+
+def extract_text_from_images(image_files):
+    """
+    Extract text from several uploaded images (e.g. photographed pages) as one batch.
+
+    The images are recognised in parallel on a process pool and their text is
+    joined in upload order.
+
+    Args:
+        image_files (list): Uploaded image file objects or raw image bytes
+
+    Returns:
+        str: The extracted text from all images
+    """
+    logging.debug(f"Starting OCR processing of {len(image_files)} images")
+
+    if probe_tesseract() is None:
         raise RuntimeError("Tesseract OCR is not properly installed. Please install Tesseract OCR to use this feature.")
-    
+
     try:
-        # Create a temporary file to store the image
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            image_file.save(temp_file.name)
-            temp_filename = temp_file.name
-        
-        # Open the image with PIL
-        with Image.open(temp_filename) as img:
-            # Preprocessing for better OCR results
-            # Convert to grayscale
-            if img.mode != 'L':
-                img = img.convert('L')
-                
-            # Use pytesseract to extract text
-            text = pytesseract.image_to_string(img)
-            
-            logging.info(f"OCR extracted {len(text)} characters")
-            
-            # Clean up the temporary file
-            os.unlink(temp_filename)
-            
-            if not text or len(text.strip()) < 10:
-                raise ValueError("Could not extract sufficient text from the image. Please try a clearer image.")
-            
-            return text
-    
+        images = [_read_image_bytes(image_file) for image_file in image_files]
+
+        with STAGE_SECONDS.time(stage='ocr', kind='image'):
+            if len(images) == 1 and OCR_WORKERS <= 1:
+                texts = [ocr_image_bytes(images[0])]
+            else:
+                texts = list(get_ocr_executor().map(ocr_image_bytes, images))
+
+        text = "\n\n".join(page_text.strip() for page_text in texts)
+        logging.info(f"OCR extracted {len(text)} characters")
+
+        if not text or len(text.strip()) < 10:
+            raise ValueError("Could not extract sufficient text from the image. Please try a clearer image.")
+
+        return text
+
     except Exception as e:
-        if 'temp_filename' in locals():
-            try:
-                os.unlink(temp_filename)
-            except:
-                pass
-        
         logging.error(f"OCR processing error: {str(e)}")
         raise
+
+def extract_text_from_image(image_file):
+    """
+    Extract text from an uploaded image using pytesseract OCR.
+
+    Args:
+        image_file: The uploaded image file object, or its raw bytes
+
+    Returns:
+        str: The extracted text from the image
+    """
+    return extract_text_from_images([image_file])
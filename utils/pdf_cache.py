@@ -0,0 +1,169 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from utils.metrics import STAGE_SECONDS
+
+# Bump when the layout produced by create_quiz_pdf changes, so stale renders are not served
+PDF_RENDER_VERSION = '2'
+
+# Rendered PDFs kept on disk before the least recently written are pruned
+PDF_CACHE_MAX_FILES = int(os.environ.get("QUIZCRAFT_PDF_CACHE_MAX_FILES", "2000"))
+
+# The directory is pruned once every this many renders
+PDF_CACHE_PRUNE_INTERVAL = 50
+
+_renders = 0
+_renders_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+def get_pdf_cache_dir():
+    """
+    Return the directory holding rendered PDFs, creating it when needed.
+
+    Defaults to pdf_cache/ inside the Flask instance folder; set
+    QUIZCRAFT_PDF_CACHE_DIR to share a directory between hosts.
+    """
+    cache_dir = os.environ.get("QUIZCRAFT_PDF_CACHE_DIR")
+    if not cache_dir:
+        from flask import current_app
+        cache_dir = os.path.join(current_app.instance_path, 'pdf_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def pdf_cache_key(quiz_title, quiz_data):
+    """
+    Build the cache key of a rendered quiz.
+
+    Args:
+        quiz_title (str): The title printed on the PDF
+        quiz_data (list): The quiz questions and answers
+
+    Returns:
+        str: A hex SHA-256 digest, also used as the ETag of the PDF
+    """
+    key_material = json.dumps([PDF_RENDER_VERSION, quiz_title, quiz_data])
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+def _pdf_path(key):
+    return os.path.join(get_pdf_cache_dir(), f"{key}.pdf")
+
+def find_cached_pdf(quiz_title, quiz_data):
+    """
+    Look up the rendered PDF of a quiz without rendering it.
+
+    Args:
+        quiz_title (str): The title of the quiz
+        quiz_data (list): The quiz questions and answers
+
+    Returns:
+        tuple: (path, key); path is None when this version has not been rendered
+    """
+    key = pdf_cache_key(quiz_title, quiz_data)
+    path = _pdf_path(key)
+    if os.path.exists(path):
+        logging.debug(f"Serving cached PDF {key[:12]}")
+        _count('hits')
+        return path, key
+
+    _count('misses')
+    return None, key
+
+def store_pdf(key, pdf_data):
+    """
+    Add a rendered PDF to the cache.
+
+    Args:
+        key (str): The cache key of the quiz, from pdf_cache_key()
+        pdf_data (bytes): The PDF
+
+    Returns:
+        str: The path of the cached PDF file
+    """
+    path = _pdf_path(key)
+
+    # Write to a temporary file first so concurrent readers never see a partial PDF
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(pdf_data)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    _maybe_prune()
+    return path
+
+def get_quiz_pdf(quiz_title, quiz_data):
+    """
+    Return the path of the rendered PDF for a quiz, rendering it on a cache miss.
+
+    Args:
+        quiz_title (str): The title of the quiz
+        quiz_data (list): The quiz questions and answers
+
+    Returns:
+        tuple: (path, key) of the cached PDF file
+    """
+    from utils.pdf_exporter import create_quiz_pdf
+
+    path, key = find_cached_pdf(quiz_title, quiz_data)
+    if path:
+        return path, key
+
+    with STAGE_SECONDS.time(stage='pdf_render', kind='quiz'):
+        pdf_buffer = create_quiz_pdf(quiz_data, quiz_title)
+
+    return store_pdf(key, pdf_buffer.getbuffer()), key
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def pdf_cache_stats():
+    """
+    Return a snapshot of the hit/miss counters for this process.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+def invalidate_quiz_pdf(quiz_title, quiz_data):
+    """
+    Remove the rendered PDF of a quiz version that has been edited or deleted.
+    """
+    try:
+        os.unlink(_pdf_path(pdf_cache_key(quiz_title, quiz_data)))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.error(f"Error invalidating cached PDF: {str(e)}")
+
+def _maybe_prune():
+    global _renders
+
+    with _renders_lock:
+        _renders += 1
+        if _renders % PDF_CACHE_PRUNE_INTERVAL != 0:
+            return
+
+    try:
+        cache_dir = get_pdf_cache_dir()
+        entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith('.pdf')]
+        if len(entries) <= PDF_CACHE_MAX_FILES:
+            return
+
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - PDF_CACHE_MAX_FILES]:
+            os.unlink(entry.path)
+        logging.info(f"Pruned {len(entries) - PDF_CACHE_MAX_FILES} cached PDFs")
+    except Exception as e:
+        logging.error(f"Error pruning PDF cache: {str(e)}")
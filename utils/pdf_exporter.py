@@ -1,5 +1,7 @@
 import io
+import os
 import logging
+import threading
 import re
 import unicodedata
 from reportlab.lib.pagesizes import letter
@@ -13,6 +15,8 @@ from reportlab.platypus import (
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
+from reportlab.pdfgen import canvas as pdf_canvas
+from utils.quiz_exporters import question_type_of
 
 # Register a UTF-8 compatible font if necessary
 # Uncomment these lines if you have DejaVu fonts available
@@ -20,6 +24,27 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 # pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'))
 # pdfmetrics.registerFont(TTFont('DejaVuSans-Italic', 'DejaVuSans-Italic.ttf'))
 
+# Typographic quotes and dashes, and subscript and superscript digits
+# (H₂O becomes H2O), replaced in a single pass
+CLEAN_TEXT_TABLE = str.maketrans({
+    '\u201c': '"', '\u201d': '"',
+    '\u2018': "'", '\u2019': "'",
+    '\u2014': '-',
+    **{subscript: str(digit) for digit, subscript in enumerate('₀₁₂₃₄₅₆₇₈₉')},
+    **{superscript: str(digit) for digit, superscript in enumerate('⁰¹²³⁴⁵⁶⁷⁸⁹')},
+})
+
+# A number followed by a period and no space, like "1.Test"
+NUMBER_PERIOD_PATTERN = re.compile(r'(\d+)\.(\S)')
+
+# Characters Paragraph reads as markup; text holding them is laid out by platypus
+PARAGRAPH_MARKUP_CHARS = ('<', '&')
+
+# Draw plain quizzes straight onto the canvas instead of through platypus
+PDF_FAST_PATH = os.environ.get("QUIZCRAFT_PDF_FAST_PATH", "1") == "1"
+
+PAGE_MARGIN = 0.75*inch
+
 def clean_text(text):
     """
     Clean and prepare text for PDF rendering by handling special characters.
@@ -33,62 +58,239 @@ def clean_text(text):
     if not text:
         return ""
     
-    # Replace smart quotes with straight quotes
-    text = text.replace('"', '"').replace('"', '"')
-    text = text.replace(''', "'").replace(''', "'")
-    
-    # Replace em-dashes with regular dashes
-    text = text.replace('—', '-')
+    text = text.translate(CLEAN_TEXT_TABLE)
     
     # Normalize Unicode to closest ASCII equivalent when possible
     # This helps with many scientific and math symbols
-    text = unicodedata.normalize('NFKD', text)
-    
-    # Handle subscripts and superscripts by using regular characters
-    # Example: H₂O becomes H2O, etc.
-    # This regex looks for Unicode subscript/superscript and replaces with regular numbers
-    text = re.sub(r'[₀₁₂₃₄₅₆₇₈₉]', lambda m: '0123456789'['₀₁₂₃₄₅₆₇₈₉'.index(m.group(0))], text)
-    text = re.sub(r'[⁰¹²³⁴⁵⁶⁷⁸⁹]', lambda m: '0123456789'['⁰¹²³⁴⁵⁶⁷⁸⁹'.index(m.group(0))], text)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
     
     # Ensure proper space after numbers followed by periods (like "1.Test" becomes "1. Test")
-    text = re.sub(r'(\d+)\.(\S)', r'\1. \2', text)
+    return NUMBER_PERIOD_PATTERN.sub(r'\1. \2', text)
+
+def is_plain_quiz(quiz_data, quiz_title):
+    """
+    Check whether a quiz can be drawn by the canvas fast path.
     
-    return text
+    A quiz is plain when none of its text holds characters that Paragraph
+    would read as markup, so drawing the text as it is looks the same.
+    """
+    texts = [quiz_title]
+    for question in quiz_data:
+        texts.append(str(question.get('question', '')))
+        texts.extend(str(option) for option in question.get('options', []))
+        texts.append(str(question.get('answer', '')))
+        texts.append(str(question.get('explanation') or ''))
+    return not any(char in text for text in texts for char in PARAGRAPH_MARKUP_CHARS)
 
-def create_quiz_pdf(quiz_data, quiz_title):
+class _CanvasLayout:
     """
-    Create a PDF document containing the quiz questions and answers.
+    Draws text top to bottom onto a canvas, starting a page whenever one fills.
     
-    Args:
-        quiz_data (list): A list of quiz questions and answers
-        quiz_title (str): The title of the quiz
-        
-    Returns:
-        BytesIO: A buffer containing the PDF data
+    Margins, spacing and footer follow the platypus layout of QuizPdfRenderer,
+    so both paths break pages in the same places.
     """
-    logging.debug(f"Creating PDF for quiz: {quiz_title}")
     
-    buffer = io.BytesIO()
+    def __init__(self, canvas, pagesize):
+        self.canvas = canvas
+        page_width, page_height = pagesize
+        self.doc_width = page_width - 2*PAGE_MARGIN
+        # SimpleDocTemplate's frame pads its content by 6 points on each side
+        self.left = PAGE_MARGIN + 6
+        self.width = self.doc_width - 12
+        self.top = page_height - PAGE_MARGIN - 6
+        self.bottom = PAGE_MARGIN + 6
+        self.y = self.top
+        self.at_top = True
+        # Space after the last thing drawn; platypus overlaps it with the next space before
+        self.space_after = 0
+        # Text of the page is drawn as one text object when the page is done
+        self._start_text()
+        # Word widths by font and size, as the same words recur throughout a quiz
+        self._word_widths = {}
+        self.draw_footer()
     
-    try:
-        # Create the PDF document with proper margins for better readability
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=letter,
-            title=clean_text(quiz_title),
-            author="QuizCraft",
-            subject="Generated Quiz",
-            leftMargin=0.75*inch,
-            rightMargin=0.75*inch,
-            topMargin=0.75*inch,
-            bottomMargin=0.75*inch
-        )
+    def paragraph(self, text, style):
+        """
+        Return a paragraph ready to be measured and drawn: its style and wrapped lines.
         
+        Words are broken into lines as Paragraph breaks them, letting a line
+        overrun by the little its spaces may shrink.
+        """
+        max_width = self.width - style.leftIndent
+        space_width = pdfmetrics.stringWidth(' ', style.fontName, style.fontSize)
+        space_shrink = style.spaceShrinkage*space_width
+        word_widths = self._word_widths.setdefault((style.fontName, style.fontSize), {})
+        
+        # Paragraph collapses runs of whitespace, line breaks included
+        lines = []
+        line = []
+        line_width = 0
+        for word in text.split():
+            word_width = word_widths.get(word)
+            if word_width is None:
+                word_width = word_widths[word] = pdfmetrics.stringWidth(word, style.fontName, style.fontSize)
+            if line and line_width + space_width + word_width > max_width + space_shrink*len(line):
+                lines.append(' '.join(line))
+                line = []
+            if word_width > max_width:
+                # A word wider than the line is broken across lines, as Paragraph does
+                *pieces, word = self._split_word(word, style, max_width)
+                if line:
+                    lines.append(' '.join(line))
+                    line = []
+                lines.extend(pieces)
+                word_width = pdfmetrics.stringWidth(word, style.fontName, style.fontSize)
+            if line:
+                line_width += space_width + word_width
+            else:
+                line_width = word_width
+            line.append(word)
+        if line:
+            lines.append(' '.join(line))
+        return style, lines
+    
+    def _split_word(self, word, style, max_width):
+        pieces = []
+        while pdfmetrics.stringWidth(word, style.fontName, style.fontSize) > max_width and len(word) > 1:
+            end = len(word) - 1
+            while end > 1 and pdfmetrics.stringWidth(word[:end], style.fontName, style.fontSize) > max_width:
+                end -= 1
+            pieces.append(word[:end])
+            word = word[end:]
+        pieces.append(word)
+        return pieces
+    
+    def _space_before(self, space):
+        if self.at_top:
+            return 0
+        return max(space - self.space_after, 0)
+    
+    def draw_block(self, block):
+        """
+        Draw paragraphs and spacers (given as heights), starting a new page
+        first if they do not fit on this one, as KeepTogether does.
+        """
+        height = 0
+        previous_after = None
+        for item in block:
+            if isinstance(item, tuple):
+                style, lines = item
+                before, after, item_height = style.spaceBefore, style.spaceAfter, len(lines)*style.leading
+            else:
+                before, after, item_height = 0, 0, item
+            if previous_after is not None:
+                height += max(before, previous_after)
+            height += item_height
+            previous_after = after
+        
+        first = block[0]
+        first_before = first[0].spaceBefore if isinstance(first, tuple) else 0
+        if not self.at_top and height > self.y - self.bottom - self._space_before(first_before):
+            self.page_break()
+        
+        for item in block:
+            if isinstance(item, tuple):
+                self.draw_paragraph(*item)
+            else:
+                self.draw_spacer(item)
+    
+    def draw_spacer(self, height):
+        if self.y - height < self.bottom:
+            self.page_break()
+        self.y -= height
+        self.space_after = 0
+        self.at_top = False
+    
+    def draw_paragraph(self, style, lines):
+        self.y -= self._space_before(style.spaceBefore)
+        for line in lines:
+            if self.y - style.leading < self.bottom:
+                self.page_break()
+            self._use_style(style)
+            x = self.left + style.leftIndent
+            if style.alignment == TA_CENTER:
+                x = self.left + (self.width - pdfmetrics.stringWidth(line, style.fontName, style.fontSize))/2
+            baseline = self.y - style.fontSize
+            # Lines following on from the one above need no new origin
+            if (x, baseline) != self._cursor:
+                self.text.setTextOrigin(x, baseline)
+            self.text.textLine(line)
+            self._cursor = (x, baseline - style.leading)
+            self.y -= style.leading
+            self.at_top = False
+        self.y -= style.spaceAfter
+        self.space_after = style.spaceAfter
+    
+    def _use_style(self, style):
+        # Font, colour and leading are only written when they change
+        if (style.fontName, style.fontSize) != self._font:
+            self._font = (style.fontName, style.fontSize)
+            self.text.setFont(style.fontName, style.fontSize, style.leading)
+            self._leading = style.leading
+        if style.leading != self._leading:
+            self._leading = style.leading
+            self.text.setLeading(style.leading)
+        if style.textColor != self._color:
+            self._color = style.textColor
+            self.text.setFillColor(style.textColor)
+    
+    def draw_rule(self, space_before=6, space_after=12, thickness=1):
+        """
+        Draw a full-width divider line, like HRFlowable.
+        """
+        self.y -= self._space_before(space_before) + thickness
+        self.canvas.setLineWidth(thickness)
+        self.canvas.setStrokeColor(colors.black)
+        self.canvas.line(self.left, self.y, self.left + self.width, self.y)
+        self.y -= space_after
+        self.space_after = space_after
+        self.at_top = False
+    
+    def draw_footer(self):
+        # Drawn as a page starts, like the page decorations of platypus
+        canvas = self.canvas
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.drawCentredString(self.doc_width/2 + PAGE_MARGIN, 0.5*inch, f"Page {canvas.getPageNumber()}")
+        canvas.drawString(PAGE_MARGIN, 0.5*inch, "Generated by QuizCraft")
+        canvas.restoreState()
+    
+    def page_break(self):
+        self.canvas.drawText(self.text)
+        self.canvas.showPage()
+        self._start_text()
+        self.y = self.top
+        self.at_top = True
+        self.space_after = 0
+        self.draw_footer()
+    
+    def _start_text(self):
+        self.text = self.canvas.beginText()
+        self._font = None
+        self._leading = None
+        self._color = None
+        self._cursor = None
+    
+    def finish(self):
+        self.canvas.drawText(self.text)
+        self.canvas.save()
+
+class QuizPdfRenderer:
+    """
+    Renders quizzes to PDF.
+    
+    The paragraph styles are built once, when the renderer is created, rather
+    than on every render; get_pdf_renderer() shares one renderer per process.
+    A renderer keeps no state between renders, so threads can share it.
+    """
+    
+    def __init__(self):
         # Define styles
         styles = getSampleStyleSheet()
         
         # Create custom styles with consistent font usage
-        title_style = ParagraphStyle(
+        self.title_style = ParagraphStyle(
             'CustomTitle',
             parent=styles['Title'],
             fontName='Helvetica-Bold',
@@ -97,7 +299,7 @@ def create_quiz_pdf(quiz_data, quiz_title):
             spaceAfter=24
         )
         
-        heading_style = ParagraphStyle(
+        self.heading_style = ParagraphStyle(
             'CustomHeading',
             parent=styles['Heading2'],
             fontName='Helvetica-Bold',
@@ -106,7 +308,7 @@ def create_quiz_pdf(quiz_data, quiz_title):
             spaceAfter=6
         )
         
-        question_style = ParagraphStyle(
+        self.question_style = ParagraphStyle(
             'QuestionStyle',
             parent=styles['Normal'],
             fontName='Helvetica-Bold',
@@ -116,7 +318,7 @@ def create_quiz_pdf(quiz_data, quiz_title):
             leading=14  # Line spacing
         )
         
-        option_style = ParagraphStyle(
+        self.option_style = ParagraphStyle(
             'OptionStyle',
             parent=styles['Normal'],
             fontName='Helvetica',
@@ -126,7 +328,7 @@ def create_quiz_pdf(quiz_data, quiz_title):
             leading=14
         )
         
-        answer_style = ParagraphStyle(
+        self.answer_style = ParagraphStyle(
             'AnswerStyle',
             parent=styles['Normal'],
             fontName='Helvetica-Bold',
@@ -136,7 +338,7 @@ def create_quiz_pdf(quiz_data, quiz_title):
             leading=14
         )
         
-        explanation_style = ParagraphStyle(
+        self.explanation_style = ParagraphStyle(
             'ExplanationStyle',
             parent=styles['Italic'],
             fontName='Helvetica-Oblique',
@@ -147,87 +349,155 @@ def create_quiz_pdf(quiz_data, quiz_title):
             spaceAfter=10,
             leading=14
         )
+    
+    def render(self, quiz_data, quiz_title, include_questions=True, include_answers=True, fast=PDF_FAST_PATH):
+        """
+        Render a quiz to PDF.
         
-        footer_style = ParagraphStyle(
-            'FooterStyle',
-            parent=styles['Normal'],
-            fontName='Helvetica',
-            fontSize=8,
-            textColor=colors.darkgrey,
-            alignment=TA_CENTER
-        )
+        Args:
+            quiz_data (list): A list of quiz questions and answers
+            quiz_title (str): The title of the quiz
+            include_questions (bool): False to leave out the questions
+            include_answers (bool): False to leave out the answers
+            fast (bool): Draw plain quizzes straight onto the canvas, skipping platypus layout
+            
+        Returns:
+            BytesIO: A buffer containing the PDF data
+        """
+        buffer = io.BytesIO()
         
-        # Build the document content
-        content = []
+        if fast and is_plain_quiz(quiz_data, quiz_title):
+            self._draw_canvas(buffer, quiz_data, quiz_title, include_questions, include_answers)
+        else:
+            self._build_flowables(buffer, quiz_data, quiz_title, include_questions, include_answers)
         
-        # Add title with proper formatting
+        buffer.seek(0)
+        return buffer
+    
+    def _question_text(self, i, question):
+        return clean_text(f"{i+1}. [{question_type_of(question)}] {question['question']}")
+    
+    def _option_texts(self, question):
+        # A, B, C, D, etc.
+        return [clean_text(f"{chr(65 + j)}. {option}") for j, option in enumerate(question.get('options', []))]
+    
+    def _answer_texts(self, i, question):
+        answer_text = f"{i+1}. Answer: {clean_text(question['answer'])}"
+        explanation_text = None
+        if 'explanation' in question and question['explanation']:
+            explanation_text = clean_text(f"Explanation: {question['explanation']}")
+        return answer_text, explanation_text
+    
+    def _draw_canvas(self, buffer, quiz_data, quiz_title, include_questions, include_answers):
+        """
+        Draw a plain quiz line by line onto a canvas.
+        """
         clean_title = clean_text(quiz_title)
-        content.append(Paragraph(clean_title, title_style))
+        canvas = pdf_canvas.Canvas(buffer, pagesize=letter)
+        canvas.setTitle(clean_title)
+        canvas.setAuthor("QuizCraft")
+        canvas.setSubject("Generated Quiz")
+        layout = _CanvasLayout(canvas, letter)
         
-        # Add a divider line
-        content.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=6, spaceAfter=12))
+        layout.draw_paragraph(*layout.paragraph(clean_title, self.title_style))
+        layout.draw_rule()
         
-        # Add questions section
-        content.append(Paragraph("Questions", heading_style))
-        content.append(Spacer(1, 12))
-        
-        # Add each question with proper formatting
-        for i, question in enumerate(quiz_data):
-            # Determine question type and format accordingly
-            if 'question_type' in question:
-                question_type = question['question_type']
-            elif 'options' in question:
-                question_type = "Multiple Choice"
-            elif question.get('answer') in ['True', 'False']:
-                question_type = "True/False"
-            elif '_____' in question.get('question', ''):
-                question_type = "Fill in the Blanks"
-            else:
-                question_type = "Short Answer"
-            
-            # Clean and format the question text
-            q_text = clean_text(f"{i+1}. [{question_type}] {question['question']}")
-            
-            # Use KeepTogether to prevent awkward breaks within a question
-            question_elements = [Paragraph(q_text, question_style)]
+        if include_questions:
+            layout.draw_paragraph(*layout.paragraph("Questions", self.heading_style))
+            layout.draw_spacer(12)
             
-            # Add options for multiple choice questions
-            if 'options' in question:
-                options = question['options']
-                for j, option in enumerate(options):
-                    option_letter = chr(65 + j)  # A, B, C, D, etc.
-                    option_text = clean_text(f"{option_letter}. {option}")
-                    question_elements.append(Paragraph(option_text, option_style))
+            for i, question in enumerate(quiz_data):
+                block = [layout.paragraph(self._question_text(i, question), self.question_style)]
+                block.extend(layout.paragraph(option_text, self.option_style)
+                             for option_text in self._option_texts(question))
+                block.append(8)
+                layout.draw_block(block)
+        
+        if include_answers:
+            if include_questions:
+                layout.page_break()
             
-            question_elements.append(Spacer(1, 8))
+            layout.draw_paragraph(*layout.paragraph("Answers", self.heading_style))
+            layout.draw_rule()
             
-            # Keep the question and its options together when possible
-            content.append(KeepTogether(question_elements))
+            for i, question in enumerate(quiz_data):
+                answer_text, explanation_text = self._answer_texts(i, question)
+                block = [layout.paragraph(answer_text, self.answer_style)]
+                if explanation_text:
+                    block.append(layout.paragraph(explanation_text, self.explanation_style))
+                block.append(6)
+                layout.draw_block(block)
         
-        # Add page break before answers
-        content.append(PageBreak())
+        layout.finish()
+    
+    def _build_flowables(self, buffer, quiz_data, quiz_title, include_questions, include_answers):
+        """
+        Lay a quiz out with platypus, which also handles Paragraph markup.
+        """
+        # Create the PDF document with proper margins for better readability
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=letter,
+            title=clean_text(quiz_title),
+            author="QuizCraft",
+            subject="Generated Quiz",
+            leftMargin=PAGE_MARGIN,
+            rightMargin=PAGE_MARGIN,
+            topMargin=PAGE_MARGIN,
+            bottomMargin=PAGE_MARGIN
+        )
+        
+        # Build the document content
+        content = []
         
-        # Add answers section with heading
-        content.append(Paragraph("Answers", heading_style))
+        # Add title with proper formatting
+        clean_title = clean_text(quiz_title)
+        content.append(Paragraph(clean_title, self.title_style))
+        
+        # Add a divider line
         content.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=6, spaceAfter=12))
         
-        # Add each answer with proper formatting
-        for i, question in enumerate(quiz_data):
-            # Clean the text for the answer
-            answer_prefix = f"{i+1}. Answer: "
-            answer_value = clean_text(question['answer'])
+        if include_questions:
+            # Add questions section
+            content.append(Paragraph("Questions", self.heading_style))
+            content.append(Spacer(1, 12))
             
-            answer_elements = [Paragraph(f"{answer_prefix}{answer_value}", answer_style)]
-            
-            # Add explanation if available
-            if 'explanation' in question and question['explanation']:
-                explanation_text = clean_text(f"Explanation: {question['explanation']}")
-                answer_elements.append(Paragraph(explanation_text, explanation_style))
+            # Add each question with proper formatting
+            for i, question in enumerate(quiz_data):
+                # Use KeepTogether to prevent awkward breaks within a question
+                question_elements = [Paragraph(self._question_text(i, question), self.question_style)]
+                
+                # Add options for multiple choice questions
+                for option_text in self._option_texts(question):
+                    question_elements.append(Paragraph(option_text, self.option_style))
+                
+                question_elements.append(Spacer(1, 8))
+                
+                # Keep the question and its options together when possible
+                content.append(KeepTogether(question_elements))
+        
+        if include_answers:
+            # Add page break before answers
+            if include_questions:
+                content.append(PageBreak())
             
-            answer_elements.append(Spacer(1, 6))
+            # Add answers section with heading
+            content.append(Paragraph("Answers", self.heading_style))
+            content.append(HRFlowable(width="100%", thickness=1, color=colors.black, spaceBefore=6, spaceAfter=12))
             
-            # Keep answer and its explanation together
-            content.append(KeepTogether(answer_elements))
+            # Add each answer with proper formatting
+            for i, question in enumerate(quiz_data):
+                answer_text, explanation_text = self._answer_texts(i, question)
+                answer_elements = [Paragraph(answer_text, self.answer_style)]
+                
+                # Add explanation if available
+                if explanation_text:
+                    answer_elements.append(Paragraph(explanation_text, self.explanation_style))
+                
+                answer_elements.append(Spacer(1, 6))
+                
+                # Keep answer and its explanation together
+                content.append(KeepTogether(answer_elements))
         
         # Add footer with page numbers
         def add_page_number(canvas, doc):
@@ -244,9 +514,39 @@ def create_quiz_pdf(quiz_data, quiz_title):
         
         # Build the PDF with page numbers
         doc.build(content, onFirstPage=add_page_number, onLaterPages=add_page_number)
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_pdf_renderer():
+    """
+    Return the renderer shared by this process, creating it on first use.
+    """
+    global _renderer
+    
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = QuizPdfRenderer()
+        return _renderer
+
+def create_quiz_pdf(quiz_data, quiz_title, include_questions=True, include_answers=True, fast=PDF_FAST_PATH):
+    """
+    Create a PDF document containing the quiz questions and answers.
+    
+    Args:
+        quiz_data (list): A list of quiz questions and answers
+        quiz_title (str): The title of the quiz
+        include_questions (bool): False to leave out the questions, e.g. for an answer key
+        include_answers (bool): False to leave out the answers, e.g. for a copy handed to students
+        fast (bool): Draw plain quizzes straight onto the canvas; False always lays out with platypus
         
-        buffer.seek(0)
-        return buffer
+    Returns:
+        BytesIO: A buffer containing the PDF data
+    """
+    logging.debug(f"Creating PDF for quiz: {quiz_title}")
+    
+    try:
+        return get_pdf_renderer().render(quiz_data, quiz_title, include_questions, include_answers, fast)
     
     except Exception as e:
         logging.error(f"Error creating PDF: {str(e)}")
@@ -0,0 +1,382 @@
+import os
+import re
+import struct
+import hashlib
+import logging
+from sqlalchemy import text, bindparam
+
+# Estimated Jaccard similarity of two questions above which they count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("QUIZCRAFT_NEAR_DUPLICATE_THRESHOLD", "0.6"))
+
+# MinHash signature length, and how the signature is cut into LSH bands.
+# 16 bands of 4 rows find pairs at 0.6 similarity about 90% of the time.
+MINHASH_SIZE = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_SIZE // LSH_BANDS
+
+# Bank questions looked at per requested question when building a quiz from the bank
+BANK_CANDIDATES_PER_QUESTION = 5
+
+# Earlier questions compared against each new question when looking for repeats
+REPEAT_CANDIDATE_LIMIT = 50
+
+# Rows written per statement when fingerprints are backfilled or bands rebuilt
+BANK_BATCH_SIZE = 1000
+
+# Quiz types made of a single kind of question; any other type ("Mixed Type") mixes them
+SINGLE_QUESTION_TYPES = ['Multiple Choice', 'True/False', 'Fill in the Blanks', 'Short Answer']
+
+_SIGNATURE_FORMAT = f'<{MINHASH_SIZE}I'
+
+def _shingles(question_text, answer):
+    """
+    Return the word bigrams of a question and its answer.
+    """
+    words = re.findall(r'\w+', f"{question_text} {answer}".lower())
+    if len(words) < 2:
+        return set(words)
+    return {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+def minhash_signature(question_text, answer):
+    """
+    Compute the MinHash signature of a question.
+
+    Each shingle is hashed once with SHAKE-128 into MINHASH_SIZE
+    independent 32-bit values; the signature is their element-wise minimum.
+
+    Returns:
+        tuple: MINHASH_SIZE 32-bit integers, or None for a question without words
+    """
+    hashed = [struct.unpack(_SIGNATURE_FORMAT, hashlib.shake_128(shingle.encode('utf-8')).digest(4 * MINHASH_SIZE))
+              for shingle in _shingles(question_text or '', answer or '')]
+    if not hashed:
+        return None
+    return tuple(map(min, zip(*hashed)))
+
+def question_fingerprint(question_text, answer):
+    """
+    Return the signature of a question packed into bytes for the Question.fingerprint column.
+    """
+    signature = minhash_signature(question_text, answer)
+    return struct.pack(_SIGNATURE_FORMAT, *signature) if signature is not None else None
+
+def unpack_fingerprint(fingerprint):
+    return struct.unpack(_SIGNATURE_FORMAT, fingerprint) if fingerprint else None
+
+def similarity(signature, other):
+    """
+    Estimate the Jaccard similarity of the questions behind two signatures.
+    """
+    return sum(1 for a, b in zip(signature, other) if a == b) / MINHASH_SIZE
+
+def band_keys(signature):
+    """
+    Hash each LSH band of a signature into a signed 64-bit key.
+
+    Near-duplicate questions very likely share at least one key.
+    """
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<B{LSH_ROWS}I', band, *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+class NearDuplicateFilter:
+    """
+    Accepts signatures one at a time and rejects those that nearly repeat one
+    already accepted. Each check only compares against the accepted signatures
+    sharing an LSH band, not all of them.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._signatures = []
+        self._buckets = {}
+
+    def add(self, signature):
+        """
+        Returns:
+            bool: False when signature is a near-duplicate; questions without
+                words are always accepted
+        """
+        if signature is None:
+            return True
+
+        keys = band_keys(signature)
+        rivals = {index for key in keys for index in self._buckets.get(key, ())}
+        if any(similarity(signature, self._signatures[index]) >= self.threshold for index in rivals):
+            return False
+
+        for key in keys:
+            self._buckets.setdefault(key, []).append(len(self._signatures))
+        self._signatures.append(signature)
+        return True
+
+def drop_near_duplicates(quiz_data, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Remove questions that nearly repeat an earlier question of the same quiz.
+
+    Args:
+        quiz_data (list): Question dicts
+        threshold (float): Similarity from which questions count as duplicates
+
+    Returns:
+        tuple: (kept questions, number dropped)
+    """
+    duplicates = NearDuplicateFilter(threshold)
+    kept = [question for question in quiz_data
+            if duplicates.add(minhash_signature(question.get('question', ''), question.get('answer', '')))]
+    return kept, len(quiz_data) - len(kept)
+
+# LSH band index, kept in the question_band table
+
+def _insert_bands(connection, rows):
+    """
+    Write the bands of (question_id, user_id, fingerprint) rows.
+    """
+    bands = [{'question_id': question_id, 'user_id': user_id, 'band_key': key}
+             for question_id, user_id, fingerprint in rows if fingerprint
+             for key in band_keys(unpack_fingerprint(fingerprint))]
+    if bands:
+        connection.execute(text("INSERT INTO question_band (question_id, user_id, band_key) "
+                                "VALUES (:question_id, :user_id, :band_key)"), bands)
+
+def _delete_bands(connection, question_id):
+    connection.execute(text("DELETE FROM question_band WHERE question_id = :question_id"),
+                       {'question_id': question_id})
+
+def _index_question_bands(mapper, connection, question):
+    user_id = connection.execute(text("SELECT user_id FROM quiz WHERE id = :quiz_id"),
+                                 {'quiz_id': question.quiz_id}).scalar()
+    _insert_bands(connection, [(question.id, user_id, question.fingerprint)])
+
+def _reindex_question_bands(mapper, connection, question):
+    from sqlalchemy import inspect
+
+    if inspect(question).attrs.fingerprint.history.has_changes():
+        _delete_bands(connection, question.id)
+        _index_question_bands(mapper, connection, question)
+
+def _unindex_question_bands(mapper, connection, question):
+    _delete_bands(connection, question.id)
+
+def init_question_bank(app):
+    """
+    Keep the LSH band index in step with every question written through the ORM.
+    """
+    from sqlalchemy import event
+    from models import Question
+
+    if event.contains(Question, 'after_insert', _index_question_bands):
+        return
+
+    event.listen(Question, 'after_insert', _index_question_bands)
+    event.listen(Question, 'after_update', _reindex_question_bands)
+    event.listen(Question, 'after_delete', _unindex_question_bands)
+
+def backfill_fingerprints(connection):
+    """
+    Fingerprint and band the questions stored before fingerprints existed.
+
+    Returns:
+        int: The number of questions fingerprinted
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(text(
+            "SELECT question.id, quiz.user_id, question.text, question.answer FROM question "
+            "JOIN quiz ON quiz.id = question.quiz_id "
+            "WHERE question.fingerprint IS NULL AND question.id > :last_id ORDER BY question.id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BANK_BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        fingerprinted = [(question_id, user_id, question_fingerprint(question_text, answer))
+                         for question_id, user_id, question_text, answer in rows]
+        connection.execute(text("UPDATE question SET fingerprint = :fingerprint WHERE id = :question_id"),
+                           [{'question_id': question_id, 'fingerprint': fingerprint}
+                            for question_id, _, fingerprint in fingerprinted])
+        _insert_bands(connection, fingerprinted)
+        last_id = rows[-1][0]
+        updated += len(rows)
+
+    if updated:
+        logging.info(f"Fingerprinted {updated} questions for the question bank")
+    return updated
+
+def rebuild_question_bands(connection):
+    """
+    Rebuild the band index from the stored fingerprints, after rows were written
+    without the ORM (such as bulk inserts).
+
+    Returns:
+        int: The number of questions banded
+    """
+    connection.execute(text("DELETE FROM question_band"))
+
+    banded = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(text(
+            "SELECT question.id, quiz.user_id, question.fingerprint FROM question "
+            "JOIN quiz ON quiz.id = question.quiz_id "
+            "WHERE question.id > :last_id ORDER BY question.id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BANK_BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        _insert_bands(connection, rows)
+        last_id = rows[-1][0]
+        banded += len(rows)
+    return banded
+
+def _similar_question_ids(connection, user_id, signature, limit=REPEAT_CANDIDATE_LIMIT):
+    """
+    Return the ids of up to limit stored questions of the user sharing an LSH band with signature.
+
+    Repeats of questions that still exist are skipped, so new questions are
+    linked to the original rather than to one of its copies.
+    """
+    statement = text(
+        "SELECT DISTINCT question_band.question_id FROM question_band "
+        "JOIN question ON question.id = question_band.question_id "
+        "LEFT JOIN question AS source ON source.id = question.repeat_of_id "
+        "WHERE question_band.user_id = :user_id AND question_band.band_key IN :band_keys "
+        "AND source.id IS NULL LIMIT :limit"
+    ).bindparams(bindparam('band_keys', expanding=True))
+    return [row[0] for row in connection.execute(
+        statement, {'user_id': user_id, 'band_keys': band_keys(signature), 'limit': limit})]
+
+def mark_repeated_questions(user_id, questions, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Point each new question that nearly repeats one from the user's earlier
+    quizzes at the most similar earlier question, through repeat_of_id.
+
+    Call before the new questions are flushed, so they do not match themselves.
+
+    Args:
+        user_id (int): Owner of the new questions
+        questions (list): Unsaved Question objects with fingerprints
+
+    Returns:
+        int: The number of repeated questions
+    """
+    from app import db
+    from models import Question
+
+    connection = db.session.connection()
+    repeated = 0
+    for question in questions:
+        signature = unpack_fingerprint(question.fingerprint)
+        if signature is None:
+            continue
+
+        candidate_ids = _similar_question_ids(connection, user_id, signature)
+        if not candidate_ids:
+            continue
+
+        candidates = db.session.query(Question.id, Question.fingerprint) \
+            .filter(Question.id.in_(candidate_ids)).all()
+        scored = [(similarity(signature, unpack_fingerprint(fingerprint)), -candidate_id)
+                  for candidate_id, fingerprint in candidates if fingerprint]
+        best = max(scored, default=None)
+        if best is not None and best[0] >= threshold:
+            question.repeat_of_id = -best[1]
+            repeated += 1
+
+    return repeated
+
+def repeated_question_sources(quiz_id):
+    """
+    Return {question position: id of the earlier quiz it repeats} for a saved quiz.
+
+    Earlier questions that have since been deleted are left out.
+    """
+    from app import db
+    from models import Question
+    from sqlalchemy.orm import aliased
+
+    earlier = aliased(Question)
+    rows = db.session.query(Question.ordinal, earlier.quiz_id) \
+        .join(earlier, earlier.id == Question.repeat_of_id) \
+        .filter(Question.quiz_id == quiz_id, earlier.quiz_id != quiz_id).all()
+    return dict(rows)
+
+def _bank_candidates(user_id, quiz_type, topic, limit):
+    """
+    Return up to limit (question, effective question type) pairs from the
+    user's quizzes, best topic matches first, or newest first without a topic.
+
+    Questions copied or repeated from another question that still exists are
+    left out, so the bank holds every question once.
+    """
+    from app import db
+    from models import Quiz, Question
+    from sqlalchemy.orm import aliased
+    from utils.quiz_search import search_question_ids
+
+    source = aliased(Question)
+    question_type = db.func.coalesce(Question.question_type, Quiz.quiz_type)
+    query = db.session.query(Question, question_type).join(Quiz, Quiz.id == Question.quiz_id) \
+        .outerjoin(source, source.id == Question.repeat_of_id) \
+        .filter(Quiz.user_id == user_id, source.id.is_(None))
+    if quiz_type in SINGLE_QUESTION_TYPES:
+        query = query.filter(question_type == quiz_type)
+
+    if not topic:
+        return query.order_by(Question.id.desc()).limit(limit).all()
+
+    # Ask the search index for more than needed, as some matches may be of another type
+    ranked_ids = search_question_ids(user_id, topic, limit * 2)
+    if not ranked_ids:
+        return []
+    rows = {question.id: (question, row_type)
+            for question, row_type in query.filter(Question.id.in_(ranked_ids)).all()}
+    return [rows[question_id] for question_id in ranked_ids if question_id in rows][:limit]
+
+def build_quiz_from_bank(user_id, quiz_type, question_count, topic='', threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Assemble a quiz from questions the user already has, without calling the LLM.
+
+    Questions are taken in order of relevance to the topic (or newest first),
+    skipping any that nearly repeat a question already picked.
+
+    Args:
+        user_id (int): Owner of the question bank
+        quiz_type (str): Type of question wanted, or a mixed type for any
+        question_count (int): Number of questions wanted
+        topic (str): Words the questions should be about; empty for any
+
+    Returns:
+        tuple: (quiz data, ids of the bank questions used); fewer than
+            question_count questions when the bank runs short
+    """
+    from utils.quiz_exporters import question_type_of
+
+    candidates = _bank_candidates(user_id, quiz_type, (topic or '').strip(),
+                                  question_count * BANK_CANDIDATES_PER_QUESTION)
+
+    duplicates = NearDuplicateFilter(threshold)
+    quiz_data = []
+    source_ids = []
+    for question, question_type in candidates:
+        signature = unpack_fingerprint(question.fingerprint) or minhash_signature(question.text, question.answer)
+        if not duplicates.add(signature):
+            continue
+
+        question_data = question.to_dict()
+        if quiz_type not in SINGLE_QUESTION_TYPES:
+            # Questions of mixed quizzes may not store their type; it is guessed from their fields
+            question_type = question_type_of(question_data, question_type)
+            question_data.pop('question_type', None)
+            question_data = dict(question_type=question_type, **question_data)
+        else:
+            question_data.pop('question_type', None)
+        quiz_data.append(question_data)
+        source_ids.append(question.id)
+
+        if len(quiz_data) == question_count:
+            break
+
+    return quiz_data, source_ids
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# Entries kept in the per-process LRU tier
+CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get("QUIZCRAFT_CACHE_MEMORY_MAX_ENTRIES", "256"))
+
+# Entries kept in the shared database tier
+CACHE_DB_MAX_ENTRIES = int(os.environ.get("QUIZCRAFT_CACHE_DB_MAX_ENTRIES", "10000"))
+
+# How long a generated quiz may be served from the cache
+CACHE_TTL_SECONDS = int(os.environ.get("QUIZCRAFT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Expired and surplus database entries are pruned once every this many writes
+CACHE_DB_PRUNE_INTERVAL = 100
+
+def make_cache_key(content, quiz_type, question_count, model_name):
+    """
+    Build a content-addressed cache key for a quiz generation request.
+
+    Args:
+        content (str): The (already truncated) content sent to the model
+        quiz_type (str): The type of quiz requested
+        question_count (int): The number of questions requested
+        model_name (str): The model that generates the quiz
+
+    Returns:
+        str: A hex SHA-256 digest identifying the request
+    """
+    # Collapse whitespace so re-extracted copies of the same document share a key
+    normalized_content = ' '.join(content.split())
+    key_material = json.dumps([normalized_content, quiz_type, int(question_count), model_name])
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class QuizCache:
+    """
+    Two-tier cache for generated quizzes.
+
+    The first tier is an in-process LRU; the second is the QuizCacheEntry table,
+    shared by every web process. Values are stored as JSON strings so callers
+    always receive their own copy of the quiz data.
+    """
+
+    def __init__(self, memory_max_entries=CACHE_MEMORY_MAX_ENTRIES,
+                 db_max_entries=CACHE_DB_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.memory = LRUCache(memory_max_entries, ttl_seconds)
+        self.db_max_entries = db_max_entries
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self._stats_lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'writes': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """
+        Return a snapshot of the hit/miss counters for this process.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_ratio'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self.memory)
+        return stats
+
+    def get(self, key):
+        """
+        Look up a quiz by cache key.
+
+        Returns:
+            list: The cached quiz data, or None on a miss
+        """
+        payload = self.memory.get(key)
+        if payload is not None:
+            self._count('memory_hits')
+            return json.loads(payload)
+
+        payload = self._db_get(key)
+        if payload is not None:
+            self._count('db_hits')
+            self.memory.set(key, payload)
+            return json.loads(payload)
+
+        self._count('misses')
+        return None
+
+    def set(self, key, quiz_data):
+        """
+        Store a generated quiz in both tiers.
+        """
+        payload = json.dumps(quiz_data)
+        self.memory.set(key, payload)
+        self._db_set(key, payload)
+        self._count('writes')
+
+    def _db_session(self):
+        from flask import has_app_context
+        from sqlalchemy.orm import Session
+        from app import db
+
+        if not has_app_context():
+            return None
+        # Use a separate session so cache writes never commit or roll back caller state
+        return Session(db.engine)
+
+    def _db_get(self, key):
+        session = self._db_session()
+        if session is None:
+            return None
+
+        from models import QuizCacheEntry
+
+        try:
+            with session:
+                entry = session.get(QuizCacheEntry, key)
+                if entry is None or entry.expires_at < datetime.utcnow():
+                    return None
+                return entry.content
+        except Exception as e:
+            logging.error(f"Error reading quiz cache: {str(e)}")
+            return None
+
+    def _db_set(self, key, payload):
+        session = self._db_session()
+        if session is None:
+            return
+
+        from models import QuizCacheEntry
+
+        now = datetime.utcnow()
+        try:
+            with session:
+                session.merge(QuizCacheEntry(
+                    key=key,
+                    content=payload,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl_seconds)
+                ))
+                session.commit()
+
+                with self._stats_lock:
+                    self._writes += 1
+                    prune = self._writes % CACHE_DB_PRUNE_INTERVAL == 1
+                if prune:
+                    self._db_prune(session, now)
+        except Exception as e:
+            logging.error(f"Error writing quiz cache: {str(e)}")
+
+    def _db_prune(self, session, now):
+        """
+        Delete expired entries and the oldest entries beyond the size limit.
+        """
+        from models import QuizCacheEntry
+
+        session.query(QuizCacheEntry).filter(
+            QuizCacheEntry.expires_at < now
+        ).delete(synchronize_session=False)
+
+        cutoff = session.query(QuizCacheEntry.created_at).order_by(
+            QuizCacheEntry.created_at.desc()
+        ).offset(self.db_max_entries).limit(1).scalar()
+        if cutoff is not None:
+            session.query(QuizCacheEntry).filter(
+                QuizCacheEntry.created_at <= cutoff
+            ).delete(synchronize_session=False)
+
+        session.commit()
+
+    def clear(self):
+        self.memory.clear()
+
+quiz_cache = QuizCache()
@@ -0,0 +1,123 @@
+import re
+
+# Fields of the preview edit form: question_3, question_type_3, answer_3, explanation_3 and option_3_1
+FORM_FIELD_PATTERN = re.compile(r'^(question_type|question|answer|explanation)_(\d+)$|^option_(\d+)_(\d+)$')
+
+def normalize_question(question_data):
+    """
+    Build a question dict in the shape stored for quizzes, dropping empty
+    optional fields and options.
+
+    Args:
+        question_data (dict): Question text, answer and the optional options,
+            explanation and question_type
+
+    Returns:
+        dict: The question, or None when it has no question text
+    """
+    question_text = question_data.get('question') or ''
+    if not isinstance(question_text, str) or not question_text:
+        return None
+
+    answer_text = question_data.get('answer') or ''
+    question = {
+        'question': question_text,
+        'answer': answer_text if isinstance(answer_text, str) else str(answer_text)
+    }
+
+    if question_data.get('question_type'):
+        question['question_type'] = str(question_data['question_type'])
+
+    if question_data.get('explanation'):
+        question['explanation'] = str(question_data['explanation'])
+
+    options = [str(option) for option in question_data.get('options') or [] if option]
+    if options:
+        question['options'] = options
+
+    return question
+
+def parse_quiz_form(form):
+    """
+    Decode the preview edit form into quiz data in a single pass over its fields.
+
+    Args:
+        form (MultiDict): The submitted form
+
+    Returns:
+        list: The questions in form order; questions without text are skipped
+    """
+    fields = {}
+    for key, value in form.items():
+        match = FORM_FIELD_PATTERN.match(key)
+        if match is None:
+            continue
+
+        field, index, option_index, option_position = match.groups()
+        if field is None:
+            options = fields.setdefault(int(option_index), {}).setdefault('options', {})
+            options[int(option_position)] = value
+        else:
+            fields.setdefault(int(index), {})[field] = value
+
+    quiz_data = []
+    for index in sorted(fields):
+        question_fields = fields[index]
+        options = question_fields.get('options')
+        if options is not None:
+            question_fields['options'] = [options[position] for position in sorted(options)]
+
+        question = normalize_question(question_fields)
+        if question is not None:
+            quiz_data.append(question)
+
+    return quiz_data
+
+def parse_question_changes(payload, question_count):
+    """
+    Validate the body of a partial quiz update.
+
+    The body looks like {"title": "...", "questions": [{"index": 2, "question": "...",
+    "answer": "...", ...}]}; each entry replaces the question at its index and the
+    title is optional.
+
+    Args:
+        payload (dict): The decoded JSON body
+        question_count (int): Number of questions in the quiz being edited
+
+    Returns:
+        tuple: (title or None, {index: question})
+
+    Raises:
+        ValueError: If the body is malformed or refers to a missing question
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+
+    title = payload.get('title')
+    if title is not None and (not isinstance(title, str) or not title.strip()):
+        raise ValueError("The title must be a non-empty string")
+
+    entries = payload.get('questions', [])
+    if not isinstance(entries, list):
+        raise ValueError("questions must be a list")
+
+    changes = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError("Each question must be an object")
+
+        index = entry.get('index')
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < question_count:
+            raise ValueError(f"Question index {index!r} is out of range")
+
+        options = entry.get('options')
+        if options is not None and not isinstance(options, list):
+            raise ValueError(f"Options of question {index} must be a list")
+
+        question = normalize_question(entry)
+        if question is None:
+            raise ValueError(f"Question {index} has no text")
+        changes[index] = question
+
+    return (title.strip() if title is not None else None), changes
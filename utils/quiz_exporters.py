@@ -0,0 +1,233 @@
+import io
+import csv
+import json
+from collections import namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+from utils.quiz_variants import OPTION_LETTERS, answer_option_index
+from utils.question_bank import SINGLE_QUESTION_TYPES
+
+CSV_COLUMNS = (['number', 'question_type', 'question']
+               + [f"option_{letter.lower()}" for letter in OPTION_LETTERS]
+               + ['answer', 'explanation'])
+
+# Characters with a meaning in GIFT, escaped with a backslash in question text;
+# the backslash comes first so the escapes added are not escaped again
+GIFT_SPECIAL_CHARS = '\\~=#{}:'
+
+ExportFormat = namedtuple('ExportFormat', ['label', 'mimetype', 'extension', 'writer'])
+
+def question_type_of(question, quiz_type=None):
+    """
+    Return the type of a question, guessing it from its fields when it is not stored.
+
+    Args:
+        question (dict): The question
+        quiz_type (str): The type of the quiz; questions of single-type quizzes
+            do not store their own
+    """
+    if 'question_type' in question:
+        return question['question_type']
+    elif quiz_type in SINGLE_QUESTION_TYPES:
+        return quiz_type
+    elif 'options' in question:
+        return "Multiple Choice"
+    elif question.get('answer') in ['True', 'False']:
+        return "True/False"
+    elif '_____' in question.get('question', ''):
+        return "Fill in the Blanks"
+    return "Short Answer"
+
+def correct_option_index(question):
+    """
+    Return the position of the correct option of a multiple choice question.
+
+    Returns:
+        int: The position, or None when the answer names no option, as a
+            letter or by its text
+    """
+    return answer_option_index(question.get('answer', ''), question.get('options') or [])
+
+def true_false_answer(question):
+    """
+    Return True or False for the answer of a true/false question, or None when it is neither.
+    """
+    answer = str(question.get('answer', '')).strip().lower()
+    if answer in ('true', 't'):
+        return True
+    if answer in ('false', 'f'):
+        return False
+    return None
+
+def write_json(quiz_data, quiz_title, quiz_type=None):
+    """
+    Yield the quiz as a JSON document, one question at a time.
+
+    Every question carries its question_type, so mixed and single-type
+    quizzes read the same way.
+    """
+    yield f'{{"title": {json.dumps(quiz_title)}, "quiz_type": {json.dumps(quiz_type)}, "questions": ['
+    for number, question in enumerate(quiz_data, 1):
+        question = dict(question, question_type=question_type_of(question, quiz_type))
+        yield (',' if number > 1 else '') + json.dumps(question)
+    yield ']}\n'
+
+def write_csv(quiz_data, quiz_title, quiz_type=None):
+    """
+    Yield the quiz as CSV, one row per question with an option per column.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def row(values):
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield row(CSV_COLUMNS)
+    for number, question in enumerate(quiz_data, 1):
+        options = list(question.get('options') or [])[:len(OPTION_LETTERS)]
+        options += [''] * (len(OPTION_LETTERS) - len(options))
+        yield row([number, question_type_of(question, quiz_type), question.get('question', '')]
+                  + options
+                  + [question.get('answer', ''), question.get('explanation') or ''])
+
+def gift_escape(text):
+    text = ' '.join(str(text).split())
+    # Most text holds none or one of them, so a replace per character present beats translate()
+    for char in GIFT_SPECIAL_CHARS:
+        if char in text:
+            text = text.replace(char, f"\\{char}")
+    return text
+
+def write_gift(quiz_data, quiz_title, quiz_type=None):
+    """
+    Yield the quiz in Moodle's GIFT format.
+
+    Multiple choice and true/false questions whose answer names no option
+    are written as short answer questions, so nothing is lost on import.
+    """
+    yield f"// {' '.join(quiz_title.split())}\n\n"
+    for number, question in enumerate(quiz_data, 1):
+        question_type = question_type_of(question, quiz_type)
+        text = gift_escape(question.get('question', ''))
+        answer = gift_escape(question.get('answer', ''))
+        explanation = question.get('explanation')
+        feedback = f" ####{gift_escape(explanation)}" if explanation else ""
+
+        correct = correct_option_index(question) if question_type == "Multiple Choice" else None
+        is_true = true_false_answer(question) if question_type == "True/False" else None
+
+        if correct is not None:
+            choices = ''.join(f"\n    {'=' if index == correct else '~'}{gift_escape(option)}"
+                              for index, option in enumerate(question['options']))
+            body = f"{text} {{{choices}{feedback}\n}}"
+        elif is_true is not None:
+            body = f"{text} {{{'TRUE' if is_true else 'FALSE'}{feedback}}}"
+        elif question_type == "Fill in the Blanks" and '_____' in text:
+            # The first blank becomes the answer field; GIFT has one per question
+            before, after = text.split('_____', 1)
+            body = f"{before}{{={answer}{feedback}}}{after}"
+        else:
+            body = f"{text} {{={answer}{feedback}}}"
+
+        yield f"::Q{number}:: {body}\n\n"
+
+def _qti_text(text):
+    return f'<material><mattext texttype="text/plain">{escape(str(text))}</mattext></material>'
+
+def _qti_metadata(canvas_type):
+    return ('<itemmetadata><qtimetadata><qtimetadatafield><fieldlabel>question_type</fieldlabel>'
+            f'<fieldentry>{canvas_type}</fieldentry></qtimetadatafield></qtimetadata></itemmetadata>')
+
+def _qti_choice_item(ident, canvas_type, text, labels, correct):
+    choices = ''.join(f'<response_label ident="{label}">{_qti_text(choice)}</response_label>'
+                      for label, choice in labels)
+    return (_qti_metadata(canvas_type)
+            + f'<presentation>{_qti_text(text)}'
+            + f'<response_lid ident="response_{ident}" rcardinality="Single"><render_choice>{choices}</render_choice></response_lid>'
+            + '</presentation>'
+            + '<resprocessing><outcomes><decvar maxvalue="100" minvalue="0" varname="SCORE" vartype="Decimal"/></outcomes>'
+            + f'<respcondition continue="No"><conditionvar><varequal respident="response_{ident}">{correct}</varequal></conditionvar>'
+            + '<setvar action="Set" varname="SCORE">100</setvar></respcondition></resprocessing>')
+
+def _qti_text_item(ident, text, answer):
+    return (_qti_metadata('short_answer_question')
+            + f'<presentation>{_qti_text(text)}'
+            + f'<response_str ident="response_{ident}" rcardinality="Single"><render_fib><response_label ident="answer"/></render_fib></response_str>'
+            + '</presentation>'
+            + '<resprocessing><outcomes><decvar maxvalue="100" minvalue="0" varname="SCORE" vartype="Decimal"/></outcomes>'
+            + f'<respcondition continue="No"><conditionvar><varequal respident="response_{ident}">{escape(str(answer))}</varequal></conditionvar>'
+            + '<setvar action="Set" varname="SCORE">100</setvar></respcondition></resprocessing>')
+
+def write_qti(quiz_data, quiz_title, quiz_type=None):
+    """
+    Yield the quiz as an IMS QTI 1.2 assessment, as imported by Canvas and Moodle.
+
+    Fill in the blanks and short answer questions are scored on an exact
+    match of the stored answer.
+    """
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">\n'
+           f'<assessment ident="quizcraft" title={quoteattr(quiz_title)}>\n'
+           '<section ident="root_section">\n')
+    for number, question in enumerate(quiz_data, 1):
+        ident = f"q{number}"
+        question_type = question_type_of(question, quiz_type)
+        text = question.get('question', '')
+
+        correct = correct_option_index(question) if question_type == "Multiple Choice" else None
+        is_true = true_false_answer(question) if question_type == "True/False" else None
+
+        if correct is not None:
+            labels = list(zip(OPTION_LETTERS, question['options']))
+            body = _qti_choice_item(ident, 'multiple_choice_question', text, labels, OPTION_LETTERS[correct])
+        elif is_true is not None:
+            labels = [('true', 'True'), ('false', 'False')]
+            body = _qti_choice_item(ident, 'true_false_question', text, labels, 'true' if is_true else 'false')
+        else:
+            body = _qti_text_item(ident, text, question.get('answer', ''))
+
+        explanation = question.get('explanation')
+        if explanation:
+            body += f'<itemfeedback ident="general_fb"><flow_mat>{_qti_text(explanation)}</flow_mat></itemfeedback>'
+
+        yield f'<item ident="{ident}" title="Question {number}">{body}</item>\n'
+    yield '</section>\n</assessment>\n</questestinterop>\n'
+
+QUIZ_EXPORT_FORMATS = {
+    'json': ExportFormat('JSON', 'application/json', 'json', write_json),
+    'csv': ExportFormat('CSV', 'text/csv', 'csv', write_csv),
+    'gift': ExportFormat('Moodle GIFT', 'text/plain', 'gift.txt', write_gift),
+    'qti': ExportFormat('IMS QTI 1.2', 'application/xml', 'qti.xml', write_qti),
+}
+
+def get_export_format(name):
+    """
+    Return the export format registered under name.
+    """
+    if name not in QUIZ_EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{name}'. Choose one of: {', '.join(QUIZ_EXPORT_FORMATS)}")
+    return QUIZ_EXPORT_FORMATS[name]
+
+def export_quiz(name, quiz_data, quiz_title, quiz_type=None):
+    """
+    Yield a quiz in the export format registered under name, as UTF-8 chunks.
+
+    Args:
+        name (str): A key of QUIZ_EXPORT_FORMATS
+        quiz_data (iterable): Question dicts, read once
+        quiz_title (str): The title of the quiz
+        quiz_type (str): The type of the quiz, which single-type questions inherit
+
+    Yields:
+        bytes: The next piece of the export
+    """
+    writer = get_export_format(name).writer
+    for chunk in writer(quiz_data, quiz_title, quiz_type):
+        yield chunk.encode('utf-8')
+
+def export_filename(quiz_title, name):
+    return f"{quiz_title.replace(' ', '_')}.{get_export_format(name).extension}"
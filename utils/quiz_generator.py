@@ -1,47 +1,67 @@
 import os
+import re
 import json
+import time
 import logging
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+from utils.quiz_cache import quiz_cache, make_cache_key
+from utils.llm_client import get_llm_client, CHARS_PER_TOKEN
+from utils.metrics import STAGE_SECONDS
 
-# Configure the Gemini API
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
-genai.configure(api_key=GEMINI_API_KEY)
+# Keep content within a reasonable length for a single API call
+MAX_CONTENT_LENGTH = 10000
 
-def generate_quiz_with_gemini(content, quiz_type, question_count):
+# Characters shared by neighbouring sections in chunked mode, so facts that
+# straddle a boundary are seen whole by at least one call
+CHUNK_OVERLAP = 500
+
+# Maximum number of concurrent Gemini calls for one chunked generation; the
+# LLM client additionally caps concurrent calls across the whole process
+CHUNK_PARALLELISM = int(os.environ.get("QUIZCRAFT_CHUNK_PARALLELISM", "4"))
+
+# Most sections one chunked generation sends, each in its own call; longer
+# documents are sampled evenly. At most one more call tops up questions lost to
+# failed sections or de-duplication
+CHUNKED_MAX_SECTIONS = int(os.environ.get("QUIZCRAFT_CHUNKED_MAX_SECTIONS", "8"))
+
+# Quiz types offered by the generator form
+QUIZ_TYPES = ['Multiple Choice', 'True/False', 'Fill in the Blanks', 'Short Answer', 'Mixed Type']
+
+def validate_quiz_request(content, question_count):
     """
-    Generate a quiz using Google's Gemini API based on the provided content.
-    
-    Args:
-        content (str): The text content to generate a quiz from
-        quiz_type (str): The type of quiz to generate (Multiple Choice, True/False, etc.)
-        question_count (int): The number of questions to generate (between 5-75)
-        
-    Returns:
-        dict: A dictionary containing the quiz questions and answers
+    Raise ValueError when the content or question count cannot produce a quiz.
     """
-    logging.debug(f"Generating {quiz_type} quiz with {question_count} questions")
-    
-    if not GEMINI_API_KEY:
-        logging.error("No Gemini API key provided")
-        raise ValueError("Gemini API key is required. Please set the GEMINI_API_KEY environment variable.")
-    
-    # Validate inputs
     if not content or len(content.strip()) < 50:
         raise ValueError("Content is too short. Please provide more text to generate a meaningful quiz.")
     
     if question_count < 5 or question_count > 75:
         raise ValueError("Question count must be between 5 and 75.")
+
+def build_content_prefix(content):
+    """
+    Return the start of every quiz prompt for content.
     
-    # Keep content within a reasonable length for the API
-    max_content_length = 10000
-    if len(content) > max_content_length:
-        content = content[:max_content_length]
-        logging.info(f"Content truncated to {max_content_length} characters")
+    The content comes before the instructions, so the prompts for different quiz
+    types of the same document share a long prefix that the provider can cache.
+    """
+    return f"Content:\n{content}\n"
+
+def build_quiz_prompt(content, quiz_type, question_count):
+    """
+    Build the Gemini prompt for a quiz of the given type.
     
+    Args:
+        content (str): The text content to generate a quiz from
+        quiz_type (str): The type of quiz to generate
+        question_count (int): The number of questions to generate
+        
+    Returns:
+        str: The prompt text
+    """
     # Create the appropriate prompt based on quiz type
     if quiz_type == "Multiple Choice":
         prompt = f"""
-        Create a multiple-choice quiz with {question_count} questions based on the following content. 
+        Create a multiple-choice quiz with {question_count} questions based on the content above. 
         For each question, provide 4 options (A, B, C, D) with exactly one correct answer.
         Format the response as a JSON array with the following structure:
         [
@@ -57,13 +77,10 @@ def generate_quiz_with_gemini(content, quiz_type, question_count):
                 "explanation": "Brief explanation of the correct answer"
             }}
         ]
-        
-        Content:
-        {content}
         """
     elif quiz_type == "True/False":
         prompt = f"""
-        Create a true/false quiz with {question_count} questions based on the following content.
+        Create a true/false quiz with {question_count} questions based on the content above.
         Format the response as a JSON array with the following structure:
         [
             {{
@@ -72,13 +89,10 @@ def generate_quiz_with_gemini(content, quiz_type, question_count):
                 "explanation": "Brief explanation of the correct answer"
             }}
         ]
-        
-        Content:
-        {content}
         """
     elif quiz_type == "Fill in the Blanks":
         prompt = f"""
-        Create a fill-in-the-blanks quiz with {question_count} questions based on the following content.
+        Create a fill-in-the-blanks quiz with {question_count} questions based on the content above.
         Use _____ to indicate blanks in the question text.
         Format the response as a JSON array with the following structure:
         [
@@ -88,13 +102,10 @@ def generate_quiz_with_gemini(content, quiz_type, question_count):
                 "explanation": "Brief explanation of the correct answer"
             }}
         ]
-        
-        Content:
-        {content}
         """
     elif quiz_type == "Short Answer":
         prompt = f"""
-        Create a short answer quiz with {question_count} questions based on the following content.
+        Create a short answer quiz with {question_count} questions based on the content above.
         Format the response as a JSON array with the following structure:
         [
             {{
@@ -103,13 +114,10 @@ def generate_quiz_with_gemini(content, quiz_type, question_count):
                 "explanation": "Brief explanation of the correct answer"
             }}
         ]
-        
-        Content:
-        {content}
         """
     else:  # Mixed type
         prompt = f"""
-        Create a mixed-type quiz with {question_count} questions based on the following content.
+        Create a mixed-type quiz with {question_count} questions based on the content above.
         Include a combination of multiple-choice, true/false, fill-in-the-blanks, and short answer questions.
         Format the response as a JSON array with the following structure:
         [
@@ -139,37 +147,440 @@ def generate_quiz_with_gemini(content, quiz_type, question_count):
                 "explanation": "Brief explanation of the correct answer"
             }}
         ]
+        """
+    
+    return build_content_prefix(content) + prompt
+
+def parse_quiz_response(response_text):
+    """
+    Extract the JSON array of questions from a Gemini response.
+    
+    Args:
+        response_text (str): The raw text returned by the model
         
-        Content:
-        {content}
+    Returns:
+        list: The parsed quiz questions
+    """
+    # Find the start and end of the JSON array
+    start_idx = response_text.find('[')
+    end_idx = response_text.rfind(']') + 1
+    
+    if start_idx == -1 or end_idx == 0:
+        raise ValueError("Invalid response format from Gemini API")
+    
+    json_content = response_text[start_idx:end_idx]
+    quiz_data = json.loads(json_content)
+    
+    # Validate the response
+    if not isinstance(quiz_data, list) or len(quiz_data) == 0:
+        raise ValueError("Invalid quiz data format")
+    
+    return quiz_data
+
+class QuizStreamParser:
+    """
+    Incrementally parse the JSON array of questions in a streamed Gemini response.
+    
+    Text is fed in arbitrary pieces; every question object is returned as soon as
+    its closing brace arrives. Anything before the opening '[' (such as a
+    markdown code fence) is ignored.
+    """
+    
+    def __init__(self):
+        self._buffer = []
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.questions = []
+    
+    def feed(self, text):
         """
+        Consume the next piece of response text.
+        
+        Returns:
+            list: The question objects completed by this piece
+        """
+        completed = []
+        for char in text:
+            if not self._in_array:
+                self._in_array = char == '['
+                continue
+            
+            if self._depth > 0:
+                self._buffer.append(char)
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    question = json.loads(''.join(self._buffer))
+                    self._buffer = []
+                    completed.append(question)
+        
+        self.questions.extend(completed)
+        return completed
+
+def _generate_quiz_for_content(content, quiz_type, question_count, use_cache=True):
+    """
+    Generate a quiz for content that already fits in a single API call.
+    """
+    llm_client = get_llm_client()
+    cache_key = make_cache_key(content, quiz_type, question_count, llm_client.model_name)
+    if use_cache:
+        cached_quiz = quiz_cache.get(cache_key)
+        if cached_quiz is not None:
+            logging.info(f"Serving {quiz_type} quiz from cache")
+            return cached_quiz
+    
+    prompt = build_quiz_prompt(content, quiz_type, question_count)
     
     try:
-        # Initialize the Gemini model - using Gemini 1.5 Pro
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        
-        # Generate response
-        response = model.generate_content(prompt)
+        # Generate response through the shared, rate-limited client
+        response_text = llm_client.generate(prompt)
         
         # Extract and parse the JSON content
-        response_text = response.text
+        with STAGE_SECONDS.time(stage='parse', kind='json'):
+            quiz_data = parse_quiz_response(response_text)
         
-        # Find the start and end of the JSON array
-        start_idx = response_text.find('[')
-        end_idx = response_text.rfind(']') + 1
+        quiz_cache.set(cache_key, quiz_data)
+        return quiz_data
+    
+    except Exception as e:
+        logging.error(f"Error generating quiz: {str(e)}")
+        raise
+
+def generate_quiz_with_gemini(content, quiz_type, question_count, use_cache=True):
+    """
+    Generate a quiz with the configured LLM provider (Google Gemini by default)
+    based on the provided content.
+    
+    Args:
+        content (str): The text content to generate a quiz from
+        quiz_type (str): The type of quiz to generate (Multiple Choice, True/False, etc.)
+        question_count (int): The number of questions to generate (between 5-75)
+        use_cache (bool): Serve identical earlier requests from the cache; pass False
+            to ask the model for a fresh variant
         
-        if start_idx == -1 or end_idx == 0:
-            raise ValueError("Invalid response format from Gemini API")
+    Returns:
+        dict: A dictionary containing the quiz questions and answers
+    """
+    logging.debug(f"Generating {quiz_type} quiz with {question_count} questions")
+    
+    validate_quiz_request(content, question_count)
+    
+    if len(content) > MAX_CONTENT_LENGTH:
+        content = content[:MAX_CONTENT_LENGTH]
+        logging.info(f"Content truncated to {MAX_CONTENT_LENGTH} characters")
+    
+    return _generate_quiz_for_content(content, quiz_type, question_count, use_cache)
+
+def split_into_chunks(content, chunk_size=MAX_CONTENT_LENGTH, overlap=CHUNK_OVERLAP):
+    """
+    Split text into overlapping sections of at most chunk_size characters.
+    
+    Sections end at the last paragraph or whitespace break before the limit when
+    one exists, so words and sentences are not cut in half.
+    
+    Args:
+        content (str): The full text
+        chunk_size (int): The maximum length of a section
+        overlap (int): The number of characters repeated at the start of the next section
         
-        json_content = response_text[start_idx:end_idx]
-        quiz_data = json.loads(json_content)
+    Returns:
+        list: The sections, in document order
+    """
+    chunks = []
+    start = 0
+    while start < len(content):
+        end = min(start + chunk_size, len(content))
+        if end < len(content):
+            # Prefer a paragraph break, then any whitespace, in the second half of the window
+            break_at = content.rfind('\n\n', start + chunk_size // 2, end)
+            if break_at == -1:
+                break_at = content.rfind(' ', start + chunk_size // 2, end)
+            if break_at != -1:
+                end = break_at
         
-        # Validate the response
-        if not isinstance(quiz_data, list) or len(quiz_data) == 0:
-            raise ValueError("Invalid quiz data format")
+        chunk = content[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
         
-        return quiz_data
+        if end >= len(content):
+            break
+        start = max(end - overlap, start + 1)
+    
+    return chunks
+
+def allocate_question_counts(chunks, question_count):
+    """
+    Spread question_count across chunks in proportion to their length.
+    
+    Uses the largest-remainder method so the counts always add up exactly.
+    
+    Returns:
+        list: The number of questions to ask for each chunk (may contain zeros)
+    """
+    total_length = sum(len(chunk) for chunk in chunks)
+    quotas = [question_count * len(chunk) / total_length for chunk in chunks]
+    counts = [int(quota) for quota in quotas]
+    
+    by_remainder = sorted(range(len(chunks)), key=lambda i: quotas[i] - counts[i], reverse=True)
+    for i in by_remainder[:question_count - sum(counts)]:
+        counts[i] += 1
+    
+    return counts
+
+def _normalize_question(question):
+    return re.sub(r'\W+', ' ', str(question.get('question', '')).lower()).strip()
+
+def merge_quizzes(quizzes, question_count):
+    """
+    Merge per-chunk quizzes in document order, dropping duplicate questions.
+    
+    Overlapping sections often produce the same question twice; questions are
+    considered duplicates when their text matches after normalizing case,
+    punctuation and whitespace.
+    """
+    merged = []
+    seen = set()
+    for quiz_data in quizzes:
+        for question in quiz_data:
+            key = _normalize_question(question)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(question)
+    
+    return merged[:question_count]
+
+def generate_quiz_chunked(content, quiz_type, question_count, use_cache=True,
+                          max_parallel=CHUNK_PARALLELISM):
+    """
+    Generate a quiz that covers the whole of a long document.
+    
+    The content is split into overlapping sections, at most
+    CHUNKED_MAX_SECTIONS of them are sampled, the questions are spread across
+    them by size, and the per-section Gemini calls run concurrently. The
+    results are merged and de-duplicated into a single quiz; when that leaves
+    it short, one more call asks for the missing questions. Content that fits
+    in one call is handled exactly like generate_quiz_with_gemini.
+    
+    Args:
+        content (str): The full text content to generate a quiz from
+        quiz_type (str): The type of quiz to generate
+        question_count (int): The number of questions to generate (between 5-75)
+        use_cache (bool): Serve identical earlier section requests from the cache
+        max_parallel (int): The maximum number of concurrent Gemini calls
+        
+    Returns:
+        list: The merged quiz questions
+    
+    Raises:
+        ValueError: When fewer than question_count distinct questions could be generated
+    """
+    validate_quiz_request(content, question_count)
+    
+    if len(content) <= MAX_CONTENT_LENGTH:
+        return _generate_quiz_for_content(content, quiz_type, question_count, use_cache)
+    
+    chunks = split_into_chunks(content)
+    max_sections = max(1, min(question_count, CHUNKED_MAX_SECTIONS))
+    if len(chunks) > max_sections:
+        # Sample evenly spaced sections so the questions still cover the whole document
+        step = len(chunks) / max_sections
+        chunks = [chunks[int(i * step)] for i in range(max_sections)]
+    
+    counts = allocate_question_counts(chunks, question_count)
+    work = [(chunk, count) for chunk, count in zip(chunks, counts) if count > 0]
+    logging.info(f"Generating {quiz_type} quiz from {len(work)} sections of {len(content)} characters")
+    
+    # Cache lookups in worker threads need the application context of the caller
+    from flask import has_app_context, current_app
+    app = current_app._get_current_object() if has_app_context() else None
+    
+    def generate_section(item):
+        chunk, count = item
+        try:
+            if app is not None:
+                with app.app_context():
+                    return _generate_quiz_for_content(chunk, quiz_type, count, use_cache)
+            return _generate_quiz_for_content(chunk, quiz_type, count, use_cache)
+        except Exception as e:
+            logging.error(f"Error generating quiz section: {str(e)}")
+            return e
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(work)))) as executor:
+        results = list(executor.map(generate_section, work))
+    
+    quizzes = [result for result in results if not isinstance(result, Exception)]
+    if not quizzes:
+        raise results[0]
+    failed = [item for item, result in zip(work, results) if isinstance(result, Exception)]
+    if failed:
+        logging.warning(f"{len(failed)} of {len(results)} quiz sections failed")
+    
+    merged = merge_quizzes(quizzes, question_count)
+    missing = question_count - len(merged)
+    if missing > 0:
+        # Ask a failed section again, or else the longest one, for more than are
+        # missing, since some of them may repeat questions already asked
+        chunk = failed[0][0] if failed else max((chunk for chunk, _ in work), key=len)
+        logging.info(f"Topping up {missing} missing questions of a chunked {quiz_type} quiz")
+        result = generate_section((chunk, min(2 * missing + 2, 75)))
+        if not isinstance(result, Exception):
+            merged = merge_quizzes(quizzes + [result], question_count)
+    
+    if len(merged) < question_count:
+        raise ValueError(f"Only {len(merged)} of the {question_count} questions could be generated "
+                         f"from this document. Please try again or ask for fewer questions.")
+    return merged
+
+def _call_tokens(prompt, quiz_data):
+    """
+    Estimate the prompt and completion tokens of the call that produced quiz_data.
+    """
+    return (len(prompt) + len(json.dumps(quiz_data, indent=2))) // CHARS_PER_TOKEN
+
+def generate_quiz_variants(content, quiz_types, question_count, use_cache=True,
+                           max_parallel=CHUNK_PARALLELISM):
+    """
+    Generate quizzes of several types from the same content.
+    
+    The content is validated and truncated once, and every prompt starts with
+    the same content prefix (see build_content_prefix), so calls sent together
+    can be served from the provider's prompt cache. Types found in the quiz
+    cache are not sent at all; the others are generated concurrently.
+    
+    Args:
+        content (str): The text content to generate the quizzes from
+        quiz_types (list): The quiz types to generate, each at most once
+        question_count (int): The number of questions of each quiz (between 5-75)
+        use_cache (bool): Serve identical earlier requests from the cache
+        max_parallel (int): The maximum number of concurrent Gemini calls
+        
+    Returns:
+        tuple: ({quiz type: quiz data} for the types generated, token report); the
+            report estimates the tokens sent and those saved by the shared prefix
+            and the cache, and lists the types that failed
+    """
+    validate_quiz_request(content, question_count)
+    
+    if len(content) > MAX_CONTENT_LENGTH:
+        content = content[:MAX_CONTENT_LENGTH]
+        logging.info(f"Content truncated to {MAX_CONTENT_LENGTH} characters")
+    
+    llm_client = get_llm_client()
+    prompts = {quiz_type: build_quiz_prompt(content, quiz_type, question_count) for quiz_type in quiz_types}
+    quizzes = {}
+    if use_cache:
+        for quiz_type in quiz_types:
+            cached_quiz = quiz_cache.get(make_cache_key(content, quiz_type, question_count, llm_client.model_name))
+            if cached_quiz is not None:
+                quizzes[quiz_type] = cached_quiz
+    cached_types = list(quizzes)
+    pending = [quiz_type for quiz_type in quiz_types if quiz_type not in quizzes]
+    logging.info(f"Generating {len(pending)} of {len(quiz_types)} quiz types from {len(content)} characters")
+    
+    # Cache writes in worker threads need the application context of the caller
+    from flask import has_app_context, current_app
+    app = current_app._get_current_object() if has_app_context() else None
+    
+    def generate_variant(quiz_type):
+        try:
+            # The cache was already checked above
+            if app is not None:
+                with app.app_context():
+                    return _generate_quiz_for_content(content, quiz_type, question_count, use_cache=False)
+            return _generate_quiz_for_content(content, quiz_type, question_count, use_cache=False)
+        except Exception as e:
+            logging.error(f"Error generating {quiz_type} quiz variant: {str(e)}")
+            return e
+    
+    results = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(pending)))) as executor:
+            results = list(executor.map(generate_variant, pending))
+    
+    failed = [quiz_type for quiz_type, result in zip(pending, results) if isinstance(result, Exception)]
+    quizzes.update((quiz_type, result) for quiz_type, result in zip(pending, results)
+                   if not isinstance(result, Exception))
+    if not quizzes:
+        raise results[0]
+    
+    sent = [quiz_type for quiz_type in pending if quiz_type in quizzes]
+    prefix_tokens = len(build_content_prefix(content)) // CHARS_PER_TOKEN
+    report = {
+        'llm_calls': len(pending),
+        'cache_hits': len(cached_types),
+        'failed': failed,
+        'prompt_tokens': sum(len(prompts[quiz_type]) for quiz_type in pending) // CHARS_PER_TOKEN,
+        # Prompt tokens that repeat a prefix already sent, which providers with
+        # prompt caching bill at a discount
+        'shared_prefix_tokens': prefix_tokens * max(0, len(sent) - 1),
+        # Estimated prompt and completion tokens of each quiz, and of the calls the cache avoided
+        'call_tokens': {quiz_type: _call_tokens(prompts[quiz_type], quizzes[quiz_type]) for quiz_type in quizzes},
+        'cache_saved_tokens': sum(_call_tokens(prompts[quiz_type], quizzes[quiz_type]) for quiz_type in cached_types),
+    }
+    return {quiz_type: quizzes[quiz_type] for quiz_type in quiz_types if quiz_type in quizzes}, report
+
+def stream_quiz_with_gemini(content, quiz_type, question_count, use_cache=True):
+    """
+    Generate a quiz with the LLM provider's streaming API, yielding each question
+    as soon as it has been received in full.
+    
+    Takes the same arguments as generate_quiz_with_gemini. Cached quizzes are
+    yielded immediately, and a completed stream is stored in the cache.
+    
+    Yields:
+        dict: One quiz question at a time, in order
+    """
+    logging.debug(f"Streaming {quiz_type} quiz with {question_count} questions")
+    
+    validate_quiz_request(content, question_count)
+    
+    if len(content) > MAX_CONTENT_LENGTH:
+        content = content[:MAX_CONTENT_LENGTH]
+        logging.info(f"Content truncated to {MAX_CONTENT_LENGTH} characters")
+    
+    llm_client = get_llm_client()
+    cache_key = make_cache_key(content, quiz_type, question_count, llm_client.model_name)
+    if use_cache:
+        cached_quiz = quiz_cache.get(cache_key)
+        if cached_quiz is not None:
+            logging.info(f"Serving {quiz_type} quiz from cache")
+            yield from cached_quiz
+            return
+    
+    prompt = build_quiz_prompt(content, quiz_type, question_count)
+    
+    try:
+        parser = QuizStreamParser()
+        parse_seconds = 0.0
+        for text in llm_client.stream(prompt):
+            started = time.perf_counter()
+            questions = parser.feed(text)
+            parse_seconds += time.perf_counter() - started
+            yield from questions
+        STAGE_SECONDS.observe(parse_seconds, stage='parse', kind='stream')
+        
+        if not parser.questions:
+            raise ValueError("Invalid response format from Gemini API")
+        
+        quiz_cache.set(cache_key, parser.questions)
     
     except Exception as e:
-        logging.error(f"Error generating quiz: {str(e)}")
+        logging.error(f"Error streaming quiz: {str(e)}")
         raise
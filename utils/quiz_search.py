@@ -0,0 +1,350 @@
+import os
+import re
+import json
+import logging
+from sqlalchemy import text, inspect
+
+# Search results shown per page
+SEARCH_PAGE_SIZE = int(os.environ.get("QUIZCRAFT_SEARCH_PAGE_SIZE", "20"))
+
+# Rows written per statement when the index is rebuilt
+SEARCH_REBUILD_BATCH_SIZE = 1000
+
+# Text search configuration used by Postgres; SQLite stems English words with the porter tokenizer
+POSTGRES_TEXT_SEARCH_CONFIG = 'english'
+
+# Delimiters of the matched terms in snippets, turned into match offsets
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+SEARCH_TABLE = 'quiz_search'
+
+# Every question and every quiz title is one entry. Questions use their id as the
+# entry id and titles the negated quiz id, so both fit in one integer key.
+# user_id is indexed, so a search only visits the entries of its user.
+SQLITE_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "content, quiz_id UNINDEXED, user_id, tokenize='porter unicode61')",
+]
+
+# Column weights of the SQLite ranking; the user_id column matches every entry searched
+SQLITE_RANK = f"bm25({SEARCH_TABLE}, 1.0, 0.0, 0.0)"
+
+POSTGRES_SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+    "entry_id BIGINT PRIMARY KEY, "
+    "quiz_id INTEGER NOT NULL, "
+    "user_id INTEGER NOT NULL, "
+    "content TEXT NOT NULL, "
+    f"document tsvector GENERATED ALWAYS AS (to_tsvector('{POSTGRES_TEXT_SEARCH_CONFIG}', content)) STORED)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_quiz_id ON {SEARCH_TABLE} (quiz_id)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_user_id ON {SEARCH_TABLE} (user_id)",
+]
+
+SEARCH_SCHEMAS = {
+    'sqlite': SQLITE_SCHEMA,
+    'postgresql': POSTGRES_SCHEMA,
+}
+
+def is_supported(dialect_name):
+    return dialect_name in SEARCH_SCHEMAS
+
+def question_document(text_value, options, answer, explanation):
+    """
+    Join the searchable fields of a question into the text that is indexed.
+
+    Args:
+        text_value (str): The question text
+        options (str): The JSON list of options, or None
+        answer (str): The answer
+        explanation (str): The explanation, or None
+
+    Returns:
+        str: The indexed text
+    """
+    parts = [text_value or '']
+    if options:
+        try:
+            parts.extend(str(option) for option in json.loads(options))
+        except ValueError:
+            parts.append(options)
+    parts.append(answer or '')
+    parts.append(explanation or '')
+    return '\n'.join(part for part in parts if part)
+
+def create_search_index(connection):
+    """
+    Create the search index tables when the database supports them.
+
+    An SQLite index from before user_id was indexed is dropped and created again.
+
+    Returns:
+        bool: True when the index was created by this call and needs to be filled
+    """
+    dialect_name = connection.dialect.name
+    if not is_supported(dialect_name):
+        logging.warning(f"Full-text search is not available on {dialect_name}; search falls back to LIKE")
+        return False
+
+    if SEARCH_TABLE in inspect(connection).get_table_names():
+        if dialect_name == 'postgresql':
+            # Adds the indexes created since the table was
+            for statement in SEARCH_SCHEMAS[dialect_name]:
+                connection.execute(text(statement))
+            return False
+        schema = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"),
+                                    {'name': SEARCH_TABLE}).scalar()
+        if 'user_id UNINDEXED' not in schema:
+            return False
+        logging.info(f"Dropping search index {SEARCH_TABLE} to index its user_id column")
+        connection.execute(text(f"DROP TABLE {SEARCH_TABLE}"))
+
+    logging.info(f"Creating search index {SEARCH_TABLE}")
+    for statement in SEARCH_SCHEMAS[dialect_name]:
+        connection.execute(text(statement))
+    return True
+
+def _upsert_entries(connection, entries):
+    """
+    Write index entries, given as dicts with entry_id, quiz_id, user_id and content.
+    """
+    if not entries:
+        return
+
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :entry_id"),
+                           [{'entry_id': entry['entry_id']} for entry in entries])
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE} (rowid, content, quiz_id, user_id) "
+                                "VALUES (:entry_id, :content, :quiz_id, :user_id)"), entries)
+    else:
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE} (entry_id, quiz_id, user_id, content) "
+                                "VALUES (:entry_id, :quiz_id, :user_id, :content) "
+                                "ON CONFLICT (entry_id) DO UPDATE SET content = excluded.content"), entries)
+
+def _delete_entry(connection, entry_id):
+    key = 'rowid' if connection.dialect.name == 'sqlite' else 'entry_id'
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE {key} = :entry_id"), {'entry_id': entry_id})
+
+def rebuild_search_index(connection):
+    """
+    Index every quiz title and question, replacing what the index held.
+
+    Used when the index is first created and after rows were written without
+    the ORM (such as bulk inserts).
+
+    Returns:
+        int: The number of entries written
+    """
+    if not is_supported(connection.dialect.name):
+        return 0
+
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+
+    written = 0
+    titles = connection.execute(text("SELECT id, user_id, title FROM quiz"))
+    while True:
+        rows = titles.fetchmany(SEARCH_REBUILD_BATCH_SIZE)
+        if not rows:
+            break
+        _upsert_entries(connection, [{'entry_id': -quiz_id, 'quiz_id': quiz_id, 'user_id': user_id,
+                                      'content': title} for quiz_id, user_id, title in rows])
+        written += len(rows)
+
+    last_id = 0
+    while True:
+        # Keyset batches, so the rows being inserted are never read by an open cursor
+        rows = connection.execute(text(
+            "SELECT question.id, question.quiz_id, quiz.user_id, question.text, question.options, "
+            "question.answer, question.explanation FROM question JOIN quiz ON quiz.id = question.quiz_id "
+            "WHERE question.id > :last_id ORDER BY question.id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': SEARCH_REBUILD_BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        _upsert_entries(connection, [{
+            'entry_id': question_id,
+            'quiz_id': quiz_id,
+            'user_id': user_id,
+            'content': question_document(text_value, options, answer, explanation),
+        } for question_id, quiz_id, user_id, text_value, options, answer, explanation in rows])
+        last_id = rows[-1][0]
+        written += len(rows)
+
+    logging.info(f"Indexed {written} quiz titles and questions for search")
+    return written
+
+# Index maintenance, run inside the flush that writes the quiz or question
+
+def _index_question(mapper, connection, question):
+    if not is_supported(connection.dialect.name):
+        return
+    user_id = connection.execute(text("SELECT user_id FROM quiz WHERE id = :quiz_id"),
+                                 {'quiz_id': question.quiz_id}).scalar()
+    _upsert_entries(connection, [{
+        'entry_id': question.id,
+        'quiz_id': question.quiz_id,
+        'user_id': user_id,
+        'content': question_document(question.text, question.options, question.answer, question.explanation),
+    }])
+
+def _unindex_question(mapper, connection, question):
+    if is_supported(connection.dialect.name):
+        _delete_entry(connection, question.id)
+
+def _index_quiz_title(mapper, connection, quiz):
+    if is_supported(connection.dialect.name):
+        _upsert_entries(connection, [{'entry_id': -quiz.id, 'quiz_id': quiz.id,
+                                      'user_id': quiz.user_id, 'content': quiz.title}])
+
+def _reindex_quiz_title(mapper, connection, quiz):
+    if inspect(quiz).attrs.title.history.has_changes():
+        _index_quiz_title(mapper, connection, quiz)
+
+def _unindex_quiz(mapper, connection, quiz):
+    if is_supported(connection.dialect.name):
+        _delete_entry(connection, -quiz.id)
+
+def init_search_index(app):
+    """
+    Keep the search index in step with every quiz and question written through the ORM.
+    """
+    from sqlalchemy import event
+    from models import Quiz, Question
+
+    if event.contains(Question, 'after_insert', _index_question):
+        return
+
+    event.listen(Question, 'after_insert', _index_question)
+    event.listen(Question, 'after_update', _index_question)
+    event.listen(Question, 'after_delete', _unindex_question)
+    event.listen(Quiz, 'after_insert', _index_quiz_title)
+    event.listen(Quiz, 'after_update', _reindex_quiz_title)
+    event.listen(Quiz, 'after_delete', _unindex_quiz)
+
+def _match_expression(user_id, query):
+    """
+    Turn free text into an FTS5 query that matches the user's entries whose
+    content contains every word.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return ''
+    phrases = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+    return f'user_id : "{int(user_id)}" AND content : ({phrases})'
+
+def split_snippet(snippet):
+    """
+    Remove the match delimiters from a snippet.
+
+    Returns:
+        tuple: (the snippet text, a list of [start, end] character offsets of the matched terms)
+    """
+    pieces = snippet.split(SNIPPET_START)
+    snippet_text = pieces[0]
+    matches = []
+    for piece in pieces[1:]:
+        matched, _, rest = piece.partition(SNIPPET_END)
+        matches.append([len(snippet_text), len(snippet_text) + len(matched)])
+        snippet_text += matched + rest
+    return snippet_text, matches
+
+def _search_entries(connection, user_id, query, limit, offset):
+    """
+    Return (entry_id, quiz_id, snippet) rows of the best matches, best first.
+    """
+    dialect_name = connection.dialect.name
+    params = {'user_id': user_id, 'limit': limit, 'offset': offset}
+
+    if dialect_name == 'sqlite':
+        params['match'] = _match_expression(user_id, query)
+        if not params['match']:
+            return []
+        return connection.execute(text(
+            f"SELECT rowid, quiz_id, snippet({SEARCH_TABLE}, 0, :start, :end, '…', 16) "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+            f"ORDER BY {SQLITE_RANK} LIMIT :limit OFFSET :offset"
+        ), dict(params, start=SNIPPET_START, end=SNIPPET_END)).fetchall()
+
+    if dialect_name == 'postgresql':
+        params['query'] = query
+        headline_options = (f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, "
+                            "MaxWords=24, MinWords=8, MaxFragments=1, FragmentDelimiter=…")
+        return connection.execute(text(
+            f"SELECT entry_id, quiz_id, ts_headline('{POSTGRES_TEXT_SEARCH_CONFIG}', content, tsquery, :headline) "
+            f"FROM {SEARCH_TABLE}, websearch_to_tsquery('{POSTGRES_TEXT_SEARCH_CONFIG}', :query) AS tsquery "
+            "WHERE user_id = :user_id AND document @@ tsquery "
+            "ORDER BY ts_rank(document, tsquery) DESC, entry_id LIMIT :limit OFFSET :offset"
+        ), dict(params, headline=headline_options)).fetchall()
+
+    # Without a full-text index, fall back to a substring match on titles and question text
+    return connection.execute(text(
+        "SELECT -quiz.id, quiz.id, quiz.title FROM quiz WHERE quiz.user_id = :user_id AND quiz.title LIKE :pattern "
+        "UNION ALL "
+        "SELECT question.id, quiz.id, question.text FROM question JOIN quiz ON quiz.id = question.quiz_id "
+        "WHERE quiz.user_id = :user_id AND question.text LIKE :pattern "
+        "ORDER BY 2 DESC, 1 LIMIT :limit OFFSET :offset"
+    ), dict(params, pattern=f"%{query}%")).fetchall()
+
+def search_question_ids(user_id, query, limit):
+    """
+    Return the ids of up to limit questions of the user matching query, best first.
+
+    Must be called inside an application context.
+    """
+    from app import db
+
+    query = (query or '').strip()
+    if not query:
+        return []
+    # Title entries are skipped, so fetch enough rows to fill limit with questions
+    rows = _search_entries(db.session.connection(), user_id, query, limit * 2, 0)
+    return [entry_id for entry_id, _, _ in rows if entry_id > 0][:limit]
+
+def search_quizzes(user_id, query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Search the titles and questions of a user's quizzes, best matches first.
+
+    Must be called inside an application context.
+
+    Args:
+        user_id (int): Owner of the quizzes searched
+        query (str): Words to look for; every word must match
+        page (int): 1-based page of results
+        page_size (int): Results per page
+
+    Returns:
+        dict: results (a list of dicts with quiz_id, quiz_title, question_index,
+            snippet and matches, the [start, end] offsets of the matched terms in
+            the snippet; snippet is None for title matches) and has_next
+    """
+    from app import db
+    from models import Quiz, Question
+
+    query = (query or '').strip()
+    if not query:
+        return {'results': [], 'has_next': False}
+
+    offset = (max(page, 1) - 1) * page_size
+    rows = _search_entries(db.session.connection(), user_id, query, page_size + 1, offset)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    # Look up the titles and question positions of the page in two queries
+    quiz_ids = {quiz_id for _, quiz_id, _ in rows}
+    question_ids = [entry_id for entry_id, _, _ in rows if entry_id > 0]
+    titles = dict(db.session.query(Quiz.id, Quiz.title).filter(Quiz.id.in_(quiz_ids)).all()) if quiz_ids else {}
+    ordinals = dict(db.session.query(Question.id, Question.ordinal)
+                    .filter(Question.id.in_(question_ids)).all()) if question_ids else {}
+
+    results = []
+    for entry_id, quiz_id, snippet in rows:
+        snippet_text, matches = split_snippet(snippet) if entry_id > 0 else (None, [])
+        results.append({
+            'quiz_id': quiz_id,
+            'quiz_title': titles.get(quiz_id, ''),
+            'question_index': ordinals.get(entry_id) if entry_id > 0 else None,
+            'snippet': snippet_text,
+            'matches': matches,
+        })
+
+    return {'results': results, 'has_next': has_next}
@@ -0,0 +1,88 @@
+import re
+import random
+
+OPTION_LETTERS = 'ABCDEFGHIJ'
+
+# An answer naming an option by its letter: "B", "(B)", "b.", "Option B", "A) Mitochondria", "B. text"
+ANSWER_LETTER_PATTERN = re.compile(r'^\s*(?:option\s+)?\(?([A-J])(?:\)?\s*[.):-]\s*|\)?\s*$)(.*)$',
+                                   re.IGNORECASE | re.DOTALL)
+
+def answer_option_index(answer, options):
+    """
+    Return the position of the option a multiple choice answer names.
+
+    The answer may be the option text, or its letter alone or followed by the
+    option text, in the usual formats.
+
+    Returns:
+        int: The position, or None when the answer names no option, or names
+            one by letter and another by text
+    """
+    answer = str(answer).strip()
+    texts = [str(option).strip().lower() for option in options]
+    if answer.lower() in texts:
+        return texts.index(answer.lower())
+
+    match = ANSWER_LETTER_PATTERN.match(answer)
+    if match is None:
+        return None
+    index = OPTION_LETTERS.index(match.group(1).upper())
+    rest = match.group(2).strip().lower()
+    if index >= len(options) or (rest and rest != texts[index]):
+        return None
+    return index
+
+def _remap_answer(answer, options, order):
+    """
+    Return the answer of a question whose options were reordered.
+
+    Args:
+        answer (str): The stored answer, naming an option by its text or letter
+        options (list): The options in their original order
+        order (list): Original positions of the options, in their new order
+
+    Returns:
+        str: The answer for the new order, in the format of the stored one, or
+            None when the answer names no option
+    """
+    index = answer_option_index(answer, options)
+    if index is None:
+        return None
+    if answer.strip().lower() == str(options[index]).strip().lower():
+        # The option text moves along with the option
+        return answer
+
+    match = ANSWER_LETTER_PATTERN.match(answer)
+    letter = OPTION_LETTERS[order.index(index)]
+    if match.group(1).islower():
+        letter = letter.lower()
+    return answer[:match.start(1)] + letter + answer[match.end(1):]
+
+def shuffle_quiz(quiz_data, seed):
+    """
+    Return a copy of a quiz with its questions and their options in a new order.
+
+    Multiple choice answers are moved along with the option they name. Options
+    of questions whose answer names none of them keep their order, so the
+    answer stays right. The same seed always produces the same order.
+
+    Args:
+        quiz_data (list): Question dicts
+        seed (str): Seed of the permutation, e.g. the quiz id and version number
+
+    Returns:
+        list: The shuffled questions
+    """
+    rng = random.Random(seed)
+    shuffled = []
+    for question in rng.sample(quiz_data, len(quiz_data)):
+        question = dict(question)
+        options = question.get('options')
+        if options and len(options) <= len(OPTION_LETTERS):
+            order = rng.sample(range(len(options)), len(options))
+            answer = _remap_answer(str(question.get('answer', '')), options, order)
+            if answer is not None:
+                question['options'] = [options[position] for position in order]
+                question['answer'] = answer
+        shuffled.append(question)
+    return shuffled
@@ -0,0 +1,35 @@
+import os
+import threading
+
+# Worker processes rendering PDFs for exam sets and bulk exports, shared by every request of this process
+RENDER_WORKERS = int(os.environ.get("QUIZCRAFT_RENDER_WORKERS", str(os.cpu_count() or 1)))
+
+# PDFs rendered ahead of the one being sent, per worker; bounds the memory of a download
+RENDER_PREFETCH_PER_WORKER = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_render_executor():
+    """
+    Return the process pool, starting it on first use.
+
+    Workers are spawned rather than forked, so they do not inherit the locks
+    and threads of the web process.
+    """
+    global _executor
+
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def render_window():
+    """
+    Return how many renders a download may have in flight at once.
+    """
+    return RENDER_WORKERS * RENDER_PREFETCH_PER_WORKER
@@ -0,0 +1,290 @@
+import os
+import time
+import secrets
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Where session data is kept: "sql" (the application database), "redis" or "memory"
+SESSION_BACKEND = os.environ.get("QUIZCRAFT_SESSION_BACKEND", "sql")
+
+# Server used by the redis backend; any Redis-compatible server works
+SESSION_REDIS_URL = os.environ.get("QUIZCRAFT_SESSION_REDIS_URL", "redis://localhost:6379/0")
+
+# Idle time after which a session, and the guest quiz in it, is discarded
+SESSION_TTL_SECONDS = int(os.environ.get("QUIZCRAFT_SESSION_TTL_SECONDS", str(24 * 3600)))
+
+# How often the sweeper deletes expired sessions
+SESSION_SWEEP_SECONDS = int(os.environ.get("QUIZCRAFT_SESSION_SWEEP_SECONDS", "600"))
+
+# Session key in which Flask-Login keeps the id of the logged-in user
+SESSION_USER_ID_KEY = '_user_id'
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    A session whose data lives in a session backend; the cookie only holds its id.
+    """
+
+    def __init__(self, initial=None, session_id=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.session_id = session_id
+        self.expires_at = expires_at
+        self.modified = False
+        # The user the session was issued to; its id is replaced when this changes
+        self.loaded_user_id = self.get(SESSION_USER_ID_KEY)
+
+class SQLSessionBackend:
+    """
+    Stores sessions in the ServerSession table of the application database.
+    """
+
+    def _session(self):
+        from sqlalchemy.orm import Session
+        from app import db
+
+        # Use a separate session so saving the Flask session never commits request state
+        return Session(db.engine)
+
+    def load(self, session_id):
+        from models import ServerSession
+
+        with self._session() as session:
+            row = session.get(ServerSession, session_id)
+            if row is None or row.expires_at < datetime.utcnow():
+                return None
+            return row.data, row.expires_at
+
+    def save(self, session_id, data, expires_at):
+        from models import ServerSession
+
+        with self._session() as session:
+            session.merge(ServerSession(session_id=session_id, data=data, expires_at=expires_at))
+            session.commit()
+
+    def delete(self, session_id):
+        from models import ServerSession
+
+        with self._session() as session:
+            session.query(ServerSession).filter_by(session_id=session_id).delete()
+            session.commit()
+
+    def sweep(self):
+        from models import ServerSession
+
+        with self._session() as session:
+            deleted = session.query(ServerSession).filter(
+                ServerSession.expires_at < datetime.utcnow()
+            ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+
+class RedisSessionBackend:
+    """
+    Stores sessions in Redis, which expires them itself.
+
+    Requires the redis package.
+    """
+
+    key_prefix = 'quizcraft:session:'
+
+    def __init__(self, url=SESSION_REDIS_URL):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def load(self, session_id):
+        key = self.key_prefix + session_id
+        pipeline = self.client.pipeline()
+        pipeline.get(key)
+        pipeline.ttl(key)
+        data, ttl = pipeline.execute()
+        if data is None:
+            return None
+        return data.decode('utf-8'), datetime.utcnow() + timedelta(seconds=max(ttl, 0))
+
+    def save(self, session_id, data, expires_at):
+        ttl = max(int((expires_at - datetime.utcnow()).total_seconds()), 1)
+        self.client.setex(self.key_prefix + session_id, ttl, data)
+
+    def delete(self, session_id):
+        self.client.delete(self.key_prefix + session_id)
+
+    def sweep(self):
+        return 0
+
+class MemorySessionBackend:
+    """
+    Keeps sessions in this process only. Suitable for development and tests.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry is None or entry[1] < datetime.utcnow():
+            return None
+        return entry
+
+    def save(self, session_id, data, expires_at):
+        with self._lock:
+            self._sessions[session_id] = (data, expires_at)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def sweep(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [session_id for session_id, (_, expires_at) in self._sessions.items()
+                       if expires_at < now]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+SESSION_BACKENDS = {
+    'sql': SQLSessionBackend,
+    'redis': RedisSessionBackend,
+    'memory': MemorySessionBackend,
+}
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that keeps session data in a backend and puts only
+    an opaque, random session id in the cookie.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend, ttl_seconds=SESSION_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def _new_expiry(self):
+        return datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+
+    def open_session(self, app, request):
+        # Static files never use the session, so the backend is not read for them
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            return ServerSideSession()
+
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if session_id:
+            try:
+                stored = self.backend.load(session_id)
+            except Exception as e:
+                logging.error(f"Error loading session: {str(e)}")
+                stored = None
+
+            if stored is not None:
+                data, expires_at = stored
+                try:
+                    return ServerSideSession(self.serializer.loads(data), session_id, expires_at)
+                except Exception as e:
+                    logging.error(f"Discarding unreadable session: {str(e)}")
+
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.session_id is not None:
+                self.backend.delete(session.session_id)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+
+        response.vary.add('Cookie')
+
+        # A new id whenever the logged-in user changes, so an id planted in a
+        # browser before login (session fixation) is worthless after it
+        user_changed = (session.session_id is not None
+                        and session.get(SESSION_USER_ID_KEY) != session.loaded_user_id)
+        if user_changed:
+            self.backend.delete(session.session_id)
+            session.session_id = None
+
+        # Untouched sessions are only written again once half their lifetime has passed
+        half_life = timedelta(seconds=self.ttl_seconds / 2)
+        needs_refresh = (session.expires_at is None
+                         or session.expires_at - datetime.utcnow() < half_life)
+        if not session.modified and not needs_refresh and not user_changed:
+            return
+
+        if session.session_id is None:
+            session.session_id = secrets.token_urlsafe(32)
+        session.expires_at = self._new_expiry()
+        self.backend.save(session.session_id, self.serializer.dumps(dict(session)), session.expires_at)
+
+        response.set_cookie(
+            cookie_name,
+            session.session_id,
+            expires=session.expires_at,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+class SessionSweeper:
+    """
+    Background thread that periodically deletes expired sessions.
+    """
+
+    def __init__(self, app, backend, interval=SESSION_SWEEP_SECONDS):
+        self.app = app
+        self.backend = backend
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the sweeper thread, once per process.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='session-sweeper', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    deleted = self.backend.sweep()
+                if deleted:
+                    logging.info(f"Swept {deleted} expired sessions")
+            except Exception as e:
+                logging.error(f"Error sweeping sessions: {str(e)}")
+
+def init_session_store(app, backend_name=SESSION_BACKEND):
+    """
+    Replace the cookie session with the server-side session store and sweep
+    expired sessions in the background.
+
+    The sweeper starts with the first request, so creating the app does not
+    spawn threads.
+
+    Args:
+        app (Flask): The application
+        backend_name (str): One of SESSION_BACKENDS
+    """
+    backend = SESSION_BACKENDS[backend_name]()
+    app.session_interface = ServerSideSessionInterface(backend)
+    app.before_request(SessionSweeper(app, backend).start)
+    logging.debug(f"Using the {backend_name} session store")
@@ -0,0 +1,170 @@
+import io
+import os
+import logging
+import threading
+from utils.metrics import STAGE_SECONDS
+
+# File extensions accepted by the "Upload File" input method
+SUPPORTED_FILE_EXTENSIONS = ['pdf', 'docx', 'txt', 'csv']
+
+# Full-text extraction of PDFs with at least this many pages is spread over a process pool
+PDF_PARALLEL_MIN_PAGES = 40
+
+# Fewest pages worth handing to a pool worker
+PDF_PAGES_PER_TASK = 20
+
+# Size of the extraction process pool, shared by every request of this process
+PDF_EXTRACT_WORKERS = int(os.environ.get("QUIZCRAFT_PDF_WORKERS", str(os.cpu_count() or 1)))
+
+_pdf_executor = None
+_executor_lock = threading.Lock()
+
+def get_file_extension(filename):
+    """
+    Return the lower-cased extension of a filename, or an empty string.
+    """
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def iter_pdf_page_texts(reader, start=0, stop=None):
+    """
+    Lazily yield the text of each page in a PdfReader, parsing one page at a time.
+    """
+    stop = len(reader.pages) if stop is None else stop
+    for page_number in range(start, stop):
+        yield reader.pages[page_number].extract_text() or ''
+
+def extract_text_from_pdf(file, char_budget=None):
+    """
+    Extract text from a PDF file.
+
+    Args:
+        file: A binary file-like object containing the PDF
+        char_budget (int): Stop after the first pages that together hold at least
+            this many characters; None extracts every page
+
+    Returns:
+        str: The extracted text, one page per line block
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file)
+    page_texts = []
+    extracted_chars = 0
+    for text in iter_pdf_page_texts(reader):
+        page_texts.append(text)
+        extracted_chars += len(text) + 1
+        if char_budget is not None and extracted_chars >= char_budget:
+            logging.info(f"Stopped PDF extraction after {len(page_texts)} of {len(reader.pages)} pages")
+            break
+
+    return "\n".join(page_texts) + "\n" if page_texts else ""
+
+def get_pdf_executor():
+    """
+    Return the PDF extraction process pool, starting it on first use.
+
+    Workers are spawned rather than forked, so they do not inherit the locks
+    and threads of the web process.
+    """
+    global _pdf_executor
+
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    with _executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _pdf_executor
+
+def _extract_pdf_page_range(data, start, stop):
+    from PyPDF2 import PdfReader
+
+    return "\n".join(iter_pdf_page_texts(PdfReader(io.BytesIO(data)), start, stop))
+
+def extract_text_from_pdf_parallel(data, max_workers=PDF_EXTRACT_WORKERS):
+    """
+    Extract the full text of a PDF, spreading page ranges over a process pool.
+
+    Small documents, or a pool of one worker, are extracted in this process.
+    The pool is shared by every request, so concurrent uploads queue for its
+    workers instead of starting processes of their own.
+
+    Args:
+        data (bytes): The raw contents of the PDF
+        max_workers (int): The maximum number of page ranges to split the PDF into
+
+    Returns:
+        str: The extracted text, one page per line block
+    """
+    from PyPDF2 import PdfReader
+
+    page_count = len(PdfReader(io.BytesIO(data)).pages)
+    if page_count < PDF_PARALLEL_MIN_PAGES or max_workers <= 1:
+        return extract_text_from_pdf(io.BytesIO(data))
+
+    # One contiguous range per worker, since every task sends and parses the whole document
+    tasks = max(1, min(max_workers, PDF_EXTRACT_WORKERS, page_count // PDF_PAGES_PER_TASK))
+    bounds = [page_count * index // tasks for index in range(tasks + 1)]
+    logging.debug(f"Extracting {page_count} PDF pages in {tasks} ranges")
+
+    executor = get_pdf_executor()
+    futures = [executor.submit(_extract_pdf_page_range, data, start, stop)
+               for start, stop in zip(bounds, bounds[1:])]
+    range_texts = [future.result() for future in futures]
+
+    return "\n".join(range_texts) + "\n"
+
+def extract_text_from_docx(file):
+    """
+    Extract text from a DOCX file.
+
+    Args:
+        file: A binary file-like object containing the document
+
+    Returns:
+        str: The paragraphs of the document joined by newlines
+    """
+    import docx
+
+    doc = docx.Document(file)
+    return "\n".join([para.text for para in doc.paragraphs])
+
+def extract_text_from_file(filename, data, char_budget=None):
+    """
+    Extract text from an uploaded document based on its extension.
+
+    Args:
+        filename (str): The (secured) name of the uploaded file
+        data (bytes): The raw contents of the file
+        char_budget (int): The number of characters the caller will use; PDFs stop
+            extracting once it is reached. None extracts the full text.
+
+    Returns:
+        str: The extracted text
+    """
+    file_ext = get_file_extension(filename)
+    logging.debug(f"Extracting text from {file_ext} file: {filename}")
+
+    if file_ext not in SUPPORTED_FILE_EXTENSIONS:
+        raise ValueError("Unsupported file format. Please upload PDF, DOCX, TXT, or CSV files.")
+
+    with STAGE_SECONDS.time(stage='extract', kind=file_ext):
+        return _extract_text(file_ext, data, char_budget)
+
+def _extract_text(file_ext, data, char_budget):
+    if file_ext == 'pdf':
+        try:
+            if char_budget is None:
+                return extract_text_from_pdf_parallel(data)
+            return extract_text_from_pdf(io.BytesIO(data), char_budget=char_budget)
+        except Exception as e:
+            raise ValueError(f"Error processing PDF: {str(e)}")
+
+    elif file_ext == 'docx':
+        try:
+            return extract_text_from_docx(io.BytesIO(data))
+        except Exception as e:
+            raise ValueError(f"Error processing DOCX: {str(e)}")
+
+    return data.decode('utf-8')
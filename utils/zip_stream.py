@@ -0,0 +1,49 @@
+import zipfile
+
+class _ChunkSink:
+    """
+    A write-only file object that hands what zipfile writes to a generator.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks = self._chunks
+        self._chunks = []
+        return chunks
+
+def stream_zip(entries, compression=zipfile.ZIP_STORED):
+    """
+    Yield a ZIP archive piece by piece while its entries are produced.
+
+    Only the entry being added is held in memory, so archives of any size can
+    be streamed straight into a response. By default entries are stored
+    without compression, as PDFs are compressed already.
+
+    Args:
+        entries (iterable): (filename, bytes) pairs, consumed lazily
+        compression (int): The zipfile compression method, e.g. ZIP_DEFLATED for text
+
+    Yields:
+        bytes: The next piece of the archive
+    """
+    sink = _ChunkSink()
+    # Without seek(), zipfile writes each entry's sizes after its data
+    with zipfile.ZipFile(sink, 'w', compression=compression) as archive:
+        for filename, data in entries:
+            archive.writestr(filename, data)
+            yield from sink.drain()
+    yield from sink.drain()